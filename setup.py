@@ -2,7 +2,7 @@
 from setuptools import setup
 setup(
   name = 'trilateration',
-  packages = ['trilateration', 'trilateration.compute', 'trilateration.filter', 'trilateration.model', 'trilateration.utils'],
+  packages = ['trilateration', 'trilateration.benchmark', 'trilateration.compute', 'trilateration.filter', 'trilateration.model', 'trilateration.solver', 'trilateration.utils'],
   version = '1.0',
   description = 'Finding best intersection or its nearest point for 3 gateways and the distance traveled by the signal for TDOA/TOA trilateration',
   author = 'Royer Robin',
@@ -0,0 +1,288 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import sys
+import json
+import math
+import platform
+import argparse
+import datetime
+import timeit
+import numpy as np
+
+from ..utils.utils import SPEED_OF_LIGHT
+from ..compute.toa import toa
+from ..compute.tdoa import tdoa, tdoa_batch
+from ..compute.lsm import lsm
+from ..compute.ransac import ransac
+from ..compute.trilateration import trilateration
+from ..model.point import point
+from ..model.circle import circle
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.projection import projection, clear_cache
+
+"""
+Benchmark of the geolocalization methods:
+    every case (method, number of gateways, geometry, timestamp noise) is run on random messages
+    with a known device position, and reports the cold start cost (first solve with an empty
+    projection cache), the warm latency percentiles, the throughput, the resolved ratio, the number
+    of messages rejected by the method (ValueError) and the median error (meter).
+
+Run it with:
+    python -m trilateration.benchmark.benchmark --output results.json [--baseline previous.json]
+   .
+  / \
+ / ! \   => The timings depend on the machine, only compare results produced on the same machine
+/_____\
+
+"""
+
+CENTER = (48.85, 2.33)
+GEOMETRIES = ('surround', 'line', 'outside')
+# number of gateways supported by each method, None for no maximum
+METHOD_GATEWAYS = {
+    'trilateration': (3, 3),
+    'toa': (3, 3),
+    'tdoa': (4, None),
+    'tdoa_batch': (4, None),
+    'lsm': (3, None),
+    'ransac': (4, None),
+}
+T0 = 1495456868630584064
+
+
+def make_case(gateways, geometry, noise_ns, count, radius=5000., seed=0, projection_system='epsg:2192'):
+    """Generate random messages of a benchmark case
+
+    Args:
+        gateways: number of gateways receiving every message
+        geometry: 'surround' (device inside the gateways), 'line' (aligned gateways)
+            or 'outside' (device far from a cluster of gateways)
+        noise_ns: standard deviation (nanosecond) of the timestamps noise
+        count: number of messages
+        radius: size (meter) of the gateway area
+        seed: seed of the random generator
+
+    Returns:
+        gateways list, devices x and y arrays of shape (count,), distances (meter) and
+            noisy timestamps (nanosecond) arrays of shape (count, gateways)
+    """
+    if geometry not in GEOMETRIES:
+        raise ValueError("Unknown geometry")
+    if gateways < 3 or count < 1 or noise_ns < 0:
+        raise ValueError("Incorrect benchmark case")
+    rand = np.random.RandomState(seed)
+    proj = projection(projection_system)
+    cx, cy = proj.lat_long_to_x_y(*CENTER)
+
+    angles = 2 * math.pi * np.arange(gateways) / gateways
+    if geometry == 'surround':
+        gx, gy = cx + radius * np.cos(angles), cy + radius * np.sin(angles)
+        rho, theta = .5 * radius * np.sqrt(rand.rand(count)), 2 * math.pi * rand.rand(count)
+        dx, dy = cx + rho * np.cos(theta), cy + rho * np.sin(theta)
+    elif geometry == 'line':
+        gx = cx + np.linspace(-radius, radius, gateways)
+        gy = cy + .05 * radius * rand.randn(gateways)
+        dx, dy = cx + radius * (rand.rand(count) - .5), cy + radius * (.2 + rand.rand(count))
+    else:
+        gx, gy = cx + .25 * radius * np.cos(angles), cy + .25 * radius * np.sin(angles)
+        theta = 2 * math.pi * rand.rand(count)
+        dx, dy = cx + radius * np.cos(theta), cy + radius * np.sin(theta)
+
+    glon, glat = proj.x_y_to_long_lat(gx, gy)
+    gateway_list = [gateway(float(lat), float(lon)) for lat, lon in zip(glat, glon)]
+    distances = np.hypot(dx[:, None] - gx[None, :], dy[:, None] - gy[None, :])
+    timestamps = T0 + np.round(distances / SPEED_OF_LIGHT + noise_ns * rand.randn(count, gateways)).astype(np.int64)
+    return gateway_list, dx, dy, distances, timestamps
+
+
+def _inputs(method, gateway_list, distances, timestamps, noise_ns):
+    """Build the input of a method for every message"""
+    if method == 'trilateration':
+        return [[circle(a_gateway, max(float(d + SPEED_OF_LIGHT * noise_ns * e), 1.)) \
+            for a_gateway, d, e in zip(gateway_list, row, np.random.RandomState(i).randn(len(row)))] \
+            for i, row in enumerate(distances)]
+    now = datetime.datetime.now()
+    return [[uplink(a_gateway, now, int(t)) for a_gateway, t in zip(gateway_list, row)] for row in timestamps]
+
+
+def _solve(method, message, projection_system):
+    """Solve one message, return the estimated point or None"""
+    if method == 'trilateration':
+        return trilateration(message, projection_system).geolocalized_device
+    computation = {'toa': toa, 'tdoa': tdoa, 'lsm': lsm, 'ransac': ransac}[method](message, projection_system)
+    return computation.geolocalized_device if computation.is_resolved else None
+
+
+def _percentiles(latencies):
+    """Latency statistics in millisecond"""
+    latencies = 1000. * np.asarray(latencies)
+    return {
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p90_ms': float(np.percentile(latencies, 90)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+    }
+
+
+def run_case(method, gateways, geometry, noise_ns, count=50, seed=0, projection_system='epsg:2192', repeats=10):
+    """Benchmark a method on one case, see make_case
+
+    The latencies are measured per message, except for tdoa_batch: each of the repeats calls on
+    the whole batch gives one latency (per message).
+
+    Returns:
+        A dict of the case parameters and of its measures
+    """
+    if method not in METHOD_GATEWAYS:
+        raise ValueError("Unknown method")
+    gateway_list, dx, dy, distances, timestamps = make_case(gateways, geometry, noise_ns, count, \
+        seed=seed, projection_system=projection_system)
+    proj = projection(projection_system)
+    clock = timeit.default_timer
+
+    if repeats < 1:
+        raise ValueError("Incorrect repeats")
+
+    failures = 0
+    if method == 'tdoa_batch':
+        lat = np.array([[g.lat for g in gateway_list]] * count)
+        lon = np.array([[g.lon for g in gateway_list]] * count)
+        clear_cache()
+        start = clock()
+        tdoa_batch(lat[:1], lon[:1], timestamps[:1], projection_system)
+        cold = clock() - start
+        latencies, elapsed = [], 0.
+        for _ in xrange(repeats):
+            start = clock()
+            lat_found, lon_found, resolved = tdoa_batch(lat, lon, timestamps, projection_system)
+            duration = clock() - start
+            latencies.append(duration / count)
+            elapsed += duration
+        solved = count * repeats
+        found = [point(float(a), float(b)) if ok else None for a, b, ok in zip(lat_found, lon_found, resolved)]
+    else:
+        messages = _inputs(method, gateway_list, distances, timestamps, noise_ns)
+        clear_cache()
+        start = clock()
+        _solve_safely(method, messages[0], projection_system)
+        cold = clock() - start
+        latencies, found = [], []
+        for message in messages:
+            start = clock()
+            device, failed = _solve_safely(method, message, projection_system)
+            latencies.append(clock() - start)
+            found.append(device)
+            failures += failed
+        solved, elapsed = count, sum(latencies)
+
+    errors = []
+    for device, x, y in zip(found, dx, dy):
+        if device is not None:
+            fx, fy = proj.point_to_x_y(device)
+            errors.append(math.hypot(fx - x, fy - y))
+    result = {
+        'method': method,
+        'gateways': gateways,
+        'geometry': geometry,
+        'noise_ns': noise_ns,
+        'messages': count,
+        'cold_ms': 1000. * cold,
+        'throughput': solved / elapsed if elapsed > 0 else float('inf'),
+        'resolved_ratio': len(errors) / float(count),
+        'failures': failures,
+        'median_error_m': float(np.median(errors)) if errors else None,
+    }
+    result.update(_percentiles(latencies))
+    return result
+
+
+def _solve_safely(method, message, projection_system):
+    """Solve one message, a message rejected by the method (ValueError) is not resolved
+
+    Returns:
+        The estimated point or None, True if the method rejected the message
+    """
+    try:
+        return _solve(method, message, projection_system), False
+    except ValueError:
+        return None, True
+
+
+def run_benchmarks(methods=None, gateway_counts=(3, 4, 6, 10), geometries=GEOMETRIES, noises=(0, 10, 100), \
+    count=50, seed=0, projection_system='epsg:2192'):
+    """Run the benchmark cases supported by every method
+
+    Returns:
+        The machine readable report: a dict with the environment and the list of case results
+    """
+    methods = sorted(METHOD_GATEWAYS) if methods is None else methods
+    results = []
+    for method in methods:
+        if method not in METHOD_GATEWAYS:
+            raise ValueError("Unknown method")
+        low, high = METHOD_GATEWAYS[method]
+        for gateways in gateway_counts:
+            if gateways < low or (high is not None and gateways > high):
+                continue
+            for geometry in geometries:
+                for noise_ns in noises:
+                    results.append(run_case(method, gateways, geometry, noise_ns, count, seed, projection_system))
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'date': datetime.datetime.utcnow().isoformat(),
+        'results': results,
+    }
+
+
+def _case_key(result):
+    return (result['method'], result['gateways'], result['geometry'], result['noise_ns'])
+
+
+def compare(baseline, current, metric='p50_ms', tolerance=.2):
+    """Find the regressions of a report against a baseline report
+
+    Args:
+        baseline: the reference report (see run_benchmarks)
+        current: the new report
+        metric: the latency measure to compare
+        tolerance: accepted relative slowdown
+
+    Returns:
+        The list of (case key, baseline value, current value) slower than the tolerance
+    """
+    reference = dict((_case_key(result), result[metric]) for result in baseline['results'])
+    regressions = []
+    for result in current['results']:
+        key = _case_key(result)
+        if key in reference and result[metric] > reference[key] * (1. + tolerance):
+            regressions.append((key, reference[key], result[metric]))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the geolocalization methods")
+    parser.add_argument('--methods', nargs='*', default=None)
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--output', default=None, help="json report file")
+    parser.add_argument('--baseline', default=None, help="json report to compare with")
+    parser.add_argument('--tolerance', type=float, default=.2)
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.methods, count=args.count)
+    for result in report['results']:
+        print "%(method)-14s %(gateways)2d gw %(geometry)-9s noise %(noise_ns)4d ns: " \
+            "p50 %(p50_ms)8.3f ms  p99 %(p99_ms)8.3f ms  cold %(cold_ms)8.3f ms  %(throughput)9.1f msg/s" % result
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(json.load(baseline), report, tolerance=args.tolerance)
+        for key, before, after in regressions:
+            print "REGRESSION %s: %.3f ms -> %.3f ms" % (key, before, after)
+        sys.exit(1 if regressions else 0)
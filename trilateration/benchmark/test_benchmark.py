@@ -0,0 +1,68 @@
+import unittest
+
+import json
+import numpy as np
+
+from benchmark import make_case, run_case, run_benchmarks, compare
+from ..model.gateway import gateway
+# do not forget to use nose2 at root to run test
+
+
+class Test_benchmark(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_make_case(self):
+        gateways, dx, dy, distances, timestamps = make_case(5, 'surround', 0, 7)
+        self.assertEqual(len(gateways), 5)
+        self.assertTrue(isinstance(gateways[0], gateway))
+        self.assertEqual(dx.shape, (7,))
+        self.assertEqual(timestamps.shape, (7, 5))
+        self.assertEqual(timestamps.dtype, np.int64)
+        self.assertTrue(np.all(distances < 10000))
+
+    def test_deterministic_case(self):
+        first, second = make_case(4, 'line', 10, 3, seed=3), make_case(4, 'line', 10, 3, seed=3)
+        self.assertTrue(np.array_equal(first[4], second[4]))
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_run_case(self):
+        result = run_case('lsm', 4, 'surround', 0, count=5)
+        for key in ('cold_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'throughput', 'resolved_ratio', 'failures', \
+            'median_error_m'):
+            self.assertTrue(key in result)
+        self.assertEqual(result['resolved_ratio'], 1.)
+        self.assertEqual(result['failures'], 0)
+        self.assertTrue(result['median_error_m'] < 10.)
+
+    def test_batch_case(self):
+        result = run_case('tdoa_batch', 4, 'surround', 0, count=20, repeats=5)
+        self.assertTrue(result['median_error_m'] < 10.)
+        self.assertTrue(result['p50_ms'] <= result['p99_ms'] <= result['max_ms'])
+
+    def test_failures(self):
+        # toa rejects the messages of more than 3 uplinks
+        result = run_case('toa', 4, 'surround', 0, count=3)
+        self.assertEqual(result['failures'], 3)
+        self.assertEqual(result['resolved_ratio'], 0.)
+
+    def test_report(self):
+        report = run_benchmarks(['toa', 'trilateration'], gateway_counts=(3, 4), geometries=('surround',), \
+            noises=(0,), count=3)
+        self.assertEqual(len(report['results']), 2)
+        self.assertEqual(json.loads(json.dumps(report))['results'][0]['method'], 'toa')
+
+    def test_compare(self):
+        baseline = {'results': [{'method': 'lsm', 'gateways': 4, 'geometry': 'line', 'noise_ns': 0, 'p50_ms': 1.}]}
+        current = {'results': [{'method': 'lsm', 'gateways': 4, 'geometry': 'line', 'noise_ns': 0, 'p50_ms': 1.5}]}
+        self.assertEqual(len(compare(baseline, current)), 1)
+        self.assertEqual(compare(baseline, current, tolerance=1.), [])
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_case(self):
+        self.assertRaises(ValueError, lambda: make_case(4, 'circle', 0, 3))
+        self.assertRaises(ValueError, lambda: make_case(2, 'line', 0, 3))
+        self.assertRaises(ValueError, lambda: run_case('sympy', 4, 'line', 0))
+        self.assertRaises(ValueError, lambda: run_case('tdoa_batch', 4, 'line', 0, repeats=0))
+
+if __name__ == '__main__':
+    unittest.main()
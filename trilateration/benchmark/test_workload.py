@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from workload import city_workload
+from ..utils.utils import SPEED_OF_LIGHT
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.uplink_batch import uplink_batch
+# do not forget to use nose2 at root to run test
+
+
+class Test_city_workload(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_workload_creation(self):
+        workload = city_workload(gateways=50, devices=10)
+        self.assertEqual(len(workload.registry), 50)
+        self.assertEqual(workload.devices, 10)
+
+    def test_batches(self):
+        workload = city_workload(gateways=50, devices=10, max_uplinks=4, loss=0., reception_range=1e6)
+        batches = list(workload.batches(25, chunk=10))
+        self.assertEqual(len(batches), 3)
+        batch, truth = batches[-1]
+        self.assertTrue(isinstance(batch, uplink_batch))
+        self.assertEqual(len(batch), 5)
+        self.assertTrue(np.all(batch.counts() == 4))
+        self.assertTrue(np.array_equal(truth['message_ids'], np.arange(20, 25)))
+        self.assertTrue(np.all(truth['uplinks'] == 4))
+
+    def test_uplinks(self):
+        workload = city_workload(gateways=50, devices=3)
+        message_id, device, truth, uplinks = next(workload.uplinks(5))
+        self.assertEqual((message_id, device), (0, 0))
+        self.assertTrue(isinstance(truth, point))
+        self.assertTrue(isinstance(uplinks[0], uplink))
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_deterministic(self):
+        first = next(city_workload(gateways=100, seed=4).batches(50))[0]
+        second = next(city_workload(gateways=100, seed=4).batches(50))[0]
+        third = next(city_workload(gateways=100, seed=5).batches(50))[0]
+        self.assertTrue(np.array_equal(first.timestamps, second.timestamps))
+        self.assertFalse(np.array_equal(first.timestamps, third.timestamps))
+
+    def test_exact_timestamps(self):
+        workload = city_workload(gateways=30, jitter_ns=0., multipath_ns=0., loss=0.)
+        batch, truth = next(workload.batches(20))
+        _, _, gx, gy = workload.registry.coordinates()
+        rows = np.searchsorted(truth['message_ids'], batch.message_ids)
+        distances = np.hypot(gx[batch.gateway_indexes] - truth['x'][rows], gy[batch.gateway_indexes] - truth['y'][rows])
+        self.assertTrue(np.all(distances <= workload.reception_range))
+        delays = batch.timestamps - truth['emissions'][rows]
+        self.assertTrue(np.all(np.abs(delays - distances / SPEED_OF_LIGHT) <= .5))
+
+    def test_loss(self):
+        workload = city_workload(gateways=50, max_uplinks=8, loss=.5, reception_range=1e6)
+        batch, truth = next(workload.batches(200))
+        self.assertTrue(.3 < batch.size / (8. * 200) < .7)
+        self.assertEqual(batch.size, truth['uplinks'].sum())
+
+    def test_moving_devices(self):
+        workload = city_workload(gateways=10, devices=1, speed=(10., 10.))
+        x, y = workload.device_positions(np.zeros(3, dtype=int), np.array([0., 1., 1e6]))
+        self.assertAlmostEqual(np.hypot(x[1] - x[0], y[1] - y[0]), 10.)
+        half = workload.size / 2.
+        self.assertTrue(abs(x[2] - workload._cx) <= half and abs(y[2] - workload._cy) <= half)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_workload(self):
+        self.assertRaises(ValueError, lambda: city_workload(gateways=2))
+        self.assertRaises(ValueError, lambda: city_workload(loss=1.))
+        self.assertRaises(ValueError, lambda: city_workload(speed=(5., 1.)))
+        self.assertRaises(ValueError, lambda: next(city_workload(gateways=10).batches(10, chunk=0)))
+
+if __name__ == '__main__':
+    unittest.main()
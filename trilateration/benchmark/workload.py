@@ -0,0 +1,187 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import datetime
+import numpy as np
+
+from ..utils.utils import SPEED_OF_LIGHT
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.uplink_batch import uplink_batch
+from ..model.projection import projection
+from ..model.gateway_registry import gateway_registry
+
+"""
+Deterministic synthetic workload of a city:
+    gateways are spread over a square area around a center, devices move in straight lines at a
+    constant speed (bouncing on the borders of the area) and emit messages periodically. Every
+    message is received by the nearest gateways in range, with:
+        - a gaussian clock jitter (nanosecond)
+        - a multipath bias: a positive exponential delay (nanosecond) on a share of the receptions
+        - a packet loss probability per reception
+   .
+  / \
+ / ! \   => The messages are generated by chunks: the result of a seed depends on the chunk size
+/_____\
+
+"""
+
+T0 = 1495456868630584064
+
+
+class city_workload:
+    """Seeded generator of gateways, moving devices and their messages, with the ground truth"""
+
+    def __init__(self, gateways=1000, devices=100, center=(48.85, 2.33), size=20000., reception_range=5000., \
+        max_uplinks=8, speed=(0., 15.), period=60., jitter_ns=10., multipath_ratio=.2, multipath_ns=100., \
+        loss=.05, seed=0, projection_system='epsg:2192'):
+        """city_workload constructor
+
+        Args:
+            gateways: number of gateways spread uniformly over the area
+            devices: number of moving devices
+            center: (lat, lon) of the center of the area
+            size: side (meter) of the square area
+            reception_range: maximal distance (meter) between a device and a receiving gateway
+            max_uplinks: maximal number of gateways receiving a message (the nearest ones)
+            speed: (min, max) speed (meter/second) of the devices
+            period: time (second) between 2 messages of a device
+            jitter_ns: standard deviation (nanosecond) of the gateway clocks
+            multipath_ratio: share of the receptions delayed by a multipath
+            multipath_ns: mean delay (nanosecond) of a multipath
+            loss: probability to lose a reception
+            seed: seed of the random generator
+            projection_system: The projection system name to use. (string)
+        """
+        if gateways < 3 or devices < 1 or max_uplinks < 1:
+            raise ValueError("Incorrect number of gateways, devices or uplinks")
+        if size <= 0 or reception_range <= 0 or period <= 0:
+            raise ValueError("Incorrect area, range or period")
+        if jitter_ns < 0 or multipath_ns < 0 or not 0 <= multipath_ratio <= 1 or not 0 <= loss < 1:
+            raise ValueError("Incorrect noise parameters")
+        if speed[0] < 0 or speed[1] < speed[0]:
+            raise ValueError("Incorrect speed")
+
+        # PUBLIC
+        self.seed = seed
+        self.size = float(size)
+        self.reception_range = float(reception_range)
+        self.max_uplinks = max_uplinks
+        self.period = float(period)
+        self.jitter_ns = float(jitter_ns)
+        self.multipath_ratio = float(multipath_ratio)
+        self.multipath_ns = float(multipath_ns)
+        self.loss = float(loss)
+        self.registry = gateway_registry(projection_system)
+
+        # PRIVATE
+        self._proj = projection(projection_system)
+        self._cx, self._cy = self._proj.lat_long_to_x_y(center[0], center[1])
+        rand = np.random.RandomState(seed)
+        half = self.size / 2.
+        self._gx = self._cx + rand.uniform(-half, half, gateways)
+        self._gy = self._cy + rand.uniform(-half, half, gateways)
+        glon, glat = self._proj.x_y_to_long_lat(self._gx, self._gy)
+        for i in xrange(gateways):
+            self.registry.add(i, float(glat[i]), float(glon[i]))
+
+        # devices: start position, velocity and phase of their first message (second)
+        self._dx0 = rand.uniform(-half, half, devices)
+        self._dy0 = rand.uniform(-half, half, devices)
+        heading = rand.uniform(0, 2 * np.pi, devices)
+        norm = rand.uniform(speed[0], speed[1], devices)
+        self._vx, self._vy = norm * np.cos(heading), norm * np.sin(heading)
+        self._phase = rand.uniform(0, self.period, devices)
+
+    @property
+    def devices(self):
+        return len(self._dx0)
+
+    def device_positions(self, devices, times):
+        """Projected positions of devices at times (second), bouncing on the borders of the area
+
+        Returns:
+            x, y arrays
+        """
+        half = self.size / 2.
+        return self._cx + _bounce(self._dx0[devices] + self._vx[devices] * times, half), \
+            self._cy + _bounce(self._dy0[devices] + self._vy[devices] * times, half)
+
+    def _chunk(self, start, count):
+        """Generate the messages start .. start + count
+
+        Returns:
+            The ground truth (dict of arrays of shape (count,)) and the receptions
+                (message ids, gateway indexes and timestamps arrays)
+        """
+        rand = np.random.RandomState([self.seed, start])
+        message_ids = np.arange(start, start + count, dtype=np.int64)
+        devices = message_ids % self.devices
+        times = (message_ids // self.devices) * self.period + self._phase[devices]
+        x, y = self.device_positions(devices, times)
+
+        # nearest gateways in range
+        keep = min(self.max_uplinks, len(self._gx))
+        nearest_distances, nearest = self.registry.nearest_x_y(x, y, keep, self.reception_range)
+        received = np.isfinite(nearest_distances) & (rand.rand(count, keep) >= self.loss)
+        nearest_distances[~received] = 0.
+
+        delays = nearest_distances / SPEED_OF_LIGHT + self.jitter_ns * rand.randn(count, keep)
+        multipath = rand.rand(count, keep) < self.multipath_ratio
+        delays += multipath * self.multipath_ns * rand.exponential(1., (count, keep))
+        emissions = T0 + np.round(times * 1e9).astype(np.int64)
+        timestamps = emissions[:, None] + np.round(delays).astype(np.int64)
+
+        lon, lat = self._proj.x_y_to_long_lat(x, y)
+        truth = {
+            'message_ids': message_ids,
+            'devices': devices,
+            'emissions': emissions,
+            'x': x,
+            'y': y,
+            'lat': np.asarray(lat),
+            'lon': np.asarray(lon),
+            'uplinks': received.sum(axis=1),
+        }
+        rows = np.nonzero(received)
+        return truth, message_ids[rows[0]], nearest[rows], timestamps[rows]
+
+    def batches(self, messages, chunk=4096):
+        """Generate the messages as columnar batches
+
+        Args:
+            messages: total number of messages
+            chunk: number of messages of a batch
+
+        Returns:
+            A generator of (uplink_batch, ground truth dict), messages without reception are
+            only in the ground truth
+        """
+        if chunk < 1:
+            raise ValueError("Incorrect chunk")
+        for start in xrange(0, messages, chunk):
+            truth, message_ids, gateway_indexes, timestamps = self._chunk(start, min(chunk, messages - start))
+            yield uplink_batch(message_ids, gateway_indexes, timestamps, self.registry), truth
+
+    def uplinks(self, messages, chunk=4096):
+        """Generate the messages as uplink lists
+
+        Returns:
+            A generator of (message id, device, true point, uplink list), see batches
+        """
+        now = datetime.datetime.now()
+        for batch, truth in self.batches(messages, chunk):
+            positions = dict((message_id, i) for i, message_id in enumerate(truth['message_ids']))
+            for index, message_id in enumerate(batch.messages()):
+                i = positions[message_id]
+                rows = xrange(batch.offsets[index], batch.offsets[index + 1])
+                uplinks = [uplink._trusted(self.registry.gateway_at(batch.gateway_indexes[row]), now, \
+                    int(batch.timestamps[row])) for row in rows]
+                yield int(message_id), int(truth['devices'][i]), \
+                    point._trusted(float(truth['lat'][i]), float(truth['lon'][i])), uplinks
+
+
+def _bounce(positions, half):
+    """Fold free positions into [-half, half] as if bouncing on the borders"""
+    folded = np.mod(positions + half, 4 * half)
+    return np.where(folded < 2 * half, folded, 4 * half - folded) - half
@@ -5,12 +5,11 @@ import time
 import math
 import pyproj
 import datetime
-from sympy import Symbol, sqrt, Eq, Abs
-from sympy.solvers import solve
-from sympy import linsolve
+import numpy as np
 from scipy.optimize import least_squares
 
 from ..utils.utils import SPEED_OF_LIGHT
+from ..utils.instrumentation import stage, count
 from ..model.point import point
 from ..model.projection import projection
 from ..model.uplink import uplink
@@ -29,13 +28,17 @@ The aim of this lib is to compute the geolocalization of a device by the time di
 class lsm:
     """This class handle all the tdoa process"""
 
-    def __init__(self, uplink_list, projection_system='epsg:2192'):
+    def __init__(self, uplink_list, projection_system='epsg:2192', ftol=1e-8, xtol=1e-8, max_nfev=None, \
+        initial_guess=None):
         """tdoa constructor
 
         Args:
             uplink_list: a List of 4 uplinks to consider to compute the tdoa
             projection_system: The projection system name to use. (string)
                 please choose your projection  http://spatialreference.org/ref/epsg/2192/
+            ftol, xtol, max_nfev: least_squares tolerances and maximum number of evaluations
+            initial_guess: optional point where the search starts (ex: the last fix of the device),
+                a timestamp weighted centroid of the gateways by default
         """
         if not isinstance(uplink_list, list) or len(uplink_list) < 3:
             raise ValueError("Incorrect uplink_list is not a list or not enough uplink")
@@ -49,62 +52,101 @@ class lsm:
             for j in xrange(i+1, len(uplink_list)):
                 if uplink_list[i].gateway == uplink_list[j].gateway:
                     raise ValueError("Gateway is not unique")
+        if initial_guess is not None and not isinstance(initial_guess, point):
+            raise ValueError("Incorrect initial_guess is not a point")
 
         # PUBLIC
         self.geolocalized_device = point(.0, .0)
         self.is_resolved = False
+        # least_squares convergence statistics
+        self.nfev = 0
+        self.njev = 0
+        self.cost = None
+        self.status = None
 
         # PRIVATE
         self._uplinks = uplink_list
         self._level = len(uplink_list)
-        self._equations = []
-        self._intersections = []
         self._proj = projection(projection_system)
+        self._ftol = ftol
+        self._xtol = xtol
+        self._max_nfev = max_nfev
+        self._initial_guess = initial_guess
         
         # compute the trilateration
         self._compute_geolocalization()
 
-    def _lsm_loss_clojure(self):
+    def _project_gateways(self):
+        """Project the gateways once, return x, y and the nanosecond timestamps relative to the pivot"""
+        x, y = self._proj.points_to_x_y([uplk.gateway for uplk in self._uplinks])
+        # integer difference first: float64 can not hold a nanosecond epoch timestamp
+        dt = np.array([float(uplk.timestamp - self._uplinks[0].timestamp) for uplk in self._uplinks])
+        return x, y, dt
+
+    def _lsm_residuals_clojure(self, x, y, dt):
         """
         Algorithm:
-        The goal is to resolve the equation:with a least 4 gatreways (2, 3, 4)
-        x * Am + y * Bm + z * Cm + Dm = 0   
-            => mat A * mat X = - mat B
-
-        with:
-            Am = (2 * Xm) / (v * Tm) - (2 * X1) / (v * T1)
-            Bm = (2 * Ym) / (v * Tm) - (2 * Y1) / (v * T1)
-            Cm = (2 * Zm) / (v * Tm) - (2 * Z1) / (v * T1)
-            Dm = v * Tm - v * T1 - (Xm * Xm + Ym * Ym + Zm * Zm) / (v * Tm) + (X1 * X1 + Y1 * Y1 + Z1 * Z1) / (v * T1)
-
-            As we don't have informations about the Z value, we will compute as if z = 0
-
-            =>
-                Am = (2 * Xm) / (v * Tm) - (2 * X1) / (v * T1)
-                Bm = (2 * Ym) / (v * Tm) - (2 * Y1) / (v * T1)
-                Dm = v * Tm - v * T1 - (Xm * Xm + Ym * Ym) / (v * Tm) + (X1 * X1 + Y1 * Y1) / (v * T1)
+        For every gateway m but the pivot (gateway 0), the residual is the difference between the
+        distance difference to the device and the one traveled by the signal:
+            Rm = ((Xm - x) ** 2 + (Ym - y) ** 2) ^ 1/2 - ((X0 - x) ** 2 + (Y0 - y) ** 2) ^ 1/2 - v * (Tm - T0)
+
+        As we don't have informations about the Z value, we will compute as if z = 0
         """
-        # Pivot values
-        x0, y0 = self._proj.lat_long_to_x_y(self._uplinks[0].gateway.lat, self._uplinks[0].gateway.lon)
-        t0 = self._uplinks[0].timestamp
-
-        def clojure(x):
-            loss = .0
-            for i, uplink in enumerate(self._uplinks):
-                if i == 0:
-                    continue
-                gw_x, gw_y = self._proj.lat_long_to_x_y(uplink.gateway.lat, uplink.gateway.lon)
-                gw_ts = uplink.timestamp
-
-                loss += abs(math.sqrt((gw_x - x[0])**2 + (gw_y - x[1])**2) - math.sqrt((x0 - x[0])**2 + (y0 - x[1])**2) - SPEED_OF_LIGHT * (gw_ts - t0))
-                return loss
+        dd = SPEED_OF_LIGHT * dt[1:]
+
+        def clojure(position):
+            distances = np.hypot(x - position[0], y - position[1])
+            return distances[1:] - distances[0] - dd
         return clojure
 
+    def _lsm_jacobian_clojure(self, x, y):
+        """Analytic jacobian of the residuals:
+            dRm/dx = (x - Xm) / Dm - (x - X0) / D0
+            dRm/dy = (y - Ym) / Dm - (y - Y0) / D0
+        A null distance (the device on a gateway) has a null gradient.
+        """
+        def clojure(position):
+            dx, dy = position[0] - x, position[1] - y
+            distances = np.hypot(dx, dy)
+            distances[distances == 0] = np.inf
+            ux, uy = dx / distances, dy / distances
+            return np.column_stack((ux[1:] - ux[0], uy[1:] - uy[0]))
+        return clojure
+
+    def _search_bounds(self, x, y):
+        """The device is searched around the gateways: their bounding box widened by its diagonal
+        (at least 1 km), inconsistent timestamps would otherwise push the optimum to infinity"""
+        margin = max(math.hypot(x.max() - x.min(), y.max() - y.min()), 1000.)
+        return [x.min() - margin, y.min() - margin], [x.max() + margin, y.max() + margin]
+
+    def _start(self, x, y, dt, bounds):
+        """Starting point of the search: the initial guess kept in the bounds, or the centroid of
+        the gateways weighted by 1 / (1 + d / 1km) with d the extra distance traveled to them
+        (the earliest receptions come from the nearest gateways)"""
+        if self._initial_guess is not None:
+            gx, gy = self._proj.point_to_x_y(self._initial_guess)
+            return [min(max(gx, bounds[0][0]), bounds[1][0]), min(max(gy, bounds[0][1]), bounds[1][1])]
+        weights = 1. / (1. + SPEED_OF_LIGHT * (dt - dt.min()) / 1000.)
+        return [np.dot(weights, x) / weights.sum(), np.dot(weights, y) / weights.sum()]
+
     def _compute_geolocalization(self):
-        x0, y0 = self._proj.lat_long_to_x_y(self._uplinks[0].gateway.lat, self._uplinks[0].gateway.lon)
-        solution = least_squares(self._lsm_loss_clojure(), [x0, y0])
-        lon, lat = self._proj.x_y_to_long_lat(solution["x"][0], solution["x"][1])
-        self.is_resolved = True
+        with stage('lsm.projection'):
+            x, y, dt = self._project_gateways()
+        with stage('lsm.least_squares'):
+            bounds = self._search_bounds(x, y)
+            solution = least_squares(self._lsm_residuals_clojure(x, y, dt), self._start(x, y, dt, bounds), \
+                jac=self._lsm_jacobian_clojure(x, y), bounds=bounds, \
+                ftol=self._ftol, xtol=self._xtol, max_nfev=self._max_nfev)
+        self.nfev = solution.nfev
+        self.njev = solution.njev
+        self.cost = solution.cost
+        self.status = solution.status
+        count('lsm.nfev', solution.nfev)
+        count('lsm.njev', solution.njev)
+
+        with stage('lsm.back_projection'):
+            lon, lat = self._proj.x_y_to_long_lat(solution.x[0], solution.x[1])
+        self.is_resolved = solution.success
         self.geolocalized_device = point(lat, lon)
 
 
@@ -0,0 +1,173 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import math
+import numpy as np
+
+from ..utils.utils import SPEED_OF_LIGHT, combinations, combinations_count
+from ..utils.instrumentation import stage, count
+from ..model.point import point
+from ..model.projection import projection
+from ..model.uplink import uplink
+from tdoa import tdoa_linear_systems, solve_linear_systems
+from lsm import lsm
+
+"""
+The aim of this lib is to compute the geolocalization of a device robust to outlier gateways (NLOS,
+bad clock) by random sample consensus:
+    - the device is fitted on subsets of 4 gateways by the linear tdoa, a round of subsets at once
+    - a gateway agrees with a fit when its tdoa residual is under threshold: with
+      Em = |P - Gm| - v * Tm, the residual is |Em - E| where E is the median of the subset values
+    - the search stops when the best consensus makes another subset with more inliers unlikely:
+      after log(1 - confidence) / log(1 - w ^ 4) subsets, w the inlier ratio
+    - the device is refitted by lsm on the inliers of the best consensus, starting from its fit,
+      without a consensus of at least 3 gateways the device is not resolved
+   .
+  / \
+ / ! \   => Robustness needs redundancy: with less than 5 gateways an outlier can not be detected
+/_____\     and all of them are used
+
+"""
+
+SUBSET_SIZE = 4
+
+
+class ransac:
+    """This class handle the random sample consensus process"""
+
+    def __init__(self, uplink_list, projection_system='epsg:2192', threshold=300., confidence=.99, \
+        max_subsets=500, round_size=32, seed=0, initial_guess=None, **lsm_options):
+        """ransac constructor
+
+        Args:
+            uplink_list: a List of at least 4 uplinks to consider
+            projection_system: The projection system name to use. (string)
+                please choose your projection  http://spatialreference.org/ref/epsg/2192/
+            threshold: maximal tdoa residual (meter) of an inlier gateway
+            confidence: probability to draw at least one subset of inliers before stopping
+            max_subsets: maximal number of subsets fitted
+            round_size: number of subsets fitted at once
+            seed: seed of the random subsets, for reproducible results
+            initial_guess: optional point where the refit of 4 gateways (no consensus search) starts
+            lsm_options: extra parameters of the lsm refit (ftol, xtol, max_nfev)
+        """
+        if not isinstance(uplink_list, list) or len(uplink_list) < SUBSET_SIZE:
+            raise ValueError("Incorrect uplink_list is not a list or not enough uplink")
+        if not isinstance(projection_system, str):
+            raise ValueError("Incorrect projection_system")
+        for uplk in uplink_list:
+            if not isinstance(uplk, uplink):
+                raise ValueError("Invalid item in uplink_list is not a uplink")
+        #check gateway uniqueness
+        for i, uplk in enumerate(uplink_list):
+            for j in xrange(i+1, len(uplink_list)):
+                if uplink_list[i].gateway == uplink_list[j].gateway:
+                    raise ValueError("Gateway is not unique")
+        if threshold <= 0 or not 0 < confidence < 1 or max_subsets < 1 or round_size < 1:
+            raise ValueError("Incorrect ransac parameters")
+
+        # PUBLIC
+        self.geolocalized_device = point(.0, .0)
+        self.is_resolved = False
+        # True when the inliers come from a consensus (False with 4 gateways or when no consensus
+        # was found), indexes of the inlier uplinks, number of subsets fitted, lsm evaluations of the refit
+        self.consensus = False
+        self.inliers = []
+        self.subsets = 0
+        self.nfev = 0
+
+        # PRIVATE
+        self._uplinks = uplink_list
+        self._level = len(uplink_list)
+        self._proj = projection(projection_system)
+        self._projection_system = projection_system
+        self._threshold = threshold
+        self._confidence = confidence
+        self._max_subsets = max_subsets
+        self._round_size = round_size
+        self._random = np.random.RandomState(seed)
+        self._initial_guess = initial_guess
+        self._lsm_options = lsm_options
+
+        # compute the consensus
+        self._compute_geolocalization()
+
+    def _draw_subsets(self):
+        """The subsets of gateway indexes to fit, in random order, shape (S, 4)"""
+        n = self._level
+        if combinations_count(n, SUBSET_SIZE) <= self._max_subsets:
+            return self._random.permutation(combinations(n, SUBSET_SIZE))
+        # distinct indexes of every row: the first columns of random permutations
+        return np.argsort(self._random.rand(self._max_subsets, n), axis=1)[:, :SUBSET_SIZE]
+
+    def _required_subsets(self, inlier_ratio):
+        """Number of subsets to draw to get one subset of inliers with the confidence"""
+        if inlier_ratio >= 1.:
+            return 0
+        all_inliers = inlier_ratio ** SUBSET_SIZE
+        if all_inliers <= 0.:
+            return self._max_subsets
+        return int(math.ceil(math.log(1. - self._confidence) / math.log(1. - all_inliers)))
+
+    def _score(self, x, y, dd, subsets, positions):
+        """Inlier masks of the fits of a round, shape (S, N)"""
+        # Em = |P - Gm| - v * Tm is the same for all the gateways of a consistent fit
+        offsets = np.hypot(x[None, :] - positions[:, :1], y[None, :] - positions[:, 1:]) - dd[None, :]
+        reference = np.median(offsets[np.arange(len(subsets))[:, None], subsets], axis=1)
+        return np.abs(offsets - reference[:, None]) <= self._threshold
+
+    def _consensus(self, x, y, timestamps):
+        """Fit the subsets round by round, return the best inlier mask and its fit (None if none)"""
+        dd = SPEED_OF_LIGHT * (timestamps - timestamps[0]).astype(float)
+        subsets = self._draw_subsets()
+        best_mask, best_position = None, None
+        required = len(subsets)
+        while self.subsets < min(required, len(subsets)):
+            batch = subsets[self.subsets:self.subsets + self._round_size]
+            self.subsets += len(batch)
+            matrices, rhs = tdoa_linear_systems(x[batch], y[batch], timestamps[batch])
+            solutions, resolved = solve_linear_systems(matrices, rhs)
+            if not np.any(resolved):
+                continue
+            # the solutions are relative to the pivot, the first gateway of the subset
+            batch, solutions = batch[resolved], solutions[resolved]
+            positions = np.column_stack((x[batch[:, 0]] + solutions[:, 0], y[batch[:, 0]] + solutions[:, 1]))
+            masks = self._score(x, y, dd, batch, positions)
+            best = np.argmax(masks.sum(axis=1))
+            if best_mask is None or masks[best].sum() > best_mask.sum():
+                best_mask, best_position = masks[best], positions[best]
+                required = self._required_subsets(best_mask.sum() / float(self._level))
+        count('ransac.subsets', self.subsets)
+        return best_mask, best_position
+
+    def _compute_geolocalization(self):
+        with stage('ransac.projection'):
+            x, y = self._proj.points_to_x_y([uplk.gateway for uplk in self._uplinks])
+            x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+            timestamps = np.array([uplk.timestamp for uplk in self._uplinks], dtype=np.int64)
+
+        start = self._initial_guess
+        inliers = range(self._level)
+        if self._level > SUBSET_SIZE:
+            with stage('ransac.subsets'):
+                mask, position = self._consensus(x, y, timestamps)
+            if mask is None or mask.sum() < 3:
+                # refitting all the gateways would hide the outliers: not resolved
+                count('ransac.no_consensus')
+                return
+            self.consensus = True
+            inliers = [int(i) for i in np.flatnonzero(mask)]
+            lon, lat = self._proj.x_y_to_long_lat(position[0], position[1])
+            try:
+                start = point(lat, lon)
+            except ValueError:
+                # the consensus position is out of the range of the projection
+                pass
+
+        with stage('ransac.refit'):
+            refit = lsm([self._uplinks[i] for i in inliers], self._projection_system, initial_guess=start, \
+                **self._lsm_options)
+        self.inliers = inliers
+        self.nfev = refit.nfev
+        self.is_resolved = refit.is_resolved
+        self.geolocalized_device = refit.geolocalized_device
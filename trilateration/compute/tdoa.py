@@ -4,20 +4,22 @@
 import time
 import pyproj
 import datetime
-from sympy import Symbol, sqrt, Eq, Abs
-from sympy.solvers import solve
-from sympy import linsolve
+import numpy as np
 
 from ..utils.utils import SPEED_OF_LIGHT
+from ..utils.instrumentation import stage, count
 from ..model.point import point
 from ..model.projection import projection
 from ..model.uplink import uplink
 from ..model.gateway import gateway
 
 """
-The aim of this lib is to compute the geolocalization of a device by the time difference of arrival at 3 gateways.
+The aim of this lib is to compute the geolocalization of a device by the time difference of arrival at
+at least 4 gateways.
 
-=> we will store the interesting points in the different usecases and return the center of them
+The linearized equations of all the gateways (see tdoa_linear_systems) are solved in one least squares
+call, optionally weighted by the timestamp quality of the gateways: more gateways than 4 average out
+the timestamp errors.
    .
   / \
  / ! \   => We can not compute the response if we have the same gateway twice
@@ -27,16 +29,22 @@ The aim of this lib is to compute the geolocalization of a device by the time di
 class tdoa:
     """This class handle all the tdoa process"""
 
-    def __init__(self, uplink_list, projection_system='epsg:2192'):
+    def __init__(self, uplink_list, projection_system='epsg:2192', timestamp_std=None, max_residual=1000., \
+        max_condition=1e8):
         """tdoa constructor
 
         Args:
-            uplink_list: a List of 4 uplinks to consider to compute the tdoa
+            uplink_list: a List of at least 4 uplinks to consider to compute the tdoa
             projection_system: The projection system name to use. (string)
                 please choose your projection  http://spatialreference.org/ref/epsg/2192/
+            timestamp_std: optional std (nanosecond) of the timestamp of every uplink, the equations
+                of the precise gateways weight more
+            max_residual: maximal rms (meter) of the range difference residuals of a resolved device,
+                see _check_solutions
+            max_condition: maximal condition number of the least squares system of a resolved device
         """
-        if not isinstance(uplink_list, list) or len(uplink_list) != 4:
-            raise ValueError("Incorrect uplink_list is not a list")
+        if not isinstance(uplink_list, list) or len(uplink_list) < 4:
+            raise ValueError("Incorrect uplink_list is not a list or not enough uplink")
         if not isinstance(projection_system, str):
             raise ValueError("Incorrect projection_system")
         for uplk in uplink_list:
@@ -47,15 +55,27 @@ class tdoa:
             for j in xrange(i+1, len(uplink_list)):
                 if uplink_list[i].gateway == uplink_list[j].gateway:
                     raise ValueError("Gateway is not unique")
+        if timestamp_std is not None:
+            timestamp_std = np.asarray(timestamp_std, dtype=float)
+            if timestamp_std.shape != (len(uplink_list),) or np.any(timestamp_std <= 0):
+                raise ValueError("Incorrect timestamp_std, a positive std per uplink is expected")
+        if max_residual <= 0 or max_condition <= 1:
+            raise ValueError("Incorrect max_residual or max_condition")
 
         # PUBLIC
         self.geolocalized_device = point(.0, .0)
         self.is_resolved = False
+        # range difference residuals (meter) of the gateways against the pivot, condition number
+        # of the least squares system
+        self.residuals = None
+        self.condition_number = np.inf
 
         # PRIVATE
         self._uplinks = uplink_list
         self._level = len(uplink_list)
-        self._equations = []
+        self._timestamp_std = timestamp_std
+        self._max_residual = max_residual
+        self._max_condition = max_condition
         self._intersections = []
         self._proj = projection(projection_system)
         
@@ -67,7 +87,7 @@ class tdoa:
     def _compute_intersections(self):
         """
         Algorithm:
-        The goal is to resolve the equation:with a least 4 gatreways (2, 3, 4)
+        The goal is to resolve the equation:with a least 4 gatreways (2, 3, 4, ...)
         x * Am + y * Bm + z * Cm + Dm = 0   
             => mat A * mat X = - mat B
 
@@ -83,33 +103,40 @@ class tdoa:
                 Am = (2 * Xm) / (v * Tm) - (2 * X1) / (v * T1)
                 Bm = (2 * Ym) / (v * Tm) - (2 * Y1) / (v * T1)
                 Dm = v * Tm - v * T1 - (Xm * Xm + Ym * Ym) / (v * Tm) + (X1 * X1 + Y1 * Y1) / (v * T1)
-        """
-        x, y = Symbol('x'), Symbol('y')
-
-        # Pivot values
-        x0, y0 = self._proj.lat_long_to_x_y(self._uplinks[0].gateway.lat, self._uplinks[0].gateway.lon)
-        t0 = self._uplinks[0].timestamp
-
-        # delta 1
-        x1, y1 = self._proj.lat_long_to_x_y(self._uplinks[1].gateway.lat, self._uplinks[1].gateway.lon)
-        t1 = self._uplinks[1].timestamp
-        dx1, dy1, dt1 = x1 - x0, y1 - y0, t1 - t0
 
-        for i in xrange(2, len(self._uplinks)):
-            # delta n
-            gw_x, gw_y = self._proj.lat_long_to_x_y(self._uplinks[i].gateway.lat, self._uplinks[i].gateway.lon)
-            gw_ts = self._uplinks[i].timestamp
-            dxn, dyn, dtn = gw_x - x0, gw_y - y0, gw_ts - t0
+        The equations are solved before their division by v * Tm (see tdoa_linear_systems), with the
+        distance from the device to the pivot as third unknown, which gives one least squares system
+        of N - 1 equations for N gateways.
+        """
+        with stage('tdoa.equations'):
+            x, y = self._proj.points_to_x_y([uplk.gateway for uplk in self._uplinks])
+            x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+            timestamps = np.array([uplk.timestamp for uplk in self._uplinks], dtype=np.int64)
+            matrices, rhs = tdoa_linear_systems(x[None, :], y[None, :], timestamps[None, :])
+            matrix, rhs = matrices[0], rhs[0]
+            if self._timestamp_std is not None:
+                # an equation holds the errors of its gateway and of the pivot
+                weights = 1. / np.hypot(self._timestamp_std[1:], self._timestamp_std[0])
+                matrix, rhs = matrix * weights[:, None], rhs * weights
 
-            # algorithm explained previously
-            A = (2 * dxn / SPEED_OF_LIGHT * dtn) - (2 * dx1 / SPEED_OF_LIGHT * dt1)
-            B = (2 * dyn / SPEED_OF_LIGHT * dtn) - (2 * dy1 / SPEED_OF_LIGHT * dt1)
-            D = SPEED_OF_LIGHT * (dtn - dt1) - ((dxn**2 + dyn**2) / SPEED_OF_LIGHT * dtn) + ((dx1**2 + dy1**2) / SPEED_OF_LIGHT * dt1)
-            self._equations.append( A * x + B * y + D )
+        with stage('tdoa.solve'):
+            solutions, resolved = solve_linear_systems(matrix[None], rhs[None])
+        if not resolved[0]:
+            return
+        residuals, condition, resolved = _check_solutions(x[None, :], y[None, :], timestamps[None, :], \
+            matrix[None], solutions, resolved, self._max_residual, self._max_condition)
+        self.residuals, self.condition_number = residuals[0], float(condition[0])
+        if not resolved[0]:
+            return
 
-        solution = list(linsolve(self._equations, (x,y)))
-        lon, lat = self._proj.x_y_to_long_lat(x0 + solution[0][0], y0 + solution[0][1])
-        self._intersections.append(point(lat, lon))
+        device_x, device_y = x[0] + solutions[0, 0], y[0] + solutions[0, 1]
+        with stage('tdoa.back_projection'):
+            lon, lat = self._proj.x_y_to_long_lat(device_x, device_y)
+        try:
+            self._intersections.append(point(lat, lon))
+        except ValueError:
+            # the solution is out of the range of the projection
+            return
 
 
     def _compute_geolocalization(self):
@@ -128,6 +155,192 @@ class tdoa:
         self.geolocalized_device = point(mean_lat, mean_lon)
 
 
+def tdoa_linear_systems(x, y, timestamps):
+    """Build the stacked linear systems of the tdoa algorithm
+
+    The pivot is the first gateway of each message, coordinates and times are taken relatively to it.
+    For each other gateway m, with r the distance from the device to the pivot:
+        2 * Xm * x + 2 * Ym * y + 2 * v * Tm * r = Xm * Xm + Ym * Ym - (v * Tm) ** 2
+
+    These are the equations of the tdoa docstring algorithm before they are divided by v * Tm,
+    so a gateway receiving at the same time than the pivot stays solvable.
+
+    Args:
+        x, y: projected gateways coordinates, arrays of shape (N, M)
+        timestamps: nanosecond timestamps, int64 array of shape (N, M)
+
+    Returns:
+        The matrices of shape (N, M - 1, 3) and the right hand sides of shape (N, M - 1)
+    """
+    dx = x[:, 1:] - x[:, :1]
+    dy = y[:, 1:] - y[:, :1]
+    # integer difference first: float64 can not hold a nanosecond epoch timestamp
+    dd = SPEED_OF_LIGHT * (timestamps[:, 1:] - timestamps[:, :1]).astype(float)
+
+    matrices = 2. * np.stack([dx, dy, dd], axis=-1)
+    rhs = dx**2 + dy**2 - dd**2
+    return matrices, rhs
+
+
+def solve_linear_systems(matrices, rhs, rcond=1e-12):
+    """Least squares solution of stacked 3 unknowns linear systems
+
+    The normal equations of every system are inverted at once with the cofactors (cross products) of
+    their 3x3 matrix, which is much cheaper than a batched numpy.linalg call on tiny matrices.
+
+    Gateways receiving all at the same time leave the third unknown (distance to the pivot) undetermined,
+    the device is still on their perpendicular bisectors: these systems are solved in x and y only.
+
+    Args:
+        matrices: array of shape (N, K, 3)
+        rhs: array of shape (N, K)
+        rcond: relative determinant (Hadamard bound) under which a system is considered singular
+
+    Returns:
+        The solutions of shape (N, 3) and a boolean array flagging the well defined ones
+    """
+    normal = np.einsum('nki,nkj->nij', matrices, matrices)
+    normal_rhs = np.einsum('nki,nk->ni', matrices, rhs)
+    same_time = ~np.any(matrices[:, :, 2], axis=1)
+    if np.any(same_time):
+        # the identity equation r = 0 replaces the empty third one
+        normal[same_time, 2, 2] = 1.
+
+    c0, c1, c2 = normal[:, 0], normal[:, 1], normal[:, 2]
+    cofactors = np.stack([np.cross(c1, c2), np.cross(c2, c0), np.cross(c0, c1)], axis=1)
+    det = np.einsum('ni,ni->n', c0, cofactors[:, 0])
+    bound = np.prod(np.sqrt(np.einsum('nij,nij->ni', normal, normal)), axis=1)
+
+    resolved = np.abs(det) > rcond * bound
+    det = np.where(resolved, det, 1.)
+    solutions = np.einsum('nij,nj->ni', cofactors, normal_rhs) / det[:, None]
+    resolved &= np.all(np.isfinite(solutions), axis=1)
+    return solutions, resolved
+
+
+def _check_solutions(x, y, timestamps, matrices, solutions, resolved, max_residual, max_condition):
+    """Reject the solutions of stacked tdoa systems which do not explain the timestamps
+
+    A nearly singular system (ex: almost aligned gateways) still has an exact solution, which can be
+    anywhere. A device is kept when:
+        - the rms of its range difference residuals is under max_residual
+        - the distance to the pivot solved as third unknown agrees with the distance of the device to
+          the pivot, within the size of the gateways network (or max_residual if larger)
+        - the condition number of its system is under max_condition
+
+    Args:
+        x, y: projected gateways coordinates, arrays of shape (N, M)
+        timestamps: nanosecond timestamps, int64 array of shape (N, M)
+        matrices, solutions, resolved: the systems and the results of solve_linear_systems
+        max_residual: maximal rms (meter) of the residuals
+        max_condition: maximal condition number of the systems
+
+    Returns:
+        The residuals (meter) of shape (N, M - 1), the condition numbers of shape (N,) and the
+        resolved flags updated
+    """
+    device_x = x[:, 0] + solutions[:, 0]
+    device_y = y[:, 0] + solutions[:, 1]
+    distances = np.hypot(x - device_x[:, None], y - device_y[:, None])
+    residuals = distances[:, 1:] - distances[:, :1] - \
+        SPEED_OF_LIGHT * (timestamps[:, 1:] - timestamps[:, :1]).astype(float)
+    rms = np.sqrt(np.mean(residuals**2, axis=1))
+
+    same_time = ~np.any(matrices[:, :, 2], axis=1)
+    extent = np.hypot(x[:, 1:] - x[:, :1], y[:, 1:] - y[:, :1]).max(axis=1)
+    range_error = np.where(same_time, 0., np.abs(solutions[:, 2] - distances[:, 0]))
+
+    # the distance to the pivot is not an unknown of the same time systems
+    condition = np.full(len(matrices), np.inf)
+    for columns, rows in ((3, ~same_time), (2, same_time)):
+        if np.any(rows):
+            singular_values = np.linalg.svd(matrices[rows, :, :columns], compute_uv=False)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                condition[rows] = singular_values[:, 0] / singular_values[:, -1]
+    condition[~np.isfinite(condition)] = np.inf
+
+    resolved = resolved & (rms <= max_residual) & (range_error <= np.maximum(extent, max_residual)) & \
+        (condition <= max_condition)
+    return residuals, condition, resolved
+
+
+def tdoa_batch(gateways_lat, gateways_lon, timestamps, projection_system='epsg:2192', max_residual=1000., \
+    max_condition=1e8):
+    """Compute the tdoa geolocalization of N messages at once
+
+    Args:
+        gateways_lat: latitudes of the gateways, array of shape (N, M) (one row per message, M >= 4)
+        gateways_lon: longitudes of the gateways, array of shape (N, M)
+        timestamps: nanosecond arrival timestamps, integer array of shape (N, M)
+        projection_system: The projection system name to use. (string)
+            please choose your projection  http://spatialreference.org/ref/epsg/2192/
+        max_residual, max_condition: rejection of the inconsistent devices, see tdoa
+
+    Returns:
+        lat, lon, is_resolved arrays of shape (N,), lat and lon are nan where not resolved
+    """
+    if not isinstance(projection_system, str):
+        raise ValueError("Incorrect projection_system")
+    gateways_lat = np.asarray(gateways_lat, dtype=float)
+    gateways_lon = np.asarray(gateways_lon, dtype=float)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if gateways_lat.ndim != 2 or gateways_lat.shape[1] < 4:
+        raise ValueError("Incorrect gateways, at least 4 gateways per message are expected")
+    if gateways_lon.shape != gateways_lat.shape or timestamps.shape != gateways_lat.shape:
+        raise ValueError("Gateways and timestamps shapes differ")
+
+    proj = projection(projection_system)
+    with stage('tdoa_batch.projection'):
+        x, y = proj.lat_long_to_x_y(gateways_lat, gateways_lon)
+    return _tdoa_batch_x_y(np.asarray(x, dtype=float), np.asarray(y, dtype=float), timestamps, proj, \
+        max_residual, max_condition)
+
+
+def tdoa_uplink_batch(batch, uplinks=4, max_residual=1000., max_condition=1e8):
+    """Compute the tdoa geolocalization of the messages of an uplink_batch having a number of uplinks
+
+    The gateways coordinates already projected by the registry of the batch are used.
+
+    Args:
+        batch: the uplink_batch
+        uplinks: the number of uplinks (at least 4) of the messages to solve
+        max_residual, max_condition: rejection of the inconsistent devices, see tdoa
+
+    Returns:
+        message_ids, lat, lon, is_resolved arrays of the messages with this number of uplinks
+    """
+    if uplinks < 4:
+        raise ValueError("Incorrect uplinks, at least 4 uplinks are expected")
+    message_ids, gateway_indexes, timestamps = batch.fixed_size(uplinks)
+    _, _, registry_x, registry_y = batch.registry.coordinates()
+    lat, lon, resolved = _tdoa_batch_x_y(registry_x[gateway_indexes], registry_y[gateway_indexes], timestamps, \
+        projection(batch.registry.projection_system), max_residual, max_condition)
+    return message_ids, lat, lon, resolved
+
+
+def _tdoa_batch_x_y(x, y, timestamps, proj, max_residual, max_condition):
+    """Solve the stacked tdoa systems of projected gateways, see tdoa_batch"""
+    count('tdoa_batch.messages', len(timestamps))
+    with stage('tdoa_batch.equations'):
+        matrices, rhs = tdoa_linear_systems(x, y, timestamps)
+    with stage('tdoa_batch.solve'):
+        solutions, resolved = solve_linear_systems(matrices, rhs)
+        _, _, resolved = _check_solutions(x, y, timestamps, matrices, solutions, resolved, max_residual, max_condition)
+
+    lat = np.full(len(resolved), np.nan)
+    lon = np.full(len(resolved), np.nan)
+    if np.any(resolved):
+        with stage('tdoa_batch.back_projection'):
+            lo, la = proj.x_y_to_long_lat(x[resolved, 0] + solutions[resolved, 0], \
+                y[resolved, 0] + solutions[resolved, 1])
+        la, lo = np.asarray(la, dtype=float), np.asarray(lo, dtype=float)
+        # the solutions out of the range of the projection are not resolved, see point
+        valid = (np.abs(la) <= 90) & (np.abs(lo) <= 180)
+        lat[resolved], lon[resolved] = np.where(valid, la, np.nan), np.where(valid, lo, np.nan)
+        resolved[resolved] = valid
+    return lat, lon, resolved
+
+
 # Test the lib
 if __name__ == '__main__':
     g1 = gateway(48.84, 2.26)
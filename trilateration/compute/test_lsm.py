@@ -2,6 +2,7 @@ import unittest
 
 import time
 import datetime
+import math
 
 from lsm import lsm
 from ..model.point import point
@@ -92,6 +93,24 @@ class Test_lsm(unittest.TestCase):
         self.assertTrue(solver.is_resolved)
 
 
+    def test_exact_timestamps(self):
+        proj = projection()
+        device_x, device_y = proj.lat_long_to_x_y(48.83, 2.29)
+        uplinks = []
+        for lat, lon in [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40), (48.80, 2.22)]:
+            x, y = proj.lat_long_to_x_y(lat, lon)
+            distance = math.sqrt((x - device_x)**2 + (y - device_y)**2)
+            t = 1495456868630584064 + int(round(distance / SPEED_OF_LIGHT))
+            uplinks.append(uplink(gateway(lat, lon), datetime.datetime.now(), t))
+
+        solver = lsm(uplinks)
+        self.assertTrue(solver.is_resolved)
+        self.assertAlmostEqual(solver.geolocalized_device.lat, 48.83, delta=.00001)
+        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.29, delta=.00001)
+        self.assertTrue(0 < solver.nfev < 20)
+        self.assertTrue(solver.status > 0)
+        self.assertTrue(solver.cost < 1.)
+
     # =============================================== ERROR CHECKING
     def test_only_one_uplink(self):
         g1 = gateway(48.84, 2.26)
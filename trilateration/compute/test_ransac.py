@@ -0,0 +1,113 @@
+import unittest
+
+import datetime
+import numpy as np
+
+from ransac import ransac
+from lsm import lsm
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..utils.utils import SPEED_OF_LIGHT
+from ..model.projection import projection
+# do not forget to use nose2 at root to run test
+
+GATEWAYS = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.80, 2.22), (48.83, 2.20), (48.86, 2.24), \
+    (48.78, 2.26), (48.82, 2.33)]
+DEVICE = (48.82, 2.27)
+
+
+def _uplinks(outliers=(), noise_ns=20, coordinates=GATEWAYS, seed=0):
+    """Uplinks of DEVICE, the outlier gateways receive 10 us late (NLOS)"""
+    proj = projection()
+    x, y = proj.lat_long_to_x_y(DEVICE[0], DEVICE[1])
+    rand = np.random.RandomState(seed)
+    uplinks = []
+    for i, (lat, lon) in enumerate(coordinates):
+        gw_x, gw_y = proj.lat_long_to_x_y(lat, lon)
+        delay = int(round(np.hypot(gw_x - x, gw_y - y) / SPEED_OF_LIGHT)) + int(round(noise_ns * rand.randn()))
+        uplinks.append(uplink(gateway(lat, lon), datetime.datetime.now(), \
+            1495456868630584064 + delay + (10000 if i in outliers else 0)))
+    return uplinks
+
+
+def _error(a_point):
+    proj = projection()
+    x, y = proj.point_to_x_y(a_point)
+    device_x, device_y = proj.lat_long_to_x_y(DEVICE[0], DEVICE[1])
+    return np.hypot(x - device_x, y - device_y)
+
+
+class Test_ransac(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_ransac_creation(self):
+        uplinks = _uplinks()
+        solver = ransac(uplinks)
+
+        self.assertEqual(solver._level, 8)
+        self.assertEqual(solver._uplinks, uplinks)
+        self.assertTrue(solver.is_resolved)
+
+    def test_required_subsets(self):
+        solver = ransac(_uplinks(), confidence=.99)
+        self.assertEqual(solver._required_subsets(1.), 0)
+        self.assertEqual(solver._required_subsets(.5), 72)
+        self.assertEqual(solver._required_subsets(0.), solver._max_subsets)
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_no_outlier(self):
+        solver = ransac(_uplinks())
+        self.assertEqual(solver.inliers, range(8))
+        self.assertLess(_error(solver.geolocalized_device), 50.)
+
+    def test_outliers(self):
+        uplinks = _uplinks(outliers=(2, 5))
+        solver = ransac(uplinks)
+        self.assertTrue(solver.is_resolved)
+        self.assertTrue(solver.consensus)
+        self.assertEqual(solver.inliers, [0, 1, 3, 4, 6, 7])
+        self.assertLess(_error(solver.geolocalized_device), 50.)
+        self.assertGreater(_error(lsm(uplinks).geolocalized_device), 200.)
+
+    def test_early_termination(self):
+        # all the gateways agree with the first round of subsets
+        solver = ransac(_uplinks(), round_size=8)
+        self.assertEqual(solver.subsets, 8)
+
+    def test_sampled_subsets(self):
+        coordinates = [(48.78 + .01 * (i % 5), 2.20 + .03 * (i // 5)) for i in xrange(15)]
+        solver = ransac(_uplinks(outliers=(3,), coordinates=coordinates), max_subsets=200)
+        self.assertLessEqual(solver.subsets, 200)
+        self.assertFalse(3 in solver.inliers)
+        self.assertLess(_error(solver.geolocalized_device), 50.)
+
+    def test_no_consensus(self):
+        # no 3 gateways agree within 1 cm
+        solver = ransac(_uplinks(noise_ns=200), threshold=.01)
+        self.assertFalse(solver.consensus)
+        self.assertFalse(solver.is_resolved)
+        self.assertEqual(solver.inliers, [])
+
+    def test_four_gateways(self):
+        solver = ransac(_uplinks(coordinates=GATEWAYS[:4]))
+        self.assertFalse(solver.consensus)
+        self.assertEqual(solver.subsets, 0)
+        self.assertEqual(solver.inliers, range(4))
+        self.assertLess(_error(solver.geolocalized_device), 50.)
+
+    # =============================================== ERROR CHECKING
+    def test_three_gateways(self):
+        self.assertRaises(ValueError, lambda: ransac(_uplinks(coordinates=GATEWAYS[:3])))
+
+    def test_same_gateway(self):
+        uplinks = _uplinks()
+        self.assertRaises(ValueError, lambda: ransac(uplinks + uplinks[:1]))
+
+    def test_incorrect_parameters(self):
+        self.assertRaises(ValueError, lambda: ransac(_uplinks(), threshold=0))
+        self.assertRaises(ValueError, lambda: ransac(_uplinks(), confidence=1.))
+        self.assertRaises(ValueError, lambda: ransac(_uplinks(), projection_system=42))
+
+if __name__ == '__main__':
+    unittest.main()
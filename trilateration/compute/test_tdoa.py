@@ -2,15 +2,36 @@ import unittest
 
 import time
 import datetime
+import numpy as np
 
-from tdoa import tdoa
+from tdoa import tdoa, tdoa_batch, tdoa_uplink_batch, _tdoa_batch_x_y
 from ..model.point import point
 from ..model.uplink import uplink
 from ..model.gateway import gateway
 from ..utils.utils import SPEED_OF_LIGHT
 from ..model.projection import projection
+from ..model.uplink_batch import uplink_batch
+from ..model.gateway_registry import gateway_registry
 # do not forget to use nose2 at root to run test
 
+def _uplinks(device, coordinates, noise_ns=None, seed=0):
+    """Uplinks of a device received by gateways at coordinates, with an optional timestamp noise"""
+    proj = projection()
+    x, y = proj.lat_long_to_x_y(device[0], device[1])
+    rand = np.random.RandomState(seed)
+    uplinks = []
+    for i, (lat, lon) in enumerate(coordinates):
+        gw_x, gw_y = proj.lat_long_to_x_y(lat, lon)
+        noise = 0 if noise_ns is None else int(round(noise_ns[i] * rand.randn()))
+        uplinks.append(uplink(gateway(lat, lon), datetime.datetime.now(), \
+            1495456868630584064 + int(round(np.hypot(gw_x - x, gw_y - y) / SPEED_OF_LIGHT)) + noise))
+    return uplinks
+
+
+GATEWAYS = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.80, 2.22), (48.83, 2.20), (48.86, 2.24), \
+    (48.78, 2.26), (48.82, 2.33)]
+
+
  
 class Test_tdoa(unittest.TestCase):
     
@@ -33,37 +54,20 @@ class Test_tdoa(unittest.TestCase):
 
     # =============================================== FUNCTIONNAL TEST
     def test_trilateration_compute_random(self):
-        g1 = gateway(48.84, 2.26)
-        g2 = gateway(48.84, 2.30)
-        g3 = gateway(48.80, 2.30)
-        g4 = gateway(48.90, 2.40)
-
-        u1 = uplink(g1, datetime.datetime.now(), int(time.time() * 1000000000))
-        u2 = uplink(g2, datetime.datetime.now(), int(time.time() * 1000000000))
-        u3 = uplink(g3, datetime.datetime.now(), int(time.time() * 1000000000))
-        u4 = uplink(g4, datetime.datetime.now(), int(time.time() * 1000000000))
-
-        solver = tdoa([u1, u2, u3, u4])
+        solver = tdoa(_uplinks((48.832071, 2.391112), [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]))
 
-        # user of delta because of 2 occurences of times are different
-        self.assertAlmostEqual(solver.geolocalized_device.lat, 48.832071, delta=1.0)
-        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.391112, delta=1.0)
+        self.assertTrue(solver.is_resolved)
+        self.assertAlmostEqual(solver.geolocalized_device.lat, 48.832071, delta=.0001)
+        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.391112, delta=.0001)
 
     def test_same_time(self):
-        g1 = gateway(48.84, 2.26)
-        g2 = gateway(48.84, 2.30)
-        g3 = gateway(48.80, 2.30)
-        g4 = gateway(48.90, 2.40)
-
-        t = int(time.time() * 1000000000)
-
-        u1 = uplink(g1, datetime.datetime.now(), t)
-        u2 = uplink(g2, datetime.datetime.now(), t)
-        u3 = uplink(g3, datetime.datetime.now(), int(time.time() * 1000000000))
-        u4 = uplink(g4, datetime.datetime.now(), int(time.time() * 1000000000))
+        # the device is at the same distance of the 2 first gateways
+        u1, u2, u3, u4 = _uplinks((48.82, 2.28), [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)])
+        u2 = uplink(u2.gateway, datetime.datetime.now(), u1.timestamp)
 
         solver = tdoa([u1, u2, u3, u4])
         self.assertTrue(solver.is_resolved)
+        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.28, delta=.001)
 
     def test_2_same_gateways(self):
         g1 = gateway(48.84, 2.26)
@@ -102,7 +106,160 @@ class Test_tdoa(unittest.TestCase):
 
         self.assertRaises(ValueError, lambda: tdoa([u1, u2, u3, u4]))
 
+    def test_tdoa_batch(self):
+        proj = projection()
+        gateways_lat = np.array([48.84, 48.84, 48.80, 48.90])
+        gateways_lon = np.array([2.26, 2.30, 2.30, 2.40])
+        gw_x, gw_y = proj.lat_long_to_x_y(gateways_lat, gateways_lon)
+        devices = [(48.83, 2.29), (48.86, 2.33), (48.82, 2.27)]
+
+        timestamps = []
+        for lat, lon in devices:
+            x, y = proj.lat_long_to_x_y(lat, lon)
+            distances = np.hypot(np.array(gw_x) - x, np.array(gw_y) - y)
+            timestamps.append([1495456868630584064 + int(round(d / SPEED_OF_LIGHT)) for d in distances])
+
+        lat, lon, resolved = tdoa_batch(np.tile(gateways_lat, (3, 1)), np.tile(gateways_lon, (3, 1)), timestamps)
+        self.assertTrue(np.all(resolved))
+        for i, (device_lat, device_lon) in enumerate(devices):
+            self.assertAlmostEqual(lat[i], device_lat, delta=.0001)
+            self.assertAlmostEqual(lon[i], device_lon, delta=.0001)
+
+    def test_tdoa_batch_same_gateways(self):
+        t = 1495456868630584064
+        lat, lon, resolved = tdoa_batch([[48.84, 48.84, 48.84, 48.84]], [[2.26, 2.26, 2.26, 2.26]], [[t, t, t, t]])
+        self.assertFalse(resolved[0])
+        self.assertTrue(np.isnan(lat[0]))
+
+    def test_tdoa_uplink_batch(self):
+        registry = gateway_registry()
+        proj = projection()
+        device_x, device_y = proj.lat_long_to_x_y(48.83, 2.29)
+        ids, indexes, timestamps = [], [], []
+        for i, (lat, lon) in enumerate([(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]):
+            g = registry.add(i, lat, lon)
+            distance = np.hypot(g.x - device_x, g.y - device_y)
+            for message in (0, 1):
+                ids.append(message)
+                indexes.append(i)
+                timestamps.append(1495456868630584064 + message + int(round(distance / SPEED_OF_LIGHT)))
+        # a message with 3 uplinks is ignored
+        ids += [2, 2, 2]
+        indexes += [0, 1, 2]
+        timestamps += [1, 2, 3]
+
+        message_ids, lat, lon, resolved = tdoa_uplink_batch(uplink_batch(ids, indexes, timestamps, registry))
+        self.assertEqual(list(message_ids), [0, 1])
+        self.assertTrue(np.all(resolved))
+        self.assertAlmostEqual(lat[0], 48.83, delta=.0001)
+        self.assertAlmostEqual(lon[1], 2.29, delta=.0001)
+
+    def test_five_gateways(self):
+        solver = tdoa(_uplinks((48.82, 2.27), GATEWAYS[:5]))
+        self.assertTrue(solver.is_resolved)
+        self.assertEqual(solver._level, 5)
+        self.assertAlmostEqual(solver.geolocalized_device.lat, 48.82, delta=.0001)
+        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.27, delta=.0001)
+        self.assertEqual(len(solver.residuals), 4)
+        self.assertLess(np.abs(solver.residuals).max(), 1.)
+        self.assertTrue(np.isfinite(solver.condition_number))
+
+    def test_overdetermined_accuracy(self):
+        proj = projection()
+        device = (48.82, 2.27)
+        device_x, device_y = proj.lat_long_to_x_y(device[0], device[1])
+
+        def mean_error(count):
+            errors = []
+            for seed in xrange(20):
+                solver = tdoa(_uplinks(device, GATEWAYS[:count], [10] * count, seed))
+                x, y = proj.point_to_x_y(solver.geolocalized_device)
+                errors.append(np.hypot(x - device_x, y - device_y))
+            return np.mean(errors)
+        self.assertLess(mean_error(8), mean_error(4))
+
+    def test_weighted(self):
+        proj = projection()
+        device = (48.82, 2.27)
+        device_x, device_y = proj.lat_long_to_x_y(device[0], device[1])
+        # the last 3 gateways have bad clocks
+        timestamp_std = [1] * 5 + [2000] * 3
+        errors = {True: [], False: []}
+        for seed in xrange(10):
+            uplinks = _uplinks(device, GATEWAYS, timestamp_std, seed)
+            for weighted in (True, False):
+                solver = tdoa(uplinks, timestamp_std=timestamp_std if weighted else None)
+                x, y = proj.point_to_x_y(solver.geolocalized_device)
+                errors[weighted].append(np.hypot(x - device_x, y - device_y))
+        self.assertLess(np.mean(errors[True]), np.mean(errors[False]))
+
+    def test_all_same_time(self):
+        # equidistant gateways
+        coordinates = [(48.85, 2.30), (48.83, 2.30), (48.84, 2.3152), (48.84, 2.2848)]
+        t = 1495456868630584064
+        solver = tdoa([uplink(gateway(lat, lon), datetime.datetime.now(), t) for lat, lon in coordinates])
+        self.assertTrue(solver.is_resolved)
+        self.assertAlmostEqual(solver.geolocalized_device.lat, 48.84, delta=.001)
+        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.30, delta=.001)
+
+    def test_tdoa_batch_all_same_time(self):
+        # the batch and the class share the resolution of the equidistant gateways
+        coordinates = [(48.85, 2.30), (48.83, 2.30), (48.84, 2.3152), (48.84, 2.2848)]
+        t = 1495456868630584064
+        solver = tdoa([uplink(gateway(lat, lon), datetime.datetime.now(), t) for lat, lon in coordinates])
+        lat, lon, resolved = tdoa_batch([[c[0] for c in coordinates]], [[c[1] for c in coordinates]], [[t] * 4])
+        self.assertTrue(resolved[0])
+        self.assertAlmostEqual(lat[0], solver.geolocalized_device.lat)
+        self.assertAlmostEqual(lon[0], solver.geolocalized_device.lon)
+
+    def test_aligned_gateways(self):
+        coordinates = [(48.84, 2.26), (48.84, 2.26 + 1e-12), (48.84, 2.26 + 2e-12), (48.84, 2.26 + 3e-12)]
+        solver = tdoa(_uplinks((48.82, 2.27), coordinates))
+        self.assertFalse(solver.is_resolved)
+        self.assertIsNone(solver.residuals)
+
+    def test_near_aligned_gateways(self):
+        # inconsistent timestamps of almost aligned gateways have an exact but meaningless solution
+        t = 1495456868630584064
+        uplinks = [uplink(gateway(48.80, 2.20 + 0.02 * i), datetime.datetime.now(), t + i * 1000 + (7 if i == 2 else 0)) \
+            for i in xrange(4)]
+        solver = tdoa(uplinks)
+        self.assertFalse(solver.is_resolved)
+        self.assertGreater(np.abs(solver.residuals).max(), 100.)
+        lat, lon, resolved = tdoa_batch([[u.gateway.lat for u in uplinks]], [[u.gateway.lon for u in uplinks]], \
+            [[u.timestamp for u in uplinks]])
+        self.assertFalse(resolved[0])
+
+    def test_max_residual(self):
+        uplinks = _uplinks((48.82, 2.27), GATEWAYS, [100] * 8)
+        self.assertTrue(tdoa(uplinks).is_resolved)
+        self.assertFalse(tdoa(uplinks, max_residual=1.).is_resolved)
+        self.assertFalse(tdoa(uplinks, max_condition=1.5).is_resolved)
+
+    def test_tdoa_batch_out_of_range(self):
+        class out_of_range_projection:
+            def x_y_to_long_lat(self, x, y):
+                return np.full(np.shape(x), 200.), np.full(np.shape(y), 95.)
+
+        x, y = np.array([[0., 1000., 0., 1000.]]), np.array([[0., 0., 1000., 1000.]])
+        timestamps = 1495456868630584064 + np.round(np.hypot(x - 300, y - 400) / SPEED_OF_LIGHT).astype(np.int64)
+        lat, lon, resolved = _tdoa_batch_x_y(x, y, timestamps, out_of_range_projection(), 1000., 1e8)
+        self.assertFalse(resolved[0])
+        self.assertTrue(np.isnan(lat[0]))
+
+    def test_tdoa_batch_five_gateways(self):
+        uplinks = _uplinks((48.82, 2.27), GATEWAYS[:5])
+        lat, lon, resolved = tdoa_batch([[u.gateway.lat for u in uplinks]], [[u.gateway.lon for u in uplinks]], \
+            [[u.timestamp for u in uplinks]])
+        self.assertTrue(resolved[0])
+        self.assertAlmostEqual(lat[0], 48.82, delta=.0001)
+
     # =============================================== ERROR CHECKING
+    def test_tdoa_batch_incorrect_shape(self):
+        t = 1495456868630584064
+        self.assertRaises(ValueError, lambda: tdoa_batch([[48.84, 48.84, 48.80]], [[2.26, 2.30, 2.30]], [[t, t, t]]))
+        self.assertRaises(ValueError, lambda: tdoa_batch([[48.84, 48.84, 48.80, 48.9]], [[2.26, 2.30, 2.30, 2.4]], [[t, t]]))
+
     def test_only_one_uplink(self):
         g1 = gateway(48.84, 2.26)
         u1 = uplink(g1, datetime.datetime.now(), int(time.time() * 1000000000))
@@ -117,20 +274,18 @@ class Test_tdoa(unittest.TestCase):
 
         self.assertRaises(ValueError, lambda: tdoa([u1, u2]))
 
-    def test_five_gateways(self):
-        g1 = gateway(48.84, 2.26)
-        g2 = gateway(48.84, 2.30)
-        g3 = gateway(48.80, 2.30)
-        g4 = gateway(48.80, 2.22)
-        g5 = gateway(48.83, 2.2)
+    def test_three_gateways(self):
+        self.assertRaises(ValueError, lambda: tdoa(_uplinks((48.82, 2.27), GATEWAYS[:3])))
 
-        u1 = uplink(g1, datetime.datetime.now(), int(time.time() * 1000000000))
-        u2 = uplink(g2, datetime.datetime.now(), int(time.time() * 1000000000))
-        u3 = uplink(g3, datetime.datetime.now(), int(time.time() * 1000000000))
-        u4 = uplink(g4, datetime.datetime.now(), int(time.time() * 1000000000))
-        u5 = uplink(g5, datetime.datetime.now(), int(time.time() * 1000000000))
+    def test_incorrect_timestamp_std(self):
+        uplinks = _uplinks((48.82, 2.27), GATEWAYS[:4])
+        self.assertRaises(ValueError, lambda: tdoa(uplinks, timestamp_std=[1, 1, 1]))
+        self.assertRaises(ValueError, lambda: tdoa(uplinks, timestamp_std=[1, 1, 1, 0]))
 
-        self.assertRaises(ValueError, lambda: tdoa([u1, u2, u3, u4, u5]))
+    def test_incorrect_thresholds(self):
+        uplinks = _uplinks((48.82, 2.27), GATEWAYS[:4])
+        self.assertRaises(ValueError, lambda: tdoa(uplinks, max_residual=0))
+        self.assertRaises(ValueError, lambda: tdoa(uplinks, max_condition=1))
 
     def test_incorrect_param_type(self):
         g1 = gateway(48.84, 2.26)
@@ -3,7 +3,7 @@ import unittest
 import time
 import datetime
 
-from toa import toa
+from toa import toa, hyperbolas_intersection
 from ..model.point import point
 from ..model.uplink import uplink
 from ..model.gateway import gateway
@@ -61,15 +61,38 @@ class Test_toa(unittest.TestCase):
         g2 = gateway(48.84, 2.30)
         g3 = gateway(48.80, 2.30)
 
-        t = int(time.time() * 1000000000)
+        t = 1495456868630584064
 
+        # 20 microseconds is more than the distance between the gateways
         u1 = uplink(g1, datetime.datetime.now(), t)
         u2 = uplink(g2, datetime.datetime.now(), t)
-        u3 = uplink(g3, datetime.datetime.now(), int(time.time() * 1000000000))
+        u3 = uplink(g3, datetime.datetime.now(), t + 20000)
 
         solver = toa([u1, u2, u3])
         self.assertFalse(solver.is_resolved)
 
+    def test_same_time_close(self):
+        g1 = gateway(48.84, 2.26)
+        g2 = gateway(48.84, 2.30)
+        g3 = gateway(48.80, 2.30)
+
+        t = 1495456868630584064
+
+        u1 = uplink(g1, datetime.datetime.now(), t)
+        u2 = uplink(g2, datetime.datetime.now(), t)
+        u3 = uplink(g3, datetime.datetime.now(), t + 2000)
+
+        solver = toa([u1, u2, u3])
+        self.assertTrue(solver.is_resolved)
+        # equidistant from the 2 first gateways
+        self.assertAlmostEqual(solver.geolocalized_device.lon, 2.28, delta=.000001)
+
+    def test_hyperbolas_intersection(self):
+        x, y = hyperbolas_intersection((0., 0.), (1000., 0.), (0., 1000.), 0., 0.)
+        self.assertAlmostEqual(x, 500.)
+        self.assertAlmostEqual(y, 500.)
+        self.assertIsNone(hyperbolas_intersection((0., 0.), (1000., 0.), (2000., 0.), 0., 0.))
+
     def test_same_gateway(self):
         g1 = gateway(48.84, 2.26)
         g2 = gateway(48.84, 2.30)
@@ -2,12 +2,11 @@
 # -*- coding:utf-8 -*-
 
 import time
-import pyproj
+import math
 import datetime
-from sympy import Symbol, sqrt, Eq, Abs
-from sympy.solvers import solve
 
 from ..utils.utils import SPEED_OF_LIGHT
+from ..utils.instrumentation import stage, count
 from ..model.point import point
 from ..model.projection import projection
 from ..model.uplink import uplink
@@ -62,32 +61,48 @@ class toa:
         """Generate all the intersections between circles (estimated or not)
             v * (ti - tj) = ((Xi - x) ** 2 + (Yi - y) ** 2 ^ 1/2 
                           - ((Xj - x) ** 2 + (Yj - y) ** 2 ^ 1/2
+
+        Every equation is stored as (i, j, |v * (ti - tj)|) and every pair of equations is solved
+        numerically by hyperbolas_intersection around the gateway they share.
         """
-        x, y = Symbol('x'), Symbol('y')
+        # projection over x, y, once per gateway
+        with stage('toa.projection'):
+            x, y = self._proj.points_to_x_y([uplk.gateway for uplk in self._uplinks])
+        positions = zip(x, y)
 
         # generate all the equations
         for i, uplink in enumerate(self._uplinks):
             for j in xrange(i + 1, len(self._uplinks)):
-                # projection over x, y
-                gw_x, gw_y = self._proj.lat_long_to_x_y(uplink.gateway.lat, uplink.gateway.lon)
-                a_gw_x, a_gw_y = self._proj.lat_long_to_x_y(self._uplinks[j].gateway.lat, self._uplinks[j].gateway.lon)
-                gw_ts, a_gw_ts = uplink.timestamp, self._uplinks[j].timestamp
-
-                self._equations.append( sqrt((gw_x - x)**2 + (gw_y - y)**2) - sqrt((a_gw_x - x)**2 + (a_gw_y - y)**2) \
-                     - Abs(SPEED_OF_LIGHT * (gw_ts - a_gw_ts) ))
+                self._equations.append((i, j, abs(SPEED_OF_LIGHT * (uplink.timestamp - self._uplinks[j].timestamp))))
 
-        solutions = []
+        # generate intersection points
         for i, equation in enumerate(self._equations):
             for j in xrange(i + 1, len(self._equations)):
-                solutions.append(solve([self._equations[i], self._equations[j]]))
-        # generate intersection points
-        for solution in solutions:
-            try:
-                lon, lat = self._proj.x_y_to_long_lat(solution[0][x], solution[0][y])
-                self._intersections.append(point(lat, lon))
-            except Exception as e:
-                #  TODO:should log 
-                pass
+                shared = set(equation[:2]) & set(self._equations[j][:2])
+                if len(shared) != 1:
+                    continue
+                ref = shared.pop()
+                others, offsets = [], []
+                for first, second, distance in (equation, self._equations[j]):
+                    # ri - rj = distance  =>  rj = ri - distance or ri = rj + distance
+                    others.append(second if first == ref else first)
+                    offsets.append(-distance if first == ref else distance)
+
+                count('toa.intersections_tried')
+                with stage('toa.hyperbolas_intersection'):
+                    solution = hyperbolas_intersection(positions[ref], positions[others[0]], positions[others[1]], \
+                        offsets[0], offsets[1])
+                if solution is None:
+                    #  TODO:should log
+                    continue
+                count('toa.intersections_found')
+                with stage('toa.back_projection'):
+                    lon, lat = self._proj.x_y_to_long_lat(solution[0], solution[1])
+                try:
+                    self._intersections.append(point(lat, lon))
+                except ValueError:
+                    # the intersection is out of the range of the projection
+                    continue
 
 
     def _compute_geolocalization(self):
@@ -103,7 +118,51 @@ class toa:
         mean_lon /= float(len(self._intersections))
 
         self.is_resolved = True
-        self.geolocalized_device = point(mean_lat, mean_lon)
+        self.geolocalized_device = point._trusted(mean_lat, mean_lon)
+
+
+def hyperbolas_intersection(ref, gw_a, gw_b, offset_a, offset_b):
+    """Intersection of 2 hyperbolas sharing a gateway, in a projected x/y space
+
+    With r the distance from the device to the reference gateway, the hyperbolas are
+        ra = r + offset_a    and    rb = r + offset_b
+    Relatively to the reference, squaring gives the linear equations (closed form of Chan / Fang)
+        2 * Xk * x + 2 * Yk * y + 2 * offset_k * r = Xk ** 2 + Yk ** 2 - offset_k ** 2
+    so (x, y) = P + Q * r, and r is the non negative root of |P + Q * r| ** 2 = r ** 2.
+    When both roots are valid the nearest intersection from the reference gateway is kept.
+
+    Args:
+        ref: (x, y) of the gateway shared by the 2 equations
+        gw_a, gw_b: (x, y) of the 2 other gateways
+        offset_a, offset_b: distance differences of gw_a and gw_b to the reference
+
+    Returns:
+        The (x, y) intersection, None if there is none
+    """
+    xa, ya = gw_a[0] - ref[0], gw_a[1] - ref[1]
+    xb, yb = gw_b[0] - ref[0], gw_b[1] - ref[1]
+    det = 2. * (xa * yb - ya * xb)
+    if abs(det) <= 1e-9 * (xa**2 + ya**2 + xb**2 + yb**2):
+        # same or aligned gateways
+        return None
+
+    ka, kb = xa**2 + ya**2 - offset_a**2, xb**2 + yb**2 - offset_b**2
+    px, py = (ka * yb - kb * ya) / det, (kb * xa - ka * xb) / det
+    qx, qy = -2. * (offset_a * yb - offset_b * ya) / det, -2. * (offset_b * xa - offset_a * xb) / det
+
+    a, b, c = qx**2 + qy**2 - 1., 2. * (px * qx + py * qy), px**2 + py**2
+    if abs(a) <= 1e-12:
+        roots = [-c / b] if b != 0 else []
+    else:
+        delta = b**2 - 4. * a * c
+        if delta < 0:
+            return None
+        roots = sorted([(-b - math.sqrt(delta)) / (2. * a), (-b + math.sqrt(delta)) / (2. * a)])
+
+    for r in roots:
+        if r >= 0 and r + offset_a >= 0 and r + offset_b >= 0:
+            return ref[0] + px + qx * r, ref[1] + py + qy * r
+    return None
 
 
 # Test the lib
@@ -2,13 +2,12 @@
 # -*- coding:utf-8 -*-
 
 import math
-import pyproj
-from sympy import Symbol
-from sympy.solvers import solve
+import numpy as np
 
 from ..utils.utils import SPEED_OF_LIGHT
+from ..utils.instrumentation import stage, count
 from ..model.point import point
-from ..model.circle import circle
+from ..model.circle import circle, circles_intersections
 from ..model.projection import projection
 from ..model.uplink import uplink
 from ..model.gateway import gateway
@@ -73,15 +72,30 @@ class trilateration:
 
 
     def _compute_intersections(self):
-        """Generate all the intersections between circles (estimated or not)"""
-        for i, circle in enumerate(self._circles):
+        """Generate all the intersections between circles (estimated or not)
+
+        The centers are projected once and all the circle pairs are intersected in one vectorized call.
+        """
+        with stage('trilateration.projection'):
+            x, y = self._proj.points_to_x_y([c.center for c in self._circles])
+        first, second = [], []
+        for i in xrange(len(self._circles)):
             for j in xrange(i + 1, len(self._circles)):
-                inter1, inter2, approximation = circle.intersection_with_circle(self._circles[j], self._proj)
-                if inter1 is not None and inter2 is not None:
-                    self._circles_intersections.append(inter1)
-                    self._circles_intersections.append(inter2)
-                if approximation:
-                    self.is_approximation = True
+                first.append(i)
+                second.append(j)
+
+        r = np.array([c.radius for c in self._circles])
+        with stage('trilateration.intersections'):
+            xa, ya, xb, yb, approximation, found = circles_intersections(x[first], y[first], r[first], \
+                x[second], y[second], r[second])
+        self.is_approximation = bool(np.any(approximation))
+
+        # back projection of all the intersections in one call
+        with stage('trilateration.back_projection'):
+            lon, lat = self._proj.x_y_to_long_lat(np.concatenate((xa[found], xb[found])), \
+                np.concatenate((ya[found], yb[found])))
+        for k in xrange(len(lat)):
+            self._circles_intersections.append(point._trusted(lat[k], lon[k]))
 
     def _compute_geolocalization(self):
         """Generate the mean point corresponding to the device estimated localization"""
@@ -93,7 +107,7 @@ class trilateration:
         mean_lat /= float(len(self._circles_intersections))
         mean_lon /= float(len(self._circles_intersections))
 
-        self.geolocalized_device = point(mean_lat, mean_lon)
+        self.geolocalized_device = point._trusted(mean_lat, mean_lon)
 
 
 # Test the lib
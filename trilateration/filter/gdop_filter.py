@@ -0,0 +1,166 @@
+
+import numpy as np
+
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.projection import projection
+from ..model.gateway_registry import gateway_registry
+from ..utils.utils import combinations, combinations_count
+
+"""
+Geometric dilution of precision (GDOP) of a set of gateways seen from a device:
+    with (ux, uy) the unit vector from the device to a gateway, every gateway gives a row
+    [ux, uy, 1] of H (the 1 is the unknown emission time of the tdoa methods) and
+        GDOP = sqrt(trace((H^T * H) ^ -1))
+    A low GDOP means the timestamp errors are little amplified in the position.
+   .
+  / \
+ / ! \   => The device is unknown before the solve: by default it is estimated by the centroid of
+/_____\     the 3 earliest receptions (the nearest gateways)
+
+"""
+
+def _subsets_gdop(ux, uy, subsets):
+    """GDOP of gateway subsets
+
+    Args:
+        ux, uy: unit vectors from the device to the gateways, arrays of shape (M,)
+        subsets: gateway indexes, integer array of shape (S, k)
+
+    Returns:
+        The GDOP of every subset, array of shape (S,), infinite for degenerated geometries
+    """
+    hx, hy = ux[subsets], uy[subsets]
+    k = float(subsets.shape[1])
+    sxx, syy, sxy = (hx * hx).sum(axis=1), (hy * hy).sum(axis=1), (hx * hy).sum(axis=1)
+    sx, sy = hx.sum(axis=1), hy.sum(axis=1)
+
+    # trace of the adjugate (principal 2x2 minors) and determinant of the symmetric H^T * H
+    trace = (syy * k - sy**2) + (sxx * k - sx**2) + (sxx * syy - sxy**2)
+    det = sxx * (syy * k - sy**2) - sxy * (sxy * k - sx * sy) + sx * (sxy * sy - syy * sx)
+    degenerated = det <= 1e-12 * k**3
+    return np.where(degenerated, np.inf, np.sqrt(np.abs(trace) / np.where(degenerated, 1., det)))
+
+
+def _device_x_y(uplink_list, proj, device, x, y):
+    """Projected (estimated) device, see the module docstring"""
+    if device is None:
+        earliest = np.argsort([uplk.timestamp for uplk in uplink_list], kind='mergesort')[:3]
+        return x[earliest].mean(), y[earliest].mean()
+    return proj.point_to_x_y(device)
+
+
+def _unit_vectors(uplink_list, proj, device):
+    """Unit vectors from the (estimated) device to the gateways of the uplinks"""
+    x, y = proj.points_to_x_y([uplk.gateway for uplk in uplink_list])
+    device_x, device_y = _device_x_y(uplink_list, proj, device, x, y)
+    dx, dy = x - device_x, y - device_y
+    distances = np.hypot(dx, dy)
+    # a gateway on the device gives no direction
+    distances[distances == 0] = np.inf
+    return dx / distances, dy / distances
+
+
+def _nearest_uplinks(uplink_list, registry, device_x, device_y, count):
+    """Positions of the count uplinks whose gateways are the nearest to the device
+
+    The spatial index of the registry is queried for a growing number of gateways until count of
+    them are gateways of the message.
+
+    Returns:
+        The sorted positions in uplink_list, None if a gateway of the message is not registered
+    """
+    positions = {}
+    for i, uplk in enumerate(uplink_list):
+        gateway_id = getattr(uplk.gateway, 'gateway_id', None)
+        if gateway_id is None or gateway_id not in registry or registry.get(gateway_id) is not uplk.gateway:
+            return None
+        positions[registry.index(gateway_id)] = i
+    k = count
+    while True:
+        k = min(k, len(registry))
+        _, indexes = registry.nearest_x_y(device_x, device_y, k)
+        found = [positions[index] for index in indexes if index in positions]
+        if len(found) >= count or k == len(registry):
+            return sorted(found[:count])
+        k *= 2
+
+
+def _check(uplink_list, projection_system, device):
+    if not isinstance(uplink_list, list) or len(uplink_list) < 3:
+        raise ValueError("Incorrect uplink_list is not a list or not enough uplink")
+    for uplk in uplink_list:
+        if not isinstance(uplk, uplink):
+            raise ValueError("Invalid item in uplink_list is not a uplink")
+    if device is not None and not isinstance(device, point):
+        raise ValueError("Incorrect device point")
+    return projection(projection_system)
+
+
+def gdop(uplink_list, device=None, projection_system='epsg:2192'):
+    """Compute the GDOP of the gateways of a message
+
+    Args:
+        uplink_list: list of at least 3 uplinks
+        device: optional estimated point of the device
+        projection_system: The projection system name to use. (string)
+
+    Returns:
+        The GDOP, infinite for a degenerated geometry (ex: aligned gateways)
+    """
+    proj = _check(uplink_list, projection_system, device)
+    ux, uy = _unit_vectors(uplink_list, proj, device)
+    return float(_subsets_gdop(ux, uy, np.arange(len(uplink_list))[None, :])[0])
+
+
+def select_gateways(uplink_list, k, device=None, projection_system='epsg:2192', max_subsets=5000, registry=None, \
+    candidates=12):
+    """Keep the k uplinks whose gateways have the lowest GDOP
+
+    With a registry of the gateways, the search is restricted to the candidates gateways nearest to the
+    (estimated) device, found with the spatial index of the registry.
+    All the subsets are scored at once when there are at most max_subsets of them, otherwise the
+    best triple of the 12 earliest receptions is completed greedily.
+
+    Args:
+        uplink_list: list of at least 3 uplinks
+        k: number of uplinks to keep (at least 3)
+        device: optional estimated point of the device
+        projection_system: The projection system name to use. (string)
+        max_subsets: maximal number of subsets scored exhaustively
+        registry: optional gateway_registry of the gateways of the uplinks (same projection system)
+        candidates: number of gateways nearest to the device kept with a registry (at least k)
+
+    Returns:
+        The list of the k selected uplinks, in the order of uplink_list
+    """
+    if k < 3:
+        raise ValueError("Incorrect k, at least 3 gateways are expected")
+    if registry is not None and (not isinstance(registry, gateway_registry) or \
+        registry.projection_system != projection_system):
+        raise ValueError("Incorrect registry, a gateway_registry of the same projection system is expected")
+    proj = _check(uplink_list, projection_system, device)
+    n = len(uplink_list)
+    if n <= k:
+        return list(uplink_list)
+    if registry is not None and n > max(candidates, k):
+        x, y = proj.points_to_x_y([uplk.gateway for uplk in uplink_list])
+        device_x, device_y = _device_x_y(uplink_list, proj, device, x, y)
+        nearest = _nearest_uplinks(uplink_list, registry, device_x, device_y, max(candidates, k))
+        if nearest is not None:
+            uplink_list = [uplink_list[i] for i in nearest]
+            n = len(uplink_list)
+    ux, uy = _unit_vectors(uplink_list, proj, device)
+
+    if combinations_count(n, k) <= max_subsets:
+        subsets = combinations(n, k)
+        best = subsets[np.argmin(_subsets_gdop(ux, uy, subsets))]
+    else:
+        earliest = np.argsort([uplk.timestamp for uplk in uplink_list], kind='mergesort')[:12]
+        triples = earliest[combinations(len(earliest), 3)]
+        best = triples[np.argmin(_subsets_gdop(ux, uy, triples))]
+        while len(best) < k:
+            remaining = np.setdiff1d(np.arange(n), best)
+            extended = np.column_stack((np.repeat(best[None, :], len(remaining), axis=0), remaining))
+            best = extended[np.argmin(_subsets_gdop(ux, uy, extended))]
+    return [uplink_list[i] for i in sorted(best)]
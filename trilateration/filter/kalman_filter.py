@@ -0,0 +1,255 @@
+
+import numpy as np
+
+from ..model.point import point
+from ..model.projection import projection
+
+"""
+Constant velocity Kalman tracking of many devices from their raw fixes:
+    the state of a device is [x, y, vx, vy] in the projected space (meter, meter/second) with its
+    4x4 covariance, all the devices are stored in stacked arrays (one row per device, grown by
+    doubling). With max_devices, the devices whose last fix is the oldest are forgotten to make
+    room for the new ones.
+
+A batch of fixes predicts and updates all its devices at once:
+    predict: s = F * s, P = F * P * F^T + Q (white noise acceleration of std accel)
+    update: K = P * H^T * (H * P * H^T + R) ^ -1, s = s + K * (z - H * s), P = (I - K * H) * P
+   .
+  / \
+ / ! \   => The fixes of a device are applied in timestamp order, an out of order fix updates the
+/_____\     state without prediction
+
+"""
+
+
+class kalman_tracker:
+    """Vectorized constant velocity Kalman filter of device tracks"""
+
+    def __init__(self, fix_std=50., accel=1., initial_speed_std=20., projection_system='epsg:2192', capacity=1024, \
+        max_devices=None):
+        """kalman_tracker constructor
+
+        Args:
+            fix_std: default std (meter) of the position of a fix
+            accel: std (meter/second^2) of the acceleration of the devices
+            initial_speed_std: std (meter/second) of the unknown speed of a new device
+            projection_system: The projection system name to use. (string)
+            capacity: initial number of device rows
+            max_devices: optional maximal number of devices tracked
+        """
+        if fix_std <= 0 or accel < 0 or initial_speed_std <= 0 or capacity < 1 or \
+            (max_devices is not None and max_devices < 1):
+            raise ValueError("Incorrect kalman_tracker parameters")
+
+        # PUBLIC
+        self.fix_std = float(fix_std)
+        self.accel = float(accel)
+        self.initial_speed_std = float(initial_speed_std)
+        self.projection_system = projection_system
+        self.max_devices = max_devices
+        self.evicted = 0
+
+        # PRIVATE
+        self._proj = projection(projection_system)
+        self._rows = {}
+        # device of every row (None for a free row), rows freed by the evictions
+        self._devices = [None] * capacity
+        self._free = []
+        self._state = np.zeros((capacity, 4))
+        self._covariance = np.zeros((capacity, 4, 4))
+        self._time = np.zeros(capacity, dtype=np.int64)
+
+    def __len__(self):
+        """Number of devices tracked"""
+        return len(self._rows)
+
+    def __contains__(self, device):
+        return device in self._rows
+
+    def _allocate(self, devices):
+        """Rows of devices and the mask of the new ones (allocated, not initialized)"""
+        rows = np.array([self._rows.get(device, -1) for device in devices], dtype=np.intp)
+        unknown = set(device for device, row in zip(devices, rows) if row < 0)
+        if self.max_devices is not None and len(self._rows) + len(unknown) > self.max_devices:
+            self._evict(len(self._rows) + len(unknown) - self.max_devices, rows[rows >= 0])
+
+        new = rows < 0
+        for i in np.flatnonzero(new):
+            row = self._rows.get(devices[i])
+            if row is None:
+                row = self._free.pop() if self._free else len(self._rows)
+                self._rows[devices[i]] = row
+                if row == len(self._devices):
+                    self._grow()
+                self._devices[row] = devices[i]
+            rows[i] = row
+        return rows, new
+
+    def _grow(self):
+        """Double the number of rows of the arrays"""
+        def doubled(array):
+            return np.concatenate((array, np.zeros_like(array)))
+        self._state, self._covariance, self._time = doubled(self._state), doubled(self._covariance), doubled(self._time)
+        self._devices.extend([None] * len(self._devices))
+
+    def _evict(self, count, kept):
+        """Forget the count devices whose last fix is the oldest, except the rows kept"""
+        used = np.zeros(len(self._devices), dtype=bool)
+        used[self._rows.values()] = True
+        used[kept] = False
+        candidates = np.flatnonzero(used)
+        if count > len(candidates):
+            raise ValueError("Incorrect fixes, more devices in the batch than max_devices")
+        for row in candidates[np.argsort(self._time[candidates], kind='mergesort')[:count]]:
+            del self._rows[self._devices[row]]
+            self._devices[row] = None
+            self._free.append(row)
+        self.evicted += count
+
+    def update(self, devices, lat, lon, timestamps, fix_std=None):
+        """Predict and update the tracks of the devices of a batch of fixes
+
+        Args:
+            devices: the device identifier of every fix (list of hashables)
+            lat, lon: the fixes, arrays of shape (N,), nan for an unresolved fix (ignored)
+            timestamps: nanosecond timestamps of the fixes, integer array of shape (N,)
+            fix_std: optional std (meter) of the fixes, scalar or array of shape (N,)
+
+        Returns:
+            The filtered lat, lon, vx, vy (meter/second) arrays of shape (N,), nan for the ignored fixes
+        """
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if lat.ndim != 1 or lat.shape != lon.shape or timestamps.shape != lat.shape or len(devices) != len(lat):
+            raise ValueError("Incorrect fixes, 1D arrays of the same length are expected")
+        fix_std = np.broadcast_to(np.asarray(self.fix_std if fix_std is None else fix_std, dtype=float), lat.shape)
+        if np.any(fix_std <= 0):
+            raise ValueError("Incorrect fix_std")
+
+        result = np.full((len(lat), 4), np.nan)
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        if len(valid) == 0:
+            return result[:, 0], result[:, 1], result[:, 2], result[:, 3]
+        x, y = (np.asarray(c) for c in self._proj.lat_long_to_x_y(lat[valid], lon[valid]))
+        rows, created = self._allocate([devices[i] for i in valid])
+
+        # fixes in timestamp order, split in rounds holding every device at most once
+        order = np.argsort(timestamps[valid], kind='mergesort')
+        rounds = np.empty(len(valid), dtype=np.intp)
+        rounds[order] = _occurrences(rows[order])
+        # a new device starts on its earliest fix
+        new = np.in1d(rows, rows[created]) & (rounds == 0)
+        for r in xrange(rounds.max() + 1):
+            step = np.flatnonzero(rounds == r)
+            self._step(rows[step], new[step], x[step], y[step], timestamps[valid][step], fix_std[valid][step])
+            result[valid[step]] = self._state[rows[step]]
+
+        lon_f, lat_f = self._proj.x_y_to_long_lat(result[valid, 0], result[valid, 1])
+        result[valid, 0], result[valid, 1] = lat_f, lon_f
+        return result[:, 0], result[:, 1], result[:, 2], result[:, 3]
+
+    def update_fixes(self, devices, fixes, timestamps, fix_std=None):
+        """Update the tracks from the raw output of the solvers
+
+        Args:
+            devices: the device identifier of every fix
+            fixes: points, solver_results or method objects (lsm, tdoa, ...) of the devices,
+                the unresolved ones (or None) are ignored
+            timestamps: nanosecond timestamps of the fixes
+            fix_std: see update
+
+        Returns:
+            see update
+        """
+        lat, lon = np.full(len(fixes), np.nan), np.full(len(fixes), np.nan)
+        for i, fix in enumerate(fixes):
+            if fix is not None and not isinstance(fix, point):
+                fix = fix.geolocalized_device if getattr(fix, 'is_resolved', True) else None
+            if fix is not None:
+                lat[i], lon[i] = fix.lat, fix.lon
+        return self.update(devices, lat, lon, timestamps, fix_std)
+
+    def _step(self, rows, new, x, y, timestamps, fix_std):
+        """Predict and update rows holding every device at most once"""
+        # new devices start on their fix with an unknown speed
+        if np.any(new):
+            created = rows[new]
+            self._state[created] = np.column_stack((x[new], y[new], np.zeros((len(created), 2))))
+            covariance = np.zeros((len(created), 4, 4))
+            covariance[:, 0, 0] = covariance[:, 1, 1] = fix_std[new]**2
+            covariance[:, 2, 2] = covariance[:, 3, 3] = self.initial_speed_std**2
+            self._covariance[created] = covariance
+            self._time[created] = timestamps[new]
+
+        old = ~new
+        if not np.any(old):
+            return
+        rows, x, y, timestamps, fix_std = rows[old], x[old], y[old], timestamps[old], fix_std[old]
+        state, covariance = self._state[rows], self._covariance[rows]
+
+        # predict
+        dt = np.maximum((timestamps - self._time[rows]) / 1e9, 0.)
+        transition = np.tile(np.eye(4), (len(rows), 1, 1))
+        transition[:, 0, 2] = transition[:, 1, 3] = dt
+        state = np.einsum('nij,nj->ni', transition, state)
+        covariance = np.einsum('nij,njk,nlk->nil', transition, covariance, transition)
+        q = self.accel**2
+        covariance[:, 0, 0] += q * dt**3 / 3.
+        covariance[:, 1, 1] += q * dt**3 / 3.
+        for a, b in ((0, 2), (2, 0), (1, 3), (3, 1)):
+            covariance[:, a, b] += q * dt**2 / 2.
+        covariance[:, 2, 2] += q * dt
+        covariance[:, 3, 3] += q * dt
+
+        # update with the 2x2 innovation covariance inverted in closed form
+        innovation = np.column_stack((x, y)) - state[:, :2]
+        s = covariance[:, :2, :2].copy()
+        s[:, 0, 0] += fix_std**2
+        s[:, 1, 1] += fix_std**2
+        det = s[:, 0, 0] * s[:, 1, 1] - s[:, 0, 1] * s[:, 1, 0]
+        inverse = np.stack((np.stack((s[:, 1, 1], -s[:, 0, 1]), axis=-1), \
+            np.stack((-s[:, 1, 0], s[:, 0, 0]), axis=-1)), axis=1) / det[:, None, None]
+        gain = np.einsum('nij,njk->nik', covariance[:, :, :2], inverse)
+        state = state + np.einsum('nij,nj->ni', gain, innovation)
+        covariance = covariance - np.einsum('nij,njk->nik', gain, covariance[:, :2, :])
+        # keep the covariance symmetric
+        covariance = (covariance + covariance.transpose(0, 2, 1)) / 2.
+
+        self._state[rows] = state
+        self._covariance[rows] = covariance
+        self._time[rows] = np.maximum(self._time[rows], timestamps)
+
+    def state(self, device):
+        """Return the lat, lon, vx, vy (meter/second) and the 4x4 covariance of a device, None if unknown"""
+        row = self._rows.get(device)
+        if row is None:
+            return None
+        lon, lat = self._proj.x_y_to_long_lat(self._state[row, 0], self._state[row, 1])
+        return lat, lon, self._state[row, 2], self._state[row, 3], self._covariance[row].copy()
+
+    def predict(self, devices, timestamp):
+        """Predict the positions of devices at a nanosecond timestamp, without changing their tracks
+
+        Returns:
+            lat, lon arrays of shape (N,), nan for the unknown devices
+        """
+        rows = np.array([self._rows.get(device, -1) for device in devices], dtype=np.intp)
+        known = rows >= 0
+        lat, lon = np.full(len(devices), np.nan), np.full(len(devices), np.nan)
+        if np.any(known):
+            state = self._state[rows[known]]
+            dt = np.maximum((timestamp - self._time[rows[known]]) / 1e9, 0.)
+            lon[known], lat[known] = self._proj.x_y_to_long_lat(state[:, 0] + dt * state[:, 2], \
+                state[:, 1] + dt * state[:, 3])
+        return lat, lon
+
+
+def _occurrences(rows):
+    """Rank of every item among the previous items of the same value (0 for the first one)"""
+    order = np.argsort(rows, kind='mergesort')
+    sorted_rows = rows[order]
+    starts = np.concatenate(([True], sorted_rows[1:] != sorted_rows[:-1]))
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(rows)), 0))
+    ranks = np.empty(len(rows), dtype=np.intp)
+    ranks[order] = np.arange(len(rows)) - first
+    return ranks
@@ -6,36 +6,166 @@ import numpy as np
 from ..model.point import point
 from ..model.uplink import uplink
 from ..model.gateway import gateway
+from ..model.uplink_batch import uplink_batch
 
-def filter_uplink_timestamps(uplinks, m=2):
+# consistency constant of the MAD with the std of a normal distribution
+MAD_SCALE = 1.4826
+METHODS = ('std', 'mad', 'trimmed')
+# default floors of the MAD scale: nanosecond for the timestamps, degree for the points
+MIN_TIMESTAMP_SCALE = 1000.
+MIN_POINT_SCALE = 1e-5
+
+
+def _grouped_center_scale(data, groups, counts, method='std', trim=.1):
+    """Center and scale of every group of values
+
+    Args:
+        data: float array of shape (N,)
+        groups: group of every value, integer array of shape (N,) in [0, G)
+        counts: number of values of every group, array of shape (G,)
+        method: 'std' (mean, std), 'mad' (median, MAD_SCALE * median absolute deviation)
+            or 'trimmed' (mean, std of the values left after removing trim of each tail)
+        trim: proportion of each tail removed by the trimmed method
+
+    Returns:
+        center, scale arrays of shape (G,)
+    """
+    safe = np.maximum(counts, 1)
+    if method == 'std':
+        center = np.bincount(groups, data, minlength=len(counts)) / safe
+        deviation = data - center[groups]
+        return center, np.sqrt(np.bincount(groups, deviation**2, minlength=len(counts)) / safe)
+
+    # sort the values inside their group, the groups are contiguous in the sorted order
+    order = np.lexsort((data, groups))
+    starts = np.cumsum(counts) - counts
+    if method == 'mad':
+        center = _grouped_median(data[order], starts, counts)
+        deviation = np.abs(data - center[groups])
+        return center, MAD_SCALE * _grouped_median(deviation[np.lexsort((deviation, groups))], starts, counts)
+    if method == 'trimmed':
+        sorted_groups = groups[order]
+        ranks = np.arange(len(data)) - starts[sorted_groups]
+        cut = np.floor(trim * counts).astype(np.intp)
+        kept = (ranks >= cut[sorted_groups]) & (ranks < (counts - cut)[sorted_groups])
+        kept_data, kept_groups = data[order][kept], sorted_groups[kept]
+        kept_counts = np.maximum(np.bincount(kept_groups, minlength=len(counts)), 1)
+        center = np.bincount(kept_groups, kept_data, minlength=len(counts)) / kept_counts
+        deviation = kept_data - center[kept_groups]
+        return center, np.sqrt(np.bincount(kept_groups, deviation**2, minlength=len(counts)) / kept_counts)
+    raise ValueError("Unknown method, one of %s is expected" % (METHODS,))
+
+
+def _grouped_median(sorted_data, starts, counts):
+    """Median of the groups of values sorted inside contiguous groups"""
+    if len(sorted_data) == 0:
+        return np.zeros(len(counts))
+    last = len(sorted_data) - 1
+    low = np.minimum(starts + (np.maximum(counts, 1) - 1) // 2, last)
+    high = np.minimum(starts + counts // 2, last)
+    return (sorted_data[low] + sorted_data[high]) / 2.
+
+
+def _outliers_mask(data, groups, counts, m, method, trim, min_scale):
+    """Mask of the values at most m scales from the center of their group (a MAD scale is at least min_scale)"""
+    if min_scale < 0:
+        raise ValueError("Incorrect min_scale")
+    center, scale = _grouped_center_scale(data, groups, counts, method, trim)
+    if method == 'mad':
+        scale = np.maximum(scale, min_scale)
+    return np.abs(data - center[groups]) <= m * scale[groups]
+
+
+def timestamps_mask(timestamps, m=2, method='std', trim=.1, offsets=None, as_indices=False, \
+    min_scale=MIN_TIMESTAMP_SCALE):
+    """Statical fitler on Timestamp distribution, array version
+
+        Args:
+            timestamps: nanosecond timestamps, integer array of shape (N,)
+            m: multiplicator of the scale to filter |x - center| <= m * scale
+            method: 'std', 'mad' or 'trimmed' estimators of the center and scale
+            trim: proportion of each tail removed by the trimmed method
+            offsets: optional message boundaries (see uplink_batch.offsets), every message is
+                filtered on its own distribution
+            as_indices: return the indexes of the kept timestamps instead of a mask
+            min_scale: minimal scale (nanosecond) of the mad method, the MAD of a message with more
+                than half identical timestamps is 0
+
+        Return:
+            The boolean mask (or index array) of the timestamps kept
+    """
+    if m < 0:
+        m = 1
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if timestamps.ndim != 1:
+        raise ValueError("Incorrect timestamps, a 1D array is expected")
+    if offsets is None:
+        offsets = np.array([0, len(timestamps)])
+    offsets = np.asarray(offsets, dtype=np.intp)
+    if offsets[0] != 0 or offsets[-1] != len(timestamps) or np.any(np.diff(offsets) < 0):
+        raise ValueError("Incorrect offsets")
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.intp) if as_indices else np.zeros(0, dtype=bool)
+    counts = np.diff(offsets)
+    groups = np.repeat(np.arange(len(counts)), counts)
+    # integer difference first: float64 can not hold a nanosecond epoch timestamp
+    data = (timestamps - timestamps[np.minimum(offsets[:-1], len(timestamps) - 1)][groups]).astype(float)
+    mask = _outliers_mask(data, groups, counts, m, method, trim, min_scale)
+    return np.flatnonzero(mask) if as_indices else mask
+
+
+def points_mask(lat, lon, m=2, method='std', trim=.1, as_indices=False, min_scale=MIN_POINT_SCALE):
+    """Statical fitler on points distance distribution, array version:
+        a point is kept when both its latitude and its longitude are at most m scales from the center
+
+        Args:
+            lat, lon: coordinates of the points, arrays of shape (N,)
+            m, method, trim, as_indices: see timestamps_mask
+            min_scale: minimal scale (degree) of the mad method
+
+        Return:
+            The boolean mask (or index array) of the points kept
+    """
+    if m < 0:
+        m = 1
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    if lat.ndim != 1 or lat.shape != lon.shape:
+        raise ValueError("Incorrect coordinates, 1D arrays of the same length are expected")
+    groups, counts = np.zeros(len(lat), dtype=np.intp), np.array([len(lat)])
+    mask = _outliers_mask(lat, groups, counts, m, method, trim, min_scale) & \
+        _outliers_mask(lon, groups, counts, m, method, trim, min_scale)
+    return np.flatnonzero(mask) if as_indices else mask
+
+
+def filter_uplink_timestamps(uplinks, m=2, method='std', trim=.1, min_scale=MIN_TIMESTAMP_SCALE):
     """Statical fitler on Timestamp distribution
 
         Args:
-            uplinks: List of uplink to filter
+            uplinks: List of uplink to filter, or an uplink_batch (filtered message by message)
             m: multiplicator of std to filter x < m * std
+            method, trim, min_scale: see timestamps_mask
 
         Return:
-            The list of uplink filtered on the timestamp
+            The list of uplink filtered on the timestamp (an uplink_batch for an uplink_batch)
     """
-    if len(uplinks) == 0:
-        return []
     if m < 0:
         m = 1
-    data = np.array([])
-    for uplink in uplinks:
-        data = np.append(data, uplink.timestamp)
-
-    mean = np.mean(data)
-    std = np.std(data)
-    return filter(lambda u: abs(u.timestamp - mean) <= m * std, uplinks)
+    if isinstance(uplinks, uplink_batch):
+        return uplinks.select(timestamps_mask(uplinks.timestamps, m, method, trim, uplinks.offsets, \
+            min_scale=min_scale))
+    if len(uplinks) == 0:
+        return []
+    data = np.fromiter((uplink.timestamp for uplink in uplinks), dtype=np.int64, count=len(uplinks))
+    return [uplinks[i] for i in timestamps_mask(data, m, method, trim, as_indices=True, min_scale=min_scale)]
 
 
-def filter_point_distance(points, m=2):
+def filter_point_distance(points, m=2, method='std', trim=.1, min_scale=MIN_POINT_SCALE):
     """Statical fitler on points distance distribution
 
         Args:
             points: List of point to filter
             m: multiplicator of std to filter x < m * std
+            method, trim, min_scale: see points_mask
 
         Return:
             The list of point filtered on the distance distribution
@@ -44,19 +174,9 @@ def filter_point_distance(points, m=2):
         return []
     if m < 0:
         m = 1
-    data = np.empty([len(points), 2])
-    for i, p in enumerate(points):
-        data[i,0] = p.lat
-        data[i,1] = p.lon
-
-    mean = np.mean(data, axis=0)
-    mean_point = point(mean[0], mean[1])
-
-    std = np.std(data, axis=0)
-    std_point = point(std[0], std[1])
-
-    return filter(lambda p: (abs(p.lat - mean_point.lat) <= m * std_point.lat) \
-        and abs(p.lon - mean_point.lon) <= m * std_point.lon, points)
+    lat = np.fromiter((p.lat for p in points), dtype=float, count=len(points))
+    lon = np.fromiter((p.lon for p in points), dtype=float, count=len(points))
+    return [points[i] for i in points_mask(lat, lon, m, method, trim, as_indices=True, min_scale=min_scale)]
 
 
 if __name__ == '__main__':
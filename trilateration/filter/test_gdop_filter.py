@@ -0,0 +1,94 @@
+import unittest
+
+import datetime
+import numpy as np
+
+from gdop_filter import gdop, select_gateways
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.projection import projection
+from ..model.gateway_registry import gateway_registry
+from ..utils.utils import SPEED_OF_LIGHT
+# do not forget to use nose2 at root to run test
+
+T = 1495456868630584064
+
+
+def _uplinks(coordinates, device=(48.85, 2.33)):
+    proj = projection()
+    dx, dy = proj.lat_long_to_x_y(*device)
+    uplinks = []
+    for lat, lon in coordinates:
+        x, y = proj.lat_long_to_x_y(lat, lon)
+        uplinks.append(uplink(gateway(lat, lon), datetime.datetime.now(), T + int(np.hypot(x - dx, y - dy) / SPEED_OF_LIGHT)))
+    return uplinks
+
+
+class Test_gdop_filter(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_surrounding_gdop(self):
+        surround = _uplinks([(48.87, 2.33), (48.85, 2.36), (48.83, 2.33), (48.85, 2.30)])
+        clustered = _uplinks([(48.87, 2.33), (48.871, 2.331), (48.869, 2.332), (48.872, 2.329)])
+        self.assertTrue(gdop(surround) < gdop(clustered))
+
+    def test_aligned_gdop(self):
+        aligned = _uplinks([(48.85, 2.30), (48.85, 2.32), (48.85, 2.34)], device=(48.85, 2.31))
+        surround = _uplinks([(48.87, 2.31), (48.84, 2.33), (48.84, 2.29)], device=(48.85, 2.31))
+        self.assertTrue(gdop(aligned, device=point(48.85, 2.31)) > 100 * gdop(surround, device=point(48.85, 2.31)))
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_select_gateways(self):
+        coordinates = [(48.87, 2.33), (48.871, 2.331), (48.85, 2.36), (48.869, 2.332), (48.83, 2.33), (48.85, 2.30)]
+        uplinks = _uplinks(coordinates)
+        selected = select_gateways(uplinks, 4, device=point(48.85, 2.33))
+        self.assertEqual(len(selected), 4)
+        self.assertEqual([uplinks.index(u) for u in selected], [0, 2, 4, 5])
+
+    def test_select_greedy(self):
+        rand = np.random.RandomState(0)
+        coordinates = [(48.85 + .05 * a, 2.33 + .05 * b) for a, b in rand.uniform(-1, 1, (30, 2))]
+        uplinks = _uplinks(coordinates)
+        exhaustive = select_gateways(uplinks[:10], 4)
+        self.assertEqual(len(select_gateways(uplinks, 5, max_subsets=100)), 5)
+        self.assertTrue(gdop(exhaustive) <= gdop(select_gateways(uplinks[:10], 4, max_subsets=1)) + 1e-9)
+
+    def test_select_few_gateways(self):
+        uplinks = _uplinks([(48.87, 2.33), (48.85, 2.36), (48.83, 2.33)])
+        self.assertEqual(select_gateways(uplinks, 4), uplinks)
+
+    def test_select_nearest_registered(self):
+        rand = np.random.RandomState(1)
+        registry = gateway_registry()
+        for i, (a, b) in enumerate(rand.uniform(-1, 1, (40, 2))):
+            registry.add(i, 48.85 + .05 * a, 2.33 + .05 * b)
+        heard = [registry.gateway_at(i) for i in xrange(0, 40, 2)]
+        uplinks = _uplinks([(g.lat, g.lon) for g in heard])
+        uplinks = [uplink(g, None, u.timestamp) for g, u in zip(heard, uplinks)]
+        device = point(48.85, 2.33)
+
+        selected = select_gateways(uplinks, 4, device=device, registry=registry, candidates=6)
+        self.assertEqual(len(selected), 4)
+        x, y = projection().lat_long_to_x_y(48.85, 2.33)
+        distances = [np.hypot(g.x - x, g.y - y) for g in heard]
+        nearest = [uplinks[i] for i in sorted(np.argsort(distances)[:6])]
+        self.assertTrue(all(u in nearest for u in selected))
+        self.assertEqual(selected, select_gateways(nearest, 4, device=device))
+
+    def test_select_unregistered(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.87, 2.33)
+        uplinks = _uplinks([(48.87, 2.33), (48.871, 2.331), (48.85, 2.36), (48.869, 2.332), (48.83, 2.33), (48.85, 2.30)])
+        self.assertEqual(select_gateways(uplinks, 4, registry=registry, candidates=4), select_gateways(uplinks, 4))
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_selection(self):
+        uplinks = _uplinks([(48.87, 2.33), (48.85, 2.36), (48.83, 2.33), (48.85, 2.30)])
+        self.assertRaises(ValueError, lambda: select_gateways(uplinks, 2))
+        self.assertRaises(ValueError, lambda: gdop(uplinks[:2]))
+        self.assertRaises(ValueError, lambda: gdop(uplinks, device=(48.85, 2.33)))
+        self.assertRaises(ValueError, lambda: select_gateways(uplinks, 3, registry=gateway_registry('epsg:4326')))
+
+if __name__ == '__main__':
+    unittest.main()
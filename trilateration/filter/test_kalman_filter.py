@@ -0,0 +1,146 @@
+import unittest
+
+import numpy as np
+
+from kalman_filter import kalman_tracker, _occurrences
+from ..model.point import point
+from ..model.projection import projection
+# do not forget to use nose2 at root to run test
+
+
+SECOND = 1000000000
+
+
+def _track(proj, vx, vy, count, noise, rand, start=(48.84, 2.26)):
+    """Noisy fixes (one per second) of a device moving at constant speed"""
+    x0, y0 = proj.lat_long_to_x_y(start[0], start[1])
+    t = np.arange(count)
+    x, y = x0 + vx * t, y0 + vy * t
+    lon, lat = proj.x_y_to_long_lat(x + noise * rand.randn(count), y + noise * rand.randn(count))
+    true_lon, true_lat = proj.x_y_to_long_lat(x, y)
+    return np.asarray(lat), np.asarray(lon), t * SECOND, np.asarray(true_lat), np.asarray(true_lon)
+
+
+class Test_kalman_tracker(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_first_fix(self):
+        tracker = kalman_tracker()
+        lat, lon, vx, vy = tracker.update(['dev1'], [48.84], [2.26], [0])
+        self.assertAlmostEqual(lat[0], 48.84)
+        self.assertAlmostEqual(lon[0], 2.26)
+        self.assertEqual((vx[0], vy[0]), (0., 0.))
+        self.assertEqual(len(tracker), 1)
+        self.assertTrue('dev1' in tracker)
+
+    def test_unresolved_fix(self):
+        tracker = kalman_tracker()
+        lat, lon, vx, vy = tracker.update(['dev1', 'dev2'], [np.nan, 48.84], [np.nan, 2.26], [0, 0])
+        self.assertTrue(np.isnan(lat[0]))
+        self.assertFalse(np.isnan(lat[1]))
+        self.assertFalse('dev1' in tracker)
+
+    def test_occurrences(self):
+        np.testing.assert_array_equal(_occurrences(np.array([3, 1, 3, 3, 1, 2])), [0, 0, 1, 2, 1, 0])
+
+    def test_grow(self):
+        tracker = kalman_tracker(capacity=2)
+        devices = ['dev%d' % i for i in xrange(5)]
+        tracker.update(devices, np.full(5, 48.84), np.full(5, 2.26), np.zeros(5, dtype=np.int64))
+        self.assertEqual(len(tracker), 5)
+        self.assertEqual(tracker.state('dev4')[4].shape, (4, 4))
+        self.assertIsNone(tracker.state('dev5'))
+
+    def test_max_devices(self):
+        tracker = kalman_tracker(capacity=1, max_devices=2)
+        tracker.update(['dev0', 'dev1'], [48.84, 48.85], [2.26, 2.27], [0, SECOND])
+        # dev1 is kept by its new fix, dev0 has the oldest fix
+        lat, lon, _, _ = tracker.update(['dev2', 'dev1'], [48.86, 48.85], [2.28, 2.27], [2 * SECOND, 2 * SECOND])
+        self.assertEqual(len(tracker), 2)
+        self.assertEqual(tracker.evicted, 1)
+        self.assertFalse('dev0' in tracker)
+        self.assertAlmostEqual(lat[0], 48.86)
+        self.assertAlmostEqual(tracker.state('dev2')[0], 48.86)
+        # the row of dev0 is reused
+        self.assertEqual(len(tracker._devices), 2)
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_smoothing_and_speed(self):
+        proj = projection('epsg:2192')
+        rand = np.random.RandomState(1)
+        lat, lon, t, true_lat, true_lon = _track(proj, 10., -5., 120, 50., rand)
+        tracker = kalman_tracker(fix_std=50., accel=.1)
+        filtered = [tracker.update(['dev1'], lat[i:i + 1], lon[i:i + 1], t[i:i + 1]) for i in xrange(120)]
+        f_lat = np.array([f[0][0] for f in filtered])
+        f_lon = np.array([f[1][0] for f in filtered])
+
+        def errors(a, b):
+            x, y = proj.lat_long_to_x_y(a[60:], b[60:])
+            tx, ty = proj.lat_long_to_x_y(true_lat[60:], true_lon[60:])
+            return np.hypot(np.asarray(x) - tx, np.asarray(y) - ty).mean()
+        self.assertLess(errors(f_lat, f_lon), errors(lat, lon) / 2)
+        self.assertAlmostEqual(filtered[-1][2][0], 10., delta=2.)
+        self.assertAlmostEqual(filtered[-1][3][0], -5., delta=2.)
+
+    def test_batch_matches_sequential(self):
+        proj = projection('epsg:2192')
+        rand = np.random.RandomState(1)
+        tracks = [_track(proj, 3. * i, 2., 20, 30., rand, start=(48.84 + .01 * i, 2.26)) for i in xrange(4)]
+        devices = [i for i in xrange(4) for _ in xrange(20)]
+        lat = np.concatenate([track[0] for track in tracks])
+        lon = np.concatenate([track[1] for track in tracks])
+        t = np.concatenate([track[2] for track in tracks])
+
+        # every fix of every device in one shuffled batch
+        shuffle = rand.permutation(len(devices))
+        batch = kalman_tracker()
+        b_lat, b_lon, _, _ = batch.update([devices[i] for i in shuffle], lat[shuffle], lon[shuffle], t[shuffle])
+
+        sequential = kalman_tracker()
+        for i in np.argsort(t, kind='mergesort'):
+            s_lat, s_lon, _, _ = sequential.update([devices[i]], lat[i:i + 1], lon[i:i + 1], t[i:i + 1])
+            j = np.flatnonzero(shuffle == i)[0]
+            self.assertAlmostEqual(b_lat[j], s_lat[0], places=9)
+            self.assertAlmostEqual(b_lon[j], s_lon[0], places=9)
+
+    def test_update_fixes(self):
+        tracker = kalman_tracker()
+        lat, lon, _, _ = tracker.update_fixes(['dev1', 'dev2', 'dev3'], [point(48.84, 2.26), None, point(48.85, 2.27)], \
+            [0, 0, 0])
+        self.assertAlmostEqual(lat[0], 48.84)
+        self.assertTrue(np.isnan(lat[1]))
+        self.assertEqual(len(tracker), 2)
+
+    def test_predict(self):
+        tracker = kalman_tracker(accel=0.)
+        proj = projection('epsg:2192')
+        rand = np.random.RandomState(2)
+        lat, lon, t, _, _ = _track(proj, 10., 0., 30, 1., rand)
+        tracker.update(['dev1'] * 30, lat, lon, t)
+        p_lat, p_lon = tracker.predict(['dev1', 'unknown'], 39 * SECOND)
+        x, y = proj.lat_long_to_x_y(p_lat[0], p_lon[0])
+        x0, y0 = proj.lat_long_to_x_y(48.84, 2.26)
+        self.assertAlmostEqual(x - x0, 390., delta=5.)
+        self.assertTrue(np.isnan(p_lat[1]))
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_parameters(self):
+        with self.assertRaises(ValueError):
+            kalman_tracker(fix_std=0)
+        with self.assertRaises(ValueError):
+            kalman_tracker(accel=-1)
+        with self.assertRaises(ValueError):
+            kalman_tracker(max_devices=0)
+
+    def test_incorrect_fixes(self):
+        tracker = kalman_tracker()
+        with self.assertRaises(ValueError):
+            tracker.update(['dev1'], [48.84, 48.85], [2.26], [0])
+        with self.assertRaises(ValueError):
+            tracker.update(['dev1'], [48.84], [2.26], [0], fix_std=0)
+        with self.assertRaises(ValueError):
+            kalman_tracker(max_devices=1).update(['dev1', 'dev2'], [48.84, 48.85], [2.26, 2.27], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
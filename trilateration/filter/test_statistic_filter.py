@@ -6,7 +6,9 @@ import numpy as np
 from ..model.point import point
 from ..model.uplink import uplink
 from ..model.gateway import gateway
-from statistic_filter import filter_uplink_timestamps, filter_point_distance
+from ..model.uplink_batch import uplink_batch
+from ..model.gateway_registry import gateway_registry
+from statistic_filter import filter_uplink_timestamps, filter_point_distance, timestamps_mask, points_mask
 
 
 
@@ -25,6 +27,19 @@ class Test_filtering_functions(unittest.TestCase):
         self.assertEqual(len(uplinks), 10)
         self.assertEqual(len(res), 9)
 
+    def test_filter_uplink_batch_timestamps(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        t = 1495456868630584064
+        ids = [0] * 10 + [1] * 2
+        timestamps = [t + i for i in xrange(10)] + [t, t]
+        timestamps[2] = t + 4000000
+        batch = uplink_batch(ids, [0] * 12, timestamps, registry)
+        res = filter_uplink_timestamps(batch, 2.5)
+        self.assertEqual(batch.size, 12)
+        self.assertEqual(res.size, 11)
+        self.assertEqual(list(res.counts()), [9, 2])
+
     def test_filter_point_distance(self):
         points = []
         for i in xrange(0,10):
@@ -83,6 +98,81 @@ class Test_filtering_functions(unittest.TestCase):
         self.assertEqual(len(points), 0)
         self.assertEqual(len(res), 0)
 
+    def test_timestamps_mask(self):
+        t = 1495456868630584064
+        timestamps = np.array([t + i for i in xrange(10)])
+        timestamps[2] = t + 4000000
+        mask = timestamps_mask(timestamps, 2.5)
+        self.assertEqual(mask.dtype, bool)
+        self.assertEqual(list(np.flatnonzero(~mask)), [2])
+        self.assertEqual(list(timestamps_mask(timestamps, 2.5, as_indices=True)), [0, 1] + range(3, 10))
+
+    def test_robust_timestamps_mask(self):
+        t = 1495456868630584064
+        timestamps = t + np.array([0, 100, 200, 300, 400, 500, 20000, 4000000])
+        # the wild timestamp inflates the std: the second outlier goes through
+        self.assertEqual(list(np.flatnonzero(~timestamps_mask(timestamps, 2))), [7])
+        self.assertEqual(list(np.flatnonzero(~timestamps_mask(timestamps, 3, 'mad'))), [6, 7])
+        self.assertEqual(list(np.flatnonzero(~timestamps_mask(timestamps, 4, 'trimmed', trim=.25))), [6, 7])
+
+    def test_grouped_timestamps_mask(self):
+        t = 1495456868630584064
+        timestamps = t + np.array([0, 100, 200, 300, 400, 4000000, 0, 10, 20, 30000000, 5, 15])
+        mask = timestamps_mask(timestamps, 3, 'mad', offsets=[0, 6, 12])
+        self.assertEqual(list(np.flatnonzero(~mask)), [5, 9])
+
+    def test_robust_filter_uplink_batch(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        t = 1495456868630584064
+        timestamps = [t + 100 * i for i in xrange(6)] + [t + 20000, t + 4000000]
+        batch = uplink_batch([0] * 8, [0] * 8, timestamps, registry)
+        self.assertEqual(filter_uplink_timestamps(batch, 2).size, 7)
+        self.assertEqual(filter_uplink_timestamps(batch, 3, 'mad').size, 6)
+
+    def test_points_mask(self):
+        lat = np.array([48.84, 48.841, 48.839, 48.84, 49.5])
+        lon = np.array([2.26, 2.261, 2.259, 2.262, 2.26])
+        self.assertEqual(list(points_mask(lat, lon, 3, 'mad', as_indices=True)), [0, 1, 2, 3])
+        points = [point(a, b) for a, b in zip(lat, lon)]
+        self.assertEqual(len(filter_point_distance(points, 3, 'mad')), 4)
+
+    def test_mad_identical_values(self):
+        # more than half identical values: MAD = 0, the floor keeps the close values
+        t = 1495456868630584064
+        timestamps = t + np.array([0, 0, 0, 0, 0, 50, 120, 4000000])
+        self.assertEqual(list(np.flatnonzero(~timestamps_mask(timestamps, 3, 'mad'))), [7])
+        self.assertEqual(list(np.flatnonzero(~timestamps_mask(timestamps, 3, 'mad', min_scale=0))), [5, 6, 7])
+        lat = np.array([48.84, 48.84, 48.84, 48.84, 48.84002, 49.5])
+        lon = np.array([2.26, 2.26, 2.26, 2.26, 2.26001, 2.26])
+        self.assertEqual(list(points_mask(lat, lon, 3, 'mad', as_indices=True)), [0, 1, 2, 3, 4])
+        points = [point(a, b) for a, b in zip(lat, lon)]
+        self.assertEqual(len(filter_point_distance(points, 3, 'mad', min_scale=0)), 4)
+
+    def test_std_without_floor(self):
+        # the floor only applies to the MAD: std keeps filtering the small deviations
+        t = 1495456868630584064
+        timestamps = np.array([t] * 9 + [t + 500])
+        self.assertEqual(list(np.flatnonzero(~timestamps_mask(timestamps, 2))), [9])
+        uplinks = [uplink(gateway(48.84, 2.26), datetime.datetime.now(), int(timestamp)) for timestamp in timestamps]
+        self.assertEqual(len(filter_uplink_timestamps(uplinks, 2)), 9)
+        points = [point(48.84, 2.26)] * 9 + [point(48.84001, 2.26)]
+        self.assertEqual(len(filter_point_distance(points, 2)), 9)
+        self.assertEqual(len(filter_point_distance(points, 2, 'trimmed')), 9)
+
+    def test_empty_mask(self):
+        self.assertEqual(len(timestamps_mask([])), 0)
+        self.assertEqual(len(points_mask([], [])), 0)
+
+    def test_incorrect_method(self):
+        self.assertRaises(ValueError, lambda: timestamps_mask([1, 2, 3], 2, 'mean'))
+
+    def test_incorrect_min_scale(self):
+        self.assertRaises(ValueError, lambda: timestamps_mask([1, 2, 3], 2, min_scale=-1))
+
+    def test_incorrect_offsets(self):
+        self.assertRaises(ValueError, lambda: timestamps_mask([1, 2, 3], 2, offsets=[0, 2]))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from track_filter import track_filter
+from ..model.point import point
+# do not forget to use nose2 at root to run test
+
+
+class Test_track_filter(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_first_points(self):
+        a_filter = track_filter(min_points=3)
+        for i in xrange(3):
+            self.assertTrue(a_filter.accept('dev1', point(48.84 + i, 2.26)))
+        self.assertEqual(len(a_filter), 1)
+        self.assertTrue('dev1' in a_filter)
+
+    def test_sliding_statistics(self):
+        a_filter = track_filter(m=100, window=4)
+        rand = np.random.RandomState(0)
+        lat, lon = 48.84 + .001 * rand.randn(10), 2.26 + .001 * rand.randn(10)
+        for a, b in zip(lat, lon):
+            self.assertTrue(a_filter.accept('dev1', point(a, b)))
+        count, mean, std = a_filter.statistics('dev1')
+        self.assertEqual(count, 4)
+        self.assertAlmostEqual(mean[0], lat[-4:].mean())
+        self.assertAlmostEqual(mean[1], lon[-4:].mean())
+        self.assertAlmostEqual(std[0], lat[-4:].std())
+
+    def test_decaying_statistics(self):
+        a_filter = track_filter(m=100, decay=.5)
+        for a in (48.84, 48.85, 48.86):
+            a_filter.accept('dev1', point(a, 2.26))
+        count, mean, std = a_filter.statistics('dev1')
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(mean[0], .25 * 48.84 + .25 * 48.85 + .5 * 48.86)
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_reject_outlier(self):
+        a_filter = track_filter(m=3, window=10)
+        rand = np.random.RandomState(1)
+        for a, b in zip(48.84 + .0001 * rand.randn(10), 2.26 + .0001 * rand.randn(10)):
+            a_filter.accept('dev1', point(a, b))
+        self.assertFalse(a_filter.accept('dev1', point(48.90, 2.26)))
+        self.assertTrue(a_filter.accept('dev1', point(48.84, 2.26)))
+        self.assertEqual(a_filter.rejected, 1)
+
+    def test_moved_device(self):
+        a_filter = track_filter(m=3, window=5, reset_after=2)
+        for i in xrange(5):
+            a_filter.accept('dev1', point(48.84, 2.26 + .00001 * i))
+        self.assertFalse(a_filter.accept('dev1', point(48.90, 2.30)))
+        self.assertTrue(a_filter.accept('dev1', point(48.90, 2.30)))
+        self.assertEqual(a_filter.statistics('dev1')[0], 1)
+        # the restarting point is counted as accepted
+        self.assertEqual((a_filter.accepted, a_filter.rejected), (6, 1))
+
+    def test_many_devices(self):
+        a_filter = track_filter(capacity=2)
+        for device in xrange(100):
+            a_filter.accept(device, point(48.84, 2.26))
+        self.assertEqual(len(a_filter), 100)
+        self.assertEqual(a_filter.statistics(99)[0], 1)
+        self.assertEqual(a_filter.statistics('unknown'), (0, None, None))
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_filter(self):
+        self.assertRaises(ValueError, lambda: track_filter(window=1))
+        self.assertRaises(ValueError, lambda: track_filter(decay=1.))
+        self.assertRaises(ValueError, lambda: track_filter().accept('dev1', (48.84, 2.26)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+
+import numpy as np
+
+from ..model.point import point
+
+"""
+Online version of filter_point_distance for device tracks:
+    every device keeps running statistics of its accepted points (Welford), a new point is accepted
+    in O(1) when its latitude and longitude are at most m std from the running mean.
+
+Two windows are available:
+    - sliding: the statistics of the last `window` accepted points (the oldest one is removed)
+    - decaying: exponentially weighted statistics, the weight of a point is multiplied by
+      (1 - decay) at every new point
+
+The statistics of all the devices are stored in arrays (one row per device, grown by doubling).
+   .
+  / \
+ / ! \   => A device rejecting reset_after points in a row restarts its track: it has moved
+/_____\
+
+"""
+
+
+class track_filter:
+    """Incremental per-device point filter with array-backed running statistics"""
+
+    def __init__(self, m=2, window=10, decay=None, min_points=3, min_std=1e-5, reset_after=3, capacity=1024):
+        """track_filter constructor
+
+        Args:
+            m: multiplicator of std to filter |x - mean| <= m * std
+            window: number of points of the sliding window (ignored with decay)
+            decay: optional weight (0 < decay < 1) of a new point in exponentially decaying statistics
+            min_points: number of points accepted without test at the beginning of a track
+            min_std: minimal std (degree), the points of a still device are not all identical
+            reset_after: number of consecutive rejections restarting the track of a device
+            capacity: initial number of device rows
+        """
+        if m < 0:
+            m = 1
+        if decay is None and window < 2:
+            raise ValueError("Incorrect window")
+        if decay is not None and not 0 < decay < 1:
+            raise ValueError("Incorrect decay")
+        if min_points < 1 or reset_after < 1 or capacity < 1 or min_std < 0:
+            raise ValueError("Incorrect track_filter parameters")
+
+        # PUBLIC
+        self.m = m
+        self.window = None if decay is not None else window
+        self.decay = decay
+        self.min_points = min_points
+        self.min_std = min_std
+        self.reset_after = reset_after
+        self.accepted = 0
+        self.rejected = 0
+
+        # PRIVATE
+        self._rows = {}
+        self._count = np.zeros(capacity, dtype=np.int32)
+        self._rejections = np.zeros(capacity, dtype=np.int32)
+        self._mean = np.zeros((capacity, 2))
+        self._m2 = np.zeros((capacity, 2))
+        if self.window is not None:
+            # ring buffer of the points of the window
+            self._ring = np.zeros((capacity, self.window, 2))
+            self._head = np.zeros(capacity, dtype=np.int32)
+
+    def __len__(self):
+        """Number of devices tracked"""
+        return len(self._rows)
+
+    def __contains__(self, device):
+        return device in self._rows
+
+    def _row(self, device):
+        """Row of a device in the arrays, allocated at its first point"""
+        row = self._rows.get(device)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._count):
+                self._grow()
+            self._rows[device] = row
+        return row
+
+    def _grow(self):
+        """Double the number of rows of the arrays"""
+        def doubled(array):
+            return np.concatenate((array, np.zeros_like(array)))
+        self._count, self._rejections = doubled(self._count), doubled(self._rejections)
+        self._mean, self._m2 = doubled(self._mean), doubled(self._m2)
+        if self.window is not None:
+            self._ring, self._head = doubled(self._ring), doubled(self._head)
+
+    def statistics(self, device):
+        """Return the number of points, mean (lat, lon) and std (lat, lon) of a device track"""
+        row = self._rows.get(device)
+        if row is None:
+            return 0, None, None
+        return int(self._count[row]), tuple(self._mean[row]), tuple(self._std(row))
+
+    def _std(self, row):
+        if self.decay is not None:
+            variance = self._m2[row]
+        else:
+            variance = self._m2[row] / max(self._count[row], 1)
+        return np.maximum(np.sqrt(np.maximum(variance, 0.)), self.min_std)
+
+    def accept(self, device, a_point):
+        """Test a new point of a device, the accepted points update the statistics of the device
+
+        Args:
+            device: the device identifier (hashable)
+            a_point: the new point of the device
+
+        Returns:
+            True if the point is accepted
+        """
+        if not isinstance(a_point, point):
+            raise ValueError("Incorrect point")
+        row = self._row(device)
+        value = np.array((a_point.lat, a_point.lon))
+
+        if self._count[row] >= self.min_points and \
+            np.any(np.abs(value - self._mean[row]) > self.m * self._std(row)):
+            self._rejections[row] += 1
+            if self._rejections[row] < self.reset_after:
+                self.rejected += 1
+                return False
+            # the device has moved: restart its track from this point (accepted)
+            self._reset(row)
+        self.accepted += 1
+        self._rejections[row] = 0
+        self._add(row, value)
+        return True
+
+    def _reset(self, row):
+        self._count[row] = 0
+        self._mean[row] = 0.
+        self._m2[row] = 0.
+        if self.window is not None:
+            self._head[row] = 0
+
+    def _add(self, row, value):
+        """Welford update of the statistics of a row"""
+        if self.decay is not None:
+            if self._count[row] == 0:
+                self._mean[row] = value
+            else:
+                delta = value - self._mean[row]
+                self._mean[row] += self.decay * delta
+                self._m2[row] = (1. - self.decay) * (self._m2[row] + self.decay * delta**2)
+            self._count[row] += 1
+            return
+
+        if self._count[row] == self.window:
+            # remove the oldest point of the window
+            old = self._ring[row, self._head[row]]
+            delta = old - self._mean[row]
+            self._mean[row] -= delta / (self._count[row] - 1)
+            self._m2[row] -= delta * (old - self._mean[row])
+            self._count[row] -= 1
+            self._head[row] = (self._head[row] + 1) % self.window
+        self._ring[row, (self._head[row] + self._count[row]) % self.window] = value
+        self._count[row] += 1
+        delta = value - self._mean[row]
+        self._mean[row] += delta / self._count[row]
+        self._m2[row] += delta * (value - self._mean[row])
@@ -1,15 +1,62 @@
 
 import math
-import pyproj
-from sympy import Symbol
-from sympy.solvers import solve
+import numpy as np
 
 from point import point
 from ..utils.utils import is_number
+from ..utils.instrumentation import stage, count
 from projection import projection
 
-class circle:
+
+def circles_intersections(x1, y1, r1, x2, y2, r2):
+    """Compute the intersections of circles pairs in a projected x/y space
+
+    Works on scalars or on arrays of pairs (numpy broadcasting). When 2 circles
+    do not intersect (disjoint or one containing the other), the 2 returned
+    points are both the point of the radical line lying on the line of centers,
+    which is the nearest approach point used as approximation.
+
+    Args:
+        x1, y1, r1: center and radius of the first circles
+        x2, y2, r2: center and radius of the second circles
+
+    Returns:
+        xa, ya, xb, yb, approximation, found
+            xa, ya, xb, yb: the 2 points (intersection or generated) of each pair
+            approximation: True where the points are generated
+            found: False where the circles have the same center (no point)
+    """
+    with stage('circle.intersections'):
+        return _circles_intersections(x1, y1, r1, x2, y2, r2)
+
+
+def _circles_intersections(x1, y1, r1, x2, y2, r2):
+    """see circles_intersections"""
+    x1, y1, r1 = np.asarray(x1, dtype=float), np.asarray(y1, dtype=float), np.asarray(r1, dtype=float)
+    x2, y2, r2 = np.asarray(x2, dtype=float), np.asarray(y2, dtype=float), np.asarray(r2, dtype=float)
+
+    dx, dy = x2 - x1, y2 - y1
+    d = np.hypot(dx, dy)
+    found = d > 0
+    # avoid the division by zero of concentric circles, they are flagged by found
+    d = np.where(found, d, 1.)
+
+    a = (r1**2 - r2**2 + d**2) / (2. * d)
+    h2 = r1**2 - a**2
+    approximation = h2 < 0
+    h = np.sqrt(np.where(approximation, 0., h2))
+
+    count('circle.pairs', found.size)
+    count('circle.approximations', int(np.count_nonzero(approximation)))
+
+    ux, uy = dx / d, dy / d
+    base_x, base_y = x1 + a * ux, y1 + a * uy
+    return base_x - h * uy, base_y + h * ux, base_x + h * uy, base_y - h * ux, approximation, found
+
+
+class circle(object):
     """Reprensation of a geographic circle"""
+    __slots__ = ('center', 'radius')
     def __init__(self, a_point, radius):
         """circle constructor
         Args:
@@ -23,6 +70,16 @@ class circle:
         self.center = a_point
         self.radius = float(radius)
 
+    @classmethod
+    def _trusted(cls, a_point, radius):
+        """Unchecked constructor for the circles built by the library from checked data
+            see circle constructor
+        """
+        a_circle = cls.__new__(cls)
+        a_circle.center = a_point
+        a_circle.radius = float(radius)
+        return a_circle
+
     def __str__(self):
         """Overload __str__ for debug"""
         return "Circle ->\n\tradius: %f\n\tcenter => latitude: %f, longitude: %f" % (self.center.lat, self.center.lon, self.radius)
@@ -82,28 +139,16 @@ class circle:
         if not isinstance(a_circle, circle):
             raise ValueError("parameter is not a circle")
 
-        # Check if we approximate intersection or not
-        approximation = not self.does_intersect(a_circle) or self.does_contain(a_circle)
-
-        #  ============================================================= COMPUTE 
         # projection over x, y
-        self_x, self_y = proj.lat_long_to_x_y(self.center.lat, self.center.lon)
-        a_circle_x, a_circle_y = proj.lat_long_to_x_y(a_circle.center.lat, a_circle.center.lon)
-        # symbole for equation
-        x, y = Symbol('x'), Symbol('y')
-
-        equations = []
-        equations.append((self_x - x)**2 + (self_y - y)**2  - self.radius**2 )
-        equations.append((a_circle_x - x)**2 + (a_circle_y - y)**2  - a_circle.radius**2 )
-
-        res = solve( equations, x, y)
-
-        if not isinstance(res[0], tuple): # no result point
-            return None, None, approximation
-        elif len(res) == 2:
-            lo1, la1 = proj.x_y_to_long_lat(complex(res[0][0]).real, complex(res[0][1]).real)
-            lo2, la2 = proj.x_y_to_long_lat(complex(res[1][0]).real, complex(res[1][1]).real)
-            return point(la1, lo1), point(la2, lo2), approximation
-        else:
-            lo1, la1 = proj.x_y_to_long_lat(complex(res[0][0]).real, complex(res[0][1]).real)
-            return point(la1, lo1), point(la2, lo2), approximation
+        self_x, self_y = proj.point_to_x_y(self.center)
+        a_circle_x, a_circle_y = proj.point_to_x_y(a_circle.center)
+
+        xa, ya, xb, yb, approximation, found = circles_intersections(self_x, self_y, self.radius, \
+            a_circle_x, a_circle_y, a_circle.radius)
+
+        if not found: # no result point
+            return None, None, bool(approximation)
+        with stage('circle.back_projection'):
+            lo1, la1 = proj.x_y_to_long_lat(float(xa), float(ya))
+            lo2, la2 = proj.x_y_to_long_lat(float(xb), float(yb))
+        return point._trusted(la1, lo1), point._trusted(la2, lo2), bool(approximation)
@@ -3,6 +3,7 @@ from point import point
 
 class gateway(point):
     """Represent a gateway point"""
+    __slots__ = ()
     def __init__(self, lat, lon):
         """gateway constructor
             see point constructor
@@ -11,7 +12,7 @@ class gateway(point):
 
     # equality overload
     def __eq__(self, other):
-        if type(other) is type(self):
+        if isinstance(other, gateway):
             return self.lat == other.lat and self.lon == other.lon
         return False
 
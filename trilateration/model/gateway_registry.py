@@ -0,0 +1,155 @@
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from gateway import gateway
+from projection import projection
+
+class registered_gateway(gateway):
+    """Represent a gateway known by a gateway_registry, with its projected coordinates"""
+    __slots__ = ('gateway_id', 'projection_system', 'x', 'y')
+    def __init__(self, gateway_id, lat, lon, projection_system, x, y):
+        """registered_gateway constructor
+            see gateway constructor
+
+        Args:
+            gateway_id: the identifier of the gateway in the registry
+            projection_system: the projection system of x and y
+            x, y: the projected coordinates of the gateway
+        """
+        super(registered_gateway, self).__init__(lat, lon)
+        self.gateway_id = gateway_id
+        self.projection_system = projection_system
+        self.x = float(x)
+        self.y = float(y)
+
+
+class gateway_registry:
+    """Store static gateways by id with their coordinates projected once"""
+
+    def __init__(self, projection_system='epsg:2192'):
+        """gateway_registry constructor
+
+        Args:
+            projection_system: The projection system name to use. (string)
+                please choose your projection  http://spatialreference.org/ref/epsg/2192/
+        """
+        if not isinstance(projection_system, str):
+            raise ValueError("Incorrect projection_system")
+        self.projection_system = projection_system
+
+        # PRIVATE
+        self._proj = projection(projection_system)
+        self._gateways = []
+        self._indexes = {}
+        self._coordinates = None
+        self._tree = None
+
+    def __len__(self):
+        return len(self._gateways)
+
+    # pickle support (for the worker processes), the projection is rebuilt
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_proj']
+        state['_tree'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._proj = projection(self.projection_system)
+
+    def __contains__(self, gateway_id):
+        return gateway_id in self._indexes
+
+    def add(self, gateway_id, lat, lon):
+        """Register a gateway, projecting it once
+
+        Args:
+            gateway_id: identifier of the gateway (hashable)
+            lat: The latitude of the gateway
+            lon: The longitude of the gateway
+
+        Returns:
+            The registered_gateway
+        """
+        if gateway_id in self._indexes:
+            known = self._gateways[self._indexes[gateway_id]]
+            if known.lat != lat or known.lon != lon:
+                raise ValueError("Gateway already registered with other coordinates")
+            return known
+        # validate the coordinates before projecting them
+        gateway(lat, lon)
+        x, y = self._proj.lat_long_to_x_y(lat, lon)
+        a_gateway = registered_gateway(gateway_id, lat, lon, self.projection_system, x, y)
+        self._indexes[gateway_id] = len(self._gateways)
+        self._gateways.append(a_gateway)
+        self._coordinates = None
+        self._tree = None
+        return a_gateway
+
+    def get(self, gateway_id):
+        """Return the registered_gateway of an id"""
+        if gateway_id not in self._indexes:
+            raise ValueError("Unknown gateway")
+        return self._gateways[self._indexes[gateway_id]]
+
+    def index(self, gateway_id):
+        """Return the position of a gateway in the registry arrays"""
+        if gateway_id not in self._indexes:
+            raise ValueError("Unknown gateway")
+        return self._indexes[gateway_id]
+
+    def gateway_at(self, index):
+        """Return the registered_gateway at a position of the registry arrays"""
+        return self._gateways[index]
+
+    def coordinates(self):
+        """Return the lat, lon, x and y arrays of all the registered gateways, in registration order"""
+        if self._coordinates is None:
+            self._coordinates = (np.array([g.lat for g in self._gateways]), \
+                np.array([g.lon for g in self._gateways]), \
+                np.array([g.x for g in self._gateways]), \
+                np.array([g.y for g in self._gateways]))
+        return self._coordinates
+
+    def _spatial_index(self):
+        """KD-tree of the projected gateways, built at first use after a registration"""
+        if self._tree is None:
+            _, _, x, y = self.coordinates()
+            self._tree = cKDTree(np.column_stack((x, y)))
+        return self._tree
+
+    def nearest(self, lat, lon, k=1, max_distance=None):
+        """Find the registered gateways nearest to positions
+
+        Args:
+            lat, lon: the position(s)
+            k: number of gateways per position
+            max_distance: optional maximal distance (meter)
+
+        Returns:
+            distances (meter) and registry indexes arrays of shape (k,) (or (N, k) for N positions),
+            sorted by distance, missing gateways have an infinite distance and the index len(registry)
+        """
+        if k < 1 or len(self._gateways) == 0:
+            raise ValueError("Incorrect k or empty registry")
+        x, y = self._proj.lat_long_to_x_y(lat, lon)
+        return self.nearest_x_y(x, y, k, max_distance)
+
+    def nearest_x_y(self, x, y, k=1, max_distance=None):
+        """see nearest, with positions already projected in the projection system of the registry"""
+        if k < 1 or len(self._gateways) == 0:
+            raise ValueError("Incorrect k or empty registry")
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        distances, indexes = self._spatial_index().query(np.column_stack((x.ravel(), y.ravel())), k, \
+            distance_upper_bound=np.inf if max_distance is None else max_distance)
+        shape = x.shape + (k,)
+        return distances.reshape(shape), indexes.reshape(shape)
+
+    def within(self, lat, lon, radius):
+        """Return the registry indexes of the gateways at most radius (meter) from a position, sorted"""
+        if len(self._gateways) == 0:
+            return np.zeros(0, dtype=np.intp)
+        x, y = self._proj.lat_long_to_x_y(lat, lon)
+        return np.array(sorted(self._spatial_index().query_ball_point((x, y), radius)), dtype=np.intp)
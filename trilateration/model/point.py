@@ -5,6 +5,7 @@ from ..utils.utils import is_number, EARTH_RADIUS
 
 class point(object):
     """ Representation of a Latitude / Longitude point"""
+    __slots__ = ('lat', 'lon')
 
     def __init__(self, lat, lon):
         """Point constructor
@@ -20,6 +21,19 @@ class point(object):
         self.lat = float(lat)
         self.lon = float(lon)
 
+    @classmethod
+    def _trusted(cls, lat, lon):
+        """Unchecked constructor for the points computed by the library
+
+        Args:
+            lat: The latitude value, already valid
+            lon: The longitude value, already valid
+        """
+        a_point = cls.__new__(cls)
+        a_point.lat = float(lat)
+        a_point.lon = float(lon)
+        return a_point
+
     def __str__(self):
         """Overload __str__ for debug purpose"""
         return "Point ->\n\tlatitude: %f, longitude: %f" % (self.lat, self.lon)
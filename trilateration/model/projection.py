@@ -1,19 +1,49 @@
 
+import threading
+import numpy as np
 import pyproj
 
-class projection:
-    """Check if an object is float, int or long.
+from ..utils.instrumentation import stage
+
+# pyproj.Proj objects are expensive to build: they are shared by projection system
+_PROJ_CACHE = {}
+_PROJ_CACHE_LOCK = threading.Lock()
+
 
-    Args:
-        object to test
+def _cached_proj(a_projection):
+    """Return the shared pyproj.Proj of a projection system, building it at first use"""
+    proj = _PROJ_CACHE.get(a_projection)
+    if proj is None:
+        with _PROJ_CACHE_LOCK:
+            proj = _PROJ_CACHE.get(a_projection)
+            if proj is None:
+                with stage('projection.setup'):
+                    proj = pyproj.Proj(init=a_projection)
+                _PROJ_CACHE[a_projection] = proj
+    return proj
 
-    Returns:
-        True if is is as float, int or long, False otherwise
 
+def clear_cache():
+    """Forget the shared pyproj.Proj objects, the next projection of every system builds its own again
+
+    Used to measure the cold start of the computations.
     """
+    with _PROJ_CACHE_LOCK:
+        _PROJ_CACHE.clear()
+
+
+def _as_coordinates(value):
+    """Sequences are transformed as float arrays, scalars and arrays are left untouched"""
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=float)
+    return value
+
+
+class projection:
+    """Projection system to go from latitude, longitude to x, y coordinates (and back)"""
 
     def __init__(self, a_projection='epsg:2192'):
-        """Check if an object is float, int or long.
+        """projection constructor, the underlying pyproj.Proj is shared by projection system
 
         Args:
             a_projection string reprentation fo the projection system
@@ -21,30 +51,71 @@ class projection:
         """
         if not isinstance(a_projection, str):
             raise ValueError("The projection parameter should be a string")
-        self.projection = pyproj.Proj(init=a_projection)
+        self.projection_system = a_projection
+        self.projection = _cached_proj(a_projection)
 
     def lat_long_to_x_y(self, lat, lon):
         """
         Transform a latitude, longitude point to as x, y point
+        Arrays (or lists) are transformed in one call
+
+        Args:
+            lat: Latitude(s)
+            lon: Longitude(s)
+
+        Returns:
+            x, y representation
+        """
+        return self.projection(_as_coordinates(lon), _as_coordinates(lat))
+
+    def point_to_x_y(self, a_point):
+        """
+        Transform a point to a x, y point, without any computation for the gateways
+        already projected in this projection system by a gateway_registry
 
         Args:
-            lat: Latitude
-            lon: Longitude
+            a_point: point (or gateway) to project
 
         Returns:
             x, y representation
         """
-        return self.projection(lon, lat)
+        if getattr(a_point, 'projection_system', None) == self.projection_system:
+            return a_point.x, a_point.y
+        return self.projection(a_point.lon, a_point.lat)
+
+    def points_to_x_y(self, points):
+        """
+        Transform a list of points to x, y arrays, projecting in one call the points
+        not already projected by a gateway_registry
+
+        Args:
+            points: list of points (or gateways) to project
+
+        Returns:
+            x, y arrays
+        """
+        x, y = np.empty(len(points)), np.empty(len(points))
+        missing = []
+        for i, a_point in enumerate(points):
+            if getattr(a_point, 'projection_system', None) == self.projection_system:
+                x[i], y[i] = a_point.x, a_point.y
+            else:
+                missing.append(i)
+        if missing:
+            x[missing], y[missing] = self.projection(np.array([points[i].lon for i in missing]), \
+                np.array([points[i].lat for i in missing]))
+        return x, y
 
     def x_y_to_long_lat(self, x, y):
         """
         Transform a point x, y to a longitude, latitude point
+        Arrays (or lists) are transformed in one call
 
         Args:
-            x: x
-            y: y
+            x: x(s)
+            y: y(s)
 
         Returns:
             Longitude, Latitude representation
         """
-        return self.projection(x, y, inverse=True)
+        return self.projection(_as_coordinates(x), _as_coordinates(y), inverse=True)
@@ -2,7 +2,8 @@ import unittest
 
 import time
 import datetime
-from circle import circle
+import numpy as np
+from circle import circle, circles_intersections
 from point import point
 # do not forget to use nose2 at root to run test
 
@@ -17,6 +18,36 @@ class Test_circle(unittest.TestCase):
         self.assertEqual(c.center.lon, 2.26)
         self.assertEqual(c.radius, 300)
 
+    def test_trusted_circle(self):
+        c = circle._trusted(point(48.84, 2.26), 300)
+        self.assertEqual(c.radius, 300.)
+        self.assertFalse(hasattr(c, '__dict__'))
+
+    def test_circles_intersections(self):
+        xa, ya, xb, yb, approximation, found = circles_intersections(0, 0, 5, 8, 0, 5)
+        self.assertTrue(found)
+        self.assertFalse(approximation)
+        self.assertAlmostEqual(xa, 4)
+        self.assertAlmostEqual(abs(ya), 3)
+        self.assertAlmostEqual(xb, 4)
+        self.assertAlmostEqual(yb, -ya)
+
+    def test_circles_intersections_approximation(self):
+        xa, ya, xb, yb, approximation, found = circles_intersections(0, 0, 1, 10, 0, 3)
+        self.assertTrue(found)
+        self.assertTrue(approximation)
+        self.assertAlmostEqual(xa, xb)
+        self.assertAlmostEqual(ya, 0)
+        self.assertAlmostEqual(yb, 0)
+
+    def test_circles_intersections_array(self):
+        xa, ya, xb, yb, approximation, found = circles_intersections(
+            np.array([0., 0., 0.]), np.zeros(3), np.array([5., 1., 2.]),
+            np.array([8., 10., 0.]), np.zeros(3), np.array([5., 3., 2.]))
+        self.assertEqual(list(found), [True, True, False])
+        self.assertEqual(list(approximation[:2]), [False, True])
+        self.assertAlmostEqual(xa[0], 4)
+
     # =============================================== ERROR CHECKING
 
     def test_negative_radius(self):
@@ -0,0 +1,107 @@
+import unittest
+
+import datetime
+from gateway import gateway
+from uplink import uplink
+from projection import projection
+from gateway_registry import gateway_registry, registered_gateway
+from ..compute.tdoa import tdoa
+from ..utils.utils import SPEED_OF_LIGHT
+# do not forget to use nose2 at root to run test
+
+
+class Test_gateway_registry(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+
+    def test_registry_creation(self):
+        registry = gateway_registry()
+        g = registry.add('gw1', 48.84, 2.26)
+        self.assertTrue(isinstance(g, registered_gateway))
+        self.assertTrue('gw1' in registry)
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.get('gw1'), g)
+        self.assertEqual(registry.index('gw1'), 0)
+        self.assertEqual(g, gateway(48.84, 2.26))
+
+    def test_precomputed_projection(self):
+        registry = gateway_registry()
+        g = registry.add('gw1', 48.84, 2.26)
+        x, y = projection().lat_long_to_x_y(48.84, 2.26)
+        self.assertAlmostEqual(g.x, x)
+        self.assertAlmostEqual(g.y, y)
+        self.assertEqual(projection().point_to_x_y(g), (g.x, g.y))
+
+    def test_add_twice(self):
+        registry = gateway_registry()
+        g = registry.add('gw1', 48.84, 2.26)
+        self.assertTrue(registry.add('gw1', 48.84, 2.26) is g)
+        self.assertEqual(len(registry), 1)
+
+    def test_coordinates(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        registry.add('gw2', 48.80, 2.30)
+        lat, lon, x, y = registry.coordinates()
+        self.assertEqual(list(lat), [48.84, 48.80])
+        self.assertEqual(list(lon), [2.26, 2.30])
+        self.assertEqual(x[1], registry.get('gw2').x)
+
+    def test_registry_with_solver(self):
+        registry = gateway_registry()
+        t = 1495456868630584064
+        x, y = projection().lat_long_to_x_y(48.83, 2.29)
+        uplinks = []
+        for i, (lat, lon) in enumerate([(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]):
+            g = registry.add(i, lat, lon)
+            delay = int(round(((g.x - x)**2 + (g.y - y)**2)**.5 / SPEED_OF_LIGHT))
+            uplinks.append(uplink(g, datetime.datetime.now(), t + delay))
+        solver = tdoa(uplinks)
+        self.assertTrue(solver.is_resolved)
+        self.assertAlmostEqual(solver.geolocalized_device.lat, 48.83, delta=.0001)
+
+    def test_nearest(self):
+        registry = gateway_registry()
+        for i, (lat, lon) in enumerate([(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]):
+            registry.add(i, lat, lon)
+        distances, indexes = registry.nearest(48.839, 2.299, 2)
+        self.assertEqual(list(indexes), [1, 0])
+        self.assertTrue(distances[0] < 200)
+        distances, indexes = registry.nearest([48.80, 48.90], [2.30, 2.40], 1, max_distance=10.)
+        self.assertEqual(indexes.shape, (2, 1))
+        self.assertEqual(list(indexes[:, 0]), [2, 3])
+        distances, indexes = registry.nearest(48.0, 2.0, 1, max_distance=10.)
+        self.assertEqual(distances[0], float('inf'))
+        self.assertEqual(indexes[0], len(registry))
+
+    def test_within(self):
+        registry = gateway_registry()
+        for i, (lat, lon) in enumerate([(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]):
+            registry.add(i, lat, lon)
+        self.assertEqual(list(registry.within(48.83, 2.28, 3000.)), [0, 1])
+        registry.add(4, 48.83, 2.28)
+        self.assertEqual(list(registry.within(48.83, 2.28, 3000.)), [0, 1, 4])
+
+    # =============================================== ERROR CHECKING
+
+    def test_unknown_gateway(self):
+        registry = gateway_registry()
+        self.assertRaises(ValueError, lambda: registry.get('gw1'))
+
+    def test_add_other_coordinates(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        self.assertRaises(ValueError, lambda: registry.add('gw1', 48.80, 2.26))
+
+    def test_incorrect_gateway(self):
+        registry = gateway_registry()
+        self.assertRaises(ValueError, lambda: registry.add('gw1', 300, 2.26))
+
+    def test_nearest_empty_registry(self):
+        self.assertRaises(ValueError, lambda: gateway_registry().nearest(48.84, 2.26))
+
+    def test_incorrect_projection_parameter(self):
+        self.assertRaises(ValueError, lambda: gateway_registry(42))
+
+if __name__ == '__main__':
+    unittest.main()
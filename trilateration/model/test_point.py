@@ -13,6 +13,17 @@ class Test_utils(unittest.TestCase):
         self.assertEqual(p1.lat, 48.84)
         self.assertEqual(p1.lon, 2.26)
 
+    def test_point_slots(self):
+        p1 = point(48.84, 2.26)
+        self.assertFalse(hasattr(p1, '__dict__'))
+        self.assertRaises(AttributeError, lambda: setattr(p1, 'altitude', 42))
+
+    def test_trusted_point(self):
+        p1 = point._trusted(48.84, 2.26)
+        self.assertTrue(isinstance(p1, point))
+        self.assertEqual(p1.lat, 48.84)
+        self.assertEqual(p1.lon, 2.26)
+
     # =============================================== ERROR CHECKING
 
     def test_bad_point_parameter(self):
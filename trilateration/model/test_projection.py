@@ -2,7 +2,8 @@ import unittest
 
 import time
 import datetime
-from projection import projection
+import numpy as np
+from projection import projection, clear_cache
 from circle import circle
 from point import point
 # do not forget to use nose2 at root to run test
@@ -21,6 +22,29 @@ class Test_projection(unittest.TestCase):
         self.assertAlmostEqual(48.83999999998599, lat)
         self.assertAlmostEqual(2.2600000000000007, lon)
 
+    def test_shared_projection(self):
+        self.assertTrue(projection().projection is projection('epsg:2192').projection)
+
+    def test_clear_cache(self):
+        shared = projection().projection
+        clear_cache()
+        self.assertFalse(projection().projection is shared)
+
+    def test_array_projection(self):
+        proj = projection()
+        x, y = proj.lat_long_to_x_y(np.array([48.84, 48.80]), np.array([2.26, 2.30]))
+        self.assertAlmostEqual(594327.720979058, x[0])
+        self.assertAlmostEqual(2426852.1010616063, y[0])
+        lon, lat = proj.x_y_to_long_lat(x, y)
+        self.assertAlmostEqual(48.80, lat[1])
+        self.assertAlmostEqual(2.30, lon[1])
+
+    def test_points_projection(self):
+        proj = projection()
+        x, y = proj.points_to_x_y([point(48.84, 2.26), point(48.80, 2.30)])
+        self.assertAlmostEqual(594327.720979058, x[0])
+        self.assertEqual((x[1], y[1]), proj.lat_long_to_x_y(48.80, 2.30))
+
     # =============================================== ERROR CHECKING
 
     def test_incorrect_projection_parameter(self):
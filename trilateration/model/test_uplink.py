@@ -22,6 +22,18 @@ class Test_uplink(unittest.TestCase):
         self.assertEqual(u.timestamp, t)
         self.assertEqual(u.arrival_date, d)
 
+    def test_uplink_slots(self):
+        u = uplink(gateway(48.84, 2.26), datetime.datetime.now(), 42)
+        self.assertFalse(hasattr(u, '__dict__'))
+        self.assertFalse(hasattr(u.gateway, '__dict__'))
+
+    def test_trusted_uplink(self):
+        g = gateway(48.84, 2.26)
+        u = uplink._trusted(g, None, 42)
+        self.assertEqual(u.gateway, g)
+        self.assertEqual(u.timestamp, 42)
+        self.assertIsNone(u.rssi)
+
     # =============================================== ERROR CHECKING
 
     def test_incorrect_timestamp_uplink(self):
@@ -0,0 +1,143 @@
+import unittest
+
+import os
+import shutil
+import datetime
+import tempfile
+import numpy as np
+from gateway import gateway
+from uplink import uplink
+from uplink_batch import uplink_batch
+from uplink_archive import archive_writer, archive_reader
+from gateway_registry import gateway_registry
+# do not forget to use nose2 at root to run test
+
+
+class Test_uplink_archive(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'archive')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def _registry(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        registry.add('gw2', 48.84, 2.30)
+        registry.add('gw3', 48.80, 2.30)
+        return registry
+
+    def _batch(self, first_id=0, registry=None):
+        return uplink_batch([first_id, first_id, first_id + 1, first_id + 1, first_id + 1], [0, 1, 0, 1, 2], \
+            [10, 20, 30, 40, 50], registry or self._registry(), rssi=[-100, -90, np.nan, -80, -70])
+
+    # =============================================== OBJECT UNIT TEST
+    def test_empty_archive(self):
+        archive_writer(self.path).close()
+        reader = archive_reader(self.path)
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(reader.size, 0)
+        self.assertEqual(len(reader.batch()), 0)
+        self.assertEqual(list(reader.column('offsets')), [0])
+
+    def test_write_read(self):
+        with archive_writer(self.path) as writer:
+            writer.append(self._batch(0))
+            writer.append(self._batch(5))
+        reader = archive_reader(self.path)
+        self.assertEqual(len(reader), 4)
+        self.assertEqual(reader.size, 10)
+        self.assertEqual(len(reader.registry), 3)
+        batch = reader.batch()
+        self.assertEqual(list(batch.messages()), [0, 1, 5, 6])
+        self.assertEqual(list(batch.counts()), [2, 3, 2, 3])
+        self.assertEqual(list(batch.timestamps[:5]), [10, 20, 30, 40, 50])
+        self.assertEqual(list(reader.column('offsets')), [0, 2, 5, 7, 10])
+        self.assertIsNone(batch.rssi)
+        self.assertEqual(reader.registry.gateway_at(batch.gateway_indexes[4]).gateway_id, 'gw3')
+
+    def test_zero_copy(self):
+        with archive_writer(self.path) as writer:
+            writer.append(self._batch())
+        reader = archive_reader(self.path)
+        batch = reader.batch(1, 2)
+        self.assertTrue(isinstance(batch.timestamps, np.memmap))
+        self.assertTrue(np.may_share_memory(batch.timestamps, reader.column('timestamps')))
+        self.assertTrue(np.may_share_memory(batch.gateway_indexes, reader.column('gateways')))
+        self.assertEqual(list(batch.timestamps), [30, 40, 50])
+        self.assertRaises(ValueError, lambda: batch.timestamps.__setitem__(0, 1))
+
+    def test_radio(self):
+        with archive_writer(self.path, radio=True) as writer:
+            writer.append(self._batch())
+            writer.append(uplink_batch([9], [0], [60], self._registry()))
+        batch = archive_reader(self.path).batch()
+        self.assertEqual(batch.rssi[0], -100)
+        self.assertTrue(np.isnan(batch.rssi[2]))
+        self.assertTrue(np.isnan(batch.rssi[5]))
+        self.assertTrue(np.all(np.isnan(batch.snr)))
+
+    def test_batches(self):
+        with archive_writer(self.path) as writer:
+            for i in xrange(5):
+                writer.append(self._batch(2 * i))
+        batches = list(archive_reader(self.path).batches(messages=3))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3, 1])
+        self.assertEqual(list(batches[1].messages()), [3, 4, 5])
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_reopen_and_append(self):
+        with archive_writer(self.path) as writer:
+            writer.append(self._batch(0))
+        # a new gateway and another registry: the indexes are remapped on the gateway table
+        registry = gateway_registry()
+        registry.add('gw4', 48.90, 2.40)
+        registry.add('gw2', 48.84, 2.30)
+        with archive_writer(self.path) as writer:
+            writer.append(uplink_batch([3, 3], [0, 1], [70, 80], registry))
+        reader = archive_reader(self.path)
+        batch = reader.batch(2)
+        self.assertEqual([reader.registry.gateway_at(i).gateway_id for i in batch.gateway_indexes], ['gw4', 'gw2'])
+        self.assertEqual(len(reader), 3)
+
+    def test_uncommitted_rows_dropped(self):
+        writer = archive_writer(self.path)
+        writer.append(self._batch(0))
+        writer.flush()
+        writer.append(self._batch(5))
+        # no flush: the second batch is not committed
+        for column_file in writer._files.itervalues():
+            column_file.flush()
+        self.assertEqual(len(archive_reader(self.path)), 2)
+        writer = archive_writer(self.path)
+        writer.append(self._batch(5))
+        writer.close()
+        reader = archive_reader(self.path)
+        self.assertEqual(list(reader.batch().messages()), [0, 1, 5, 6])
+        self.assertEqual(os.path.getsize(os.path.join(self.path, 'timestamps.bin')), 10 * 8)
+
+    def test_append_uplinks(self):
+        uplinks = [uplink(gateway(48.84, 2.26), datetime.datetime.now(), 10), \
+            uplink(gateway(48.84, 2.30), datetime.datetime.now(), 20)]
+        with archive_writer(self.path) as writer:
+            writer.append_uplinks([uplinks, uplinks[:1]], [1, 2])
+        reader = archive_reader(self.path)
+        self.assertEqual(list(reader.batch().counts()), [2, 1])
+        self.assertEqual(reader.batch(1).to_uplinks(0)[0].gateway.lat, 48.84)
+
+    # =============================================== ERROR CHECKING
+    def test_decreasing_message_ids(self):
+        with archive_writer(self.path) as writer:
+            writer.append(self._batch(5))
+            self.assertRaises(ValueError, lambda: writer.append(self._batch(0)))
+
+    def test_incorrect_batch(self):
+        with archive_writer(self.path) as writer:
+            self.assertRaises(ValueError, lambda: writer.append([1, 2, 3]))
+        reader = archive_reader(self.path)
+        self.assertRaises(ValueError, lambda: reader.column('lat'))
+        self.assertRaises(IndexError, lambda: reader.batch(3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import datetime
+import numpy as np
+from gateway import gateway
+from uplink import uplink
+from uplink_batch import uplink_batch
+from gateway_registry import gateway_registry
+# do not forget to use nose2 at root to run test
+
+
+class Test_uplink_batch(unittest.TestCase):
+
+    def _registry(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        registry.add('gw2', 48.84, 2.30)
+        registry.add('gw3', 48.80, 2.30)
+        return registry
+
+    # =============================================== OBJECT UNIT TEST
+
+    def test_batch_creation(self):
+        batch = uplink_batch([7, 7, 9], [0, 1, 2], [10, 20, 30], self._registry())
+        self.assertEqual(len(batch), 2)
+        self.assertEqual(batch.size, 3)
+        self.assertEqual(list(batch.counts()), [2, 1])
+        self.assertEqual(list(batch.messages()), [7, 9])
+        self.assertEqual(batch.timestamps.dtype, np.int64)
+        self.assertIsNone(batch.rssi)
+
+    def test_unsorted_batch(self):
+        batch = uplink_batch([9, 7, 7], [2, 0, 1], [30, 10, 20], self._registry(), rssi=[-100., -90., -95.])
+        self.assertEqual(list(batch.message_ids), [7, 7, 9])
+        self.assertEqual(list(batch.gateway_indexes), [0, 1, 2])
+        self.assertEqual(list(batch.rssi), [-90., -95., -100.])
+
+    def test_message_view(self):
+        batch = uplink_batch([7, 7, 9], [0, 1, 2], [10, 20, 30], self._registry())
+        message = batch.message(0)
+        self.assertEqual(list(message.timestamps), [10, 20])
+        self.assertTrue(np.may_share_memory(message.timestamps, batch.timestamps))
+
+    def test_from_uplinks(self):
+        registry = self._registry()
+        t = 1495456868630584064
+        messages = [[uplink(registry.get('gw1'), datetime.datetime.now(), t, rssi=-100.),
+                     uplink(gateway(48.90, 2.40), datetime.datetime.now(), t + 1)],
+                    [uplink(registry.get('gw3'), datetime.datetime.now(), t + 2)]]
+        batch = uplink_batch.from_uplinks(messages, registry)
+        self.assertEqual(len(registry), 4)
+        self.assertEqual(list(batch.gateway_indexes), [0, 3, 2])
+        self.assertEqual(list(batch.timestamps), [t, t + 1, t + 2])
+        uplinks = batch.to_uplinks(0)
+        self.assertEqual(uplinks[0].gateway, registry.get('gw1'))
+        self.assertEqual(uplinks[0].rssi, -100.)
+        self.assertIsNone(uplinks[1].rssi)
+
+    def test_fixed_size(self):
+        batch = uplink_batch([1, 1, 2, 3, 3], [0, 1, 2, 1, 2], [1, 2, 3, 4, 5], self._registry())
+        ids, indexes, timestamps = batch.fixed_size(2)
+        self.assertEqual(list(ids), [1, 3])
+        self.assertEqual(indexes.tolist(), [[0, 1], [1, 2]])
+        self.assertEqual(timestamps.tolist(), [[1, 2], [4, 5]])
+
+    def test_select(self):
+        batch = uplink_batch([1, 1, 2], [0, 1, 2], [1, 2, 3], self._registry())
+        selected = batch.select([True, False, True])
+        self.assertEqual(len(selected), 2)
+        self.assertEqual(list(selected.gateway_indexes), [0, 2])
+
+    # =============================================== ERROR CHECKING
+
+    def test_incorrect_columns(self):
+        self.assertRaises(ValueError, lambda: uplink_batch([1, 1], [0], [1, 2], self._registry()))
+
+    def test_incorrect_gateway_index(self):
+        self.assertRaises(ValueError, lambda: uplink_batch([1], [5], [1], self._registry()))
+
+    def test_incorrect_registry(self):
+        self.assertRaises(ValueError, lambda: uplink_batch([1], [0], [1], None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,16 +2,19 @@
 from gateway import gateway
 from ..utils.utils import is_number
 
-class uplink:
+class uplink(object):
     """Represent a message arrived at a datetime at a certain nanosecond time"""
+    __slots__ = ('gateway', 'arrival_date', 'timestamp', 'rssi', 'snr')
 
-    def __init__(self, a_gateway, date, timestamp):
+    def __init__(self, a_gateway, date, timestamp, rssi=None, snr=None):
         """Uplink constructor
 
         Args:
             a_gateway: the gateway that has received the message
             date: the date of the message
             timestamp: a precised time (nanosecond) for calculous
+            rssi: optional received signal strength indication
+            snr: optional signal to noise ratio
         """
         if not isinstance(a_gateway, gateway):
             raise ValueError("Incorrect point")
@@ -20,4 +23,19 @@ class uplink:
         self.gateway = a_gateway
         self.arrival_date = date
         self.timestamp = timestamp
+        self.rssi = rssi
+        self.snr = snr
+
+    @classmethod
+    def _trusted(cls, a_gateway, date, timestamp, rssi=None, snr=None):
+        """Unchecked constructor for the uplinks built by the library from checked data
+            see uplink constructor
+        """
+        an_uplink = cls.__new__(cls)
+        an_uplink.gateway = a_gateway
+        an_uplink.arrival_date = date
+        an_uplink.timestamp = timestamp
+        an_uplink.rssi = rssi
+        an_uplink.snr = snr
+        return an_uplink
 
@@ -0,0 +1,239 @@
+
+import os
+import json
+import numpy as np
+
+from uplink_batch import uplink_batch
+from gateway_registry import gateway_registry
+
+"""
+Columnar on-disk archive of uplink batches, one directory per archive:
+    message_ids.bin      int64 message identifier of every uplink (increasing)
+    gateways.bin         int64 index of the gateway of every uplink in the gateway table
+    timestamps.bin       int64 nanosecond timestamp of every uplink
+    offsets.bin          int64 first uplink of every message, and the number of uplinks at the end
+    rssi.bin, snr.bin    optional float64 radio values of every uplink (nan when unknown)
+    archive.json         counts, projection system and gateway table ([id, lat, lon] by index)
+
+The writer appends the batches to the column files and commits the counts in archive.json at every
+flush, the rows written after the last flush are ignored (and truncated by the next writer).
+The reader maps the files read only and returns batches whose columns are views on the pages.
+   .
+  / \
+ / ! \   => The message ids must increase from batch to batch: the rows of a message are contiguous
+/_____\     and a batch read from the archive is already sorted
+
+"""
+
+COLUMNS = ('message_ids', 'gateways', 'timestamps', 'offsets')
+RADIO_COLUMNS = ('rssi', 'snr')
+DTYPES = {
+    'message_ids': np.dtype('<i8'),
+    'gateways': np.dtype('<i8'),
+    'timestamps': np.dtype('<i8'),
+    'offsets': np.dtype('<i8'),
+    'rssi': np.dtype('<f8'),
+    'snr': np.dtype('<f8'),
+}
+META_FILE = 'archive.json'
+VERSION = 1
+
+
+def _column_path(path, column):
+    return os.path.join(path, column + '.bin')
+
+
+def _read_meta(path):
+    with open(os.path.join(path, META_FILE)) as meta_file:
+        meta = json.load(meta_file)
+    if meta.get('version') != VERSION:
+        raise ValueError("Unsupported archive version")
+    return meta
+
+
+def _registry(meta):
+    """Gateway registry of the gateway table of an archive (indexes kept)"""
+    registry = gateway_registry(str(meta['projection_system']))
+    for gateway_id, lat, lon in meta['gateways']:
+        registry.add(gateway_id if not isinstance(gateway_id, list) else tuple(gateway_id), lat, lon)
+    return registry
+
+
+class archive_writer:
+    """Streaming writer of an uplink archive"""
+
+    def __init__(self, path, projection_system='epsg:2192', radio=False):
+        """archive_writer constructor, creates the archive or appends to an existing one
+
+        Args:
+            path: the directory of the archive
+            projection_system: The projection system name of the gateway table (new archive)
+            radio: store the rssi and snr columns (new archive)
+        """
+        if os.path.exists(os.path.join(path, META_FILE)):
+            meta = _read_meta(path)
+        else:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            meta = {'projection_system': projection_system, 'gateways': [], 'radio': radio, 'messages': 0, \
+                'uplinks': 0, 'last_message_id': None}
+
+        # PUBLIC
+        self.path = path
+        self.registry = _registry(meta)
+        self.radio = meta['radio']
+        self.messages = meta['messages']
+        self.uplinks = meta['uplinks']
+
+        # PRIVATE
+        self._last_id = meta['last_message_id']
+        self._files = {}
+        for column in self._columns():
+            column_file = open(_column_path(path, column), 'ab')
+            # drop the rows written after the last commit
+            rows = self.messages + 1 if column == 'offsets' else self.uplinks
+            # (the first offset of a new archive is the 0 filled by truncate)
+            column_file.truncate(rows * DTYPES[column].itemsize)
+            self._files[column] = column_file
+        self.flush()
+
+    def _columns(self):
+        return COLUMNS + RADIO_COLUMNS if self.radio else COLUMNS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def append(self, batch):
+        """Append the messages of an uplink_batch
+
+        Args:
+            batch: the uplink_batch, its message ids greater than the ones already written
+        """
+        if not isinstance(batch, uplink_batch):
+            raise ValueError("Incorrect batch")
+        if batch.size == 0:
+            return
+        if self._last_id is not None and batch.message_ids[0] <= self._last_id:
+            raise ValueError("Message ids should increase from batch to batch")
+
+        gateways = batch.gateway_indexes
+        if batch.registry is not self.registry:
+            # gateway indexes of the batch registry -> indexes of the gateway table
+            mapping = np.empty(len(batch.registry), dtype=np.int64)
+            for index in np.unique(gateways):
+                a_gateway = batch.registry.gateway_at(index)
+                self.registry.add(a_gateway.gateway_id, a_gateway.lat, a_gateway.lon)
+                mapping[index] = self.registry.index(a_gateway.gateway_id)
+            gateways = mapping[gateways]
+
+        columns = {
+            'message_ids': batch.message_ids,
+            'gateways': gateways,
+            'timestamps': batch.timestamps,
+            'offsets': self.uplinks + batch.offsets[1:],
+        }
+        if self.radio:
+            for column in RADIO_COLUMNS:
+                values = getattr(batch, column)
+                columns[column] = np.full(batch.size, np.nan) if values is None else values
+        for column in self._columns():
+            np.asarray(columns[column], dtype=DTYPES[column]).tofile(self._files[column])
+        self.messages += len(batch)
+        self.uplinks += batch.size
+        self._last_id = int(batch.message_ids[-1])
+
+    def append_uplinks(self, messages, message_ids):
+        """Append lists of uplink objects, see uplink_batch.from_uplinks"""
+        self.append(uplink_batch.from_uplinks(messages, self.registry, message_ids))
+
+    def flush(self):
+        """Write the column files and commit the counts and the gateway table"""
+        for column_file in self._files.itervalues():
+            column_file.flush()
+        gateways = [[self.registry.gateway_at(i).gateway_id, self.registry.gateway_at(i).lat, \
+            self.registry.gateway_at(i).lon] for i in xrange(len(self.registry))]
+        temporary = os.path.join(self.path, META_FILE + '.tmp')
+        with open(temporary, 'w') as meta_file:
+            json.dump({
+                'version': VERSION,
+                'projection_system': self.registry.projection_system,
+                'radio': self.radio,
+                'messages': self.messages,
+                'uplinks': self.uplinks,
+                'last_message_id': self._last_id,
+                'gateways': gateways,
+            }, meta_file)
+        os.rename(temporary, os.path.join(self.path, META_FILE))
+
+    def close(self):
+        if not self._files:
+            return
+        self.flush()
+        for column_file in self._files.itervalues():
+            column_file.close()
+        self._files = {}
+
+
+class archive_reader:
+    """Memory mapped reader of an uplink archive"""
+
+    def __init__(self, path):
+        """archive_reader constructor
+
+        Args:
+            path: the directory of the archive
+        """
+        meta = _read_meta(path)
+
+        # PUBLIC
+        self.path = path
+        self.registry = _registry(meta)
+        self.radio = meta['radio']
+        self.size = meta['uplinks']
+
+        # PRIVATE
+        self._messages = meta['messages']
+        self._columns = {}
+        for column in (COLUMNS + RADIO_COLUMNS if self.radio else COLUMNS):
+            rows = self._messages + 1 if column == 'offsets' else self.size
+            if rows == 0:
+                self._columns[column] = np.zeros(0, dtype=DTYPES[column])
+            else:
+                self._columns[column] = np.memmap(_column_path(path, column), dtype=DTYPES[column], mode='r', \
+                    shape=(rows,))
+
+    def __len__(self):
+        """Number of messages"""
+        return self._messages
+
+    def column(self, name):
+        """Return a read only view on a whole column ('message_ids', 'gateways', 'timestamps', 'offsets',
+        'rssi' or 'snr')"""
+        if name not in self._columns:
+            raise ValueError("Unknown column")
+        return self._columns[name]
+
+    def batch(self, start=0, stop=None):
+        """Return the messages [start, stop[ as an uplink_batch of views on the files (no copy)"""
+        stop = self._messages if stop is None else min(stop, self._messages)
+        if start < 0 or start > stop:
+            raise IndexError("Message range out of the archive")
+        offsets = self._columns['offsets']
+        rows = slice(int(offsets[start]), int(offsets[stop]))
+        # gateway indexes are used as np.intp by the batch solvers
+        gateways = self._columns['gateways'][rows]
+        if gateways.dtype != np.dtype(np.intp):
+            gateways = gateways.astype(np.intp)
+        radio = [self._columns[column][rows] if self.radio else None for column in RADIO_COLUMNS]
+        return uplink_batch._trusted(self.registry, self._columns['message_ids'][rows], gateways, \
+            self._columns['timestamps'][rows], *radio)
+
+    def batches(self, messages=4096):
+        """Iterate over the archive by batches of messages"""
+        if messages < 1:
+            raise ValueError("Incorrect messages")
+        for start in xrange(0, self._messages, messages):
+            yield self.batch(start, start + messages)
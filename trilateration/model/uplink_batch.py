@@ -0,0 +1,150 @@
+
+import numpy as np
+
+from uplink import uplink
+from gateway_registry import gateway_registry
+
+class uplink_batch(object):
+    """Columnar representation of the uplinks of many messages
+
+    One row per uplink, the rows of a message are contiguous (sorted by message id):
+        message_ids: int64 message identifier
+        gateway_indexes: index of the gateway in the gateway_registry
+        timestamps: int64 nanosecond timestamp
+        rssi, snr: optional float arrays (None when unknown)
+    """
+
+    def __init__(self, message_ids, gateway_indexes, timestamps, registry, rssi=None, snr=None):
+        """uplink_batch constructor, rows are sorted by message id if needed
+
+        Args:
+            message_ids: message identifier of each uplink (integers)
+            gateway_indexes: registry index of the gateway of each uplink (integers)
+            timestamps: nanosecond timestamp of each uplink (integers)
+            registry: the gateway_registry holding the gateways
+            rssi: optional rssi of each uplink
+            snr: optional snr of each uplink
+        """
+        if not isinstance(registry, gateway_registry):
+            raise ValueError("Incorrect registry")
+        message_ids = np.asarray(message_ids, dtype=np.int64)
+        gateway_indexes = np.asarray(gateway_indexes, dtype=np.intp)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        columns = [message_ids, gateway_indexes, timestamps]
+        for optional in (rssi, snr):
+            columns.append(None if optional is None else np.asarray(optional, dtype=float))
+        for column in columns:
+            if column is not None and (column.ndim != 1 or len(column) != len(message_ids)):
+                raise ValueError("Incorrect batch columns, they should be 1D with the same length")
+        if len(gateway_indexes) and (gateway_indexes.min() < 0 or gateway_indexes.max() >= len(registry)):
+            raise ValueError("Gateway index out of the registry")
+
+        if len(message_ids) and np.any(np.diff(message_ids) < 0):
+            order = np.argsort(message_ids, kind='mergesort')
+            columns = [None if column is None else column[order] for column in columns]
+        self._set_columns(registry, *columns)
+
+    def _set_columns(self, registry, message_ids, gateway_indexes, timestamps, rssi, snr):
+        """Store the (sorted) columns and index the message boundaries"""
+        self.registry = registry
+        self.message_ids = message_ids
+        self.gateway_indexes = gateway_indexes
+        self.timestamps = timestamps
+        self.rssi = rssi
+        self.snr = snr
+        boundaries = np.flatnonzero(np.diff(message_ids)) + 1
+        self.offsets = np.concatenate(([0], boundaries, [len(message_ids)])) if len(message_ids) \
+            else np.zeros(1, dtype=np.intp)
+
+    @classmethod
+    def _trusted(cls, registry, message_ids, gateway_indexes, timestamps, rssi, snr):
+        """Build a batch from already checked and sorted columns (no copy)"""
+        batch = cls.__new__(cls)
+        batch._set_columns(registry, message_ids, gateway_indexes, timestamps, rssi, snr)
+        return batch
+
+    @classmethod
+    def from_uplinks(cls, messages, registry, message_ids=None):
+        """Build a batch from lists of uplink objects
+
+        Args:
+            messages: a list of messages, each one a list of uplinks
+            registry: the gateway_registry, gateways unknown by it are registered
+                (registered gateways keep their id, others are identified by (lat, lon))
+            message_ids: optional identifier of each message (default: position in messages)
+
+        Returns:
+            The uplink_batch
+        """
+        if message_ids is None:
+            message_ids = range(len(messages))
+        if len(message_ids) != len(messages):
+            raise ValueError("Incorrect message_ids")
+        ids, indexes, timestamps, rssi, snr = [], [], [], [], []
+        for message_id, uplink_list in zip(message_ids, messages):
+            for uplk in uplink_list:
+                if not isinstance(uplk, uplink):
+                    raise ValueError("Invalid item in messages is not a uplink")
+                gateway_id = getattr(uplk.gateway, 'gateway_id', (uplk.gateway.lat, uplk.gateway.lon))
+                registry.add(gateway_id, uplk.gateway.lat, uplk.gateway.lon)
+                ids.append(message_id)
+                indexes.append(registry.index(gateway_id))
+                timestamps.append(uplk.timestamp)
+                rssi.append(np.nan if uplk.rssi is None else uplk.rssi)
+                snr.append(np.nan if uplk.snr is None else uplk.snr)
+        return cls(ids, indexes, timestamps, registry, rssi, snr)
+
+    def __len__(self):
+        """Number of messages"""
+        return len(self.offsets) - 1
+
+    @property
+    def size(self):
+        """Number of uplinks"""
+        return len(self.message_ids)
+
+    def counts(self):
+        """Number of uplinks of each message"""
+        return np.diff(self.offsets)
+
+    def messages(self):
+        """Identifier of each message"""
+        return self.message_ids[self.offsets[:-1]]
+
+    def message(self, index):
+        """Return the message at a position as an uplink_batch of views on this batch (no copy)"""
+        if index < 0 or index >= len(self):
+            raise IndexError("Message index out of range")
+        rows = slice(self.offsets[index], self.offsets[index + 1])
+        return uplink_batch._trusted(self.registry, self.message_ids[rows], self.gateway_indexes[rows], \
+            self.timestamps[rows], None if self.rssi is None else self.rssi[rows], \
+            None if self.snr is None else self.snr[rows])
+
+    def select(self, mask):
+        """Return a new batch with the uplinks where mask is True"""
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != self.message_ids.shape:
+            raise ValueError("Incorrect mask")
+        return uplink_batch._trusted(self.registry, self.message_ids[mask], self.gateway_indexes[mask], \
+            self.timestamps[mask], None if self.rssi is None else self.rssi[mask], \
+            None if self.snr is None else self.snr[mask])
+
+    def fixed_size(self, count):
+        """Stack the messages having exactly count uplinks
+
+        Args:
+            count: the number of uplinks of the messages to keep
+
+        Returns:
+            message ids of shape (N,), gateway indexes and timestamps of shape (N, count)
+        """
+        starts = self.offsets[:-1][self.counts() == count]
+        rows = starts[:, None] + np.arange(count)
+        return self.message_ids[starts], self.gateway_indexes[rows], self.timestamps[rows]
+
+    def to_uplinks(self, index):
+        """Return the message at a position as a list of uplink objects (for the object solvers)"""
+        rows = xrange(self.offsets[index], self.offsets[index + 1])
+        return [uplink._trusted(self.registry.gateway_at(self.gateway_indexes[row]), None, int(self.timestamps[row]), \
+            None if self.rssi is None or np.isnan(self.rssi[row]) else float(self.rssi[row]), \
+            None if self.snr is None or np.isnan(self.snr[row]) else float(self.snr[row])) for row in rows]
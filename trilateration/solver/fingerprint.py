@@ -0,0 +1,248 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from ..utils.utils import SPEED_OF_LIGHT
+from ..utils.instrumentation import stage, count
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.projection import projection
+
+"""
+Fingerprint grid of a static gateway layout:
+    the propagation delay (nanosecond) from the center of every cell of a regular grid (in the
+    projected space) to every gateway is computed once and stored on disk, one plane per gateway:
+        <path>/delays.npy   float32 array of shape (gateways, rows, columns)
+        <path>/grid.json    origin, cell size, projection system, gateway table and version (sha1 of
+                            the delays and of the other fields)
+
+The expected time difference between two gateways in a cell is the difference of their planes.
+A message is located on the cell minimizing the rms of Em - mean(E), Em = delay_m - (Tm - T0) over
+its gateways: first on a coarse grid (every stride cell), then at full resolution around the best
+coarse cells. The fix answers directly when its residual is small enough, or seeds lsm.
+
+The planes are memory mapped (read only): the worker processes opening the same grid share the
+pages of the system cache.
+   .
+  / \
+ / ! \   => The grid only knows the gateways it was built with, the other gateways of a message are
+/_____\     ignored (at least 3 known gateways are needed), rebuild it when the layout changes
+
+"""
+
+DELAYS_FILE = 'delays.npy'
+GRID_FILE = 'grid.json'
+
+
+def _grid_version(path, grid):
+    """sha1 of the delays file and of the fields of grid.json (but the version)"""
+    digest = hashlib.sha1()
+    with open(os.path.join(path, DELAYS_FILE), 'rb') as delays_file:
+        for block in iter(lambda: delays_file.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps(dict((key, value) for key, value in grid.items() if key != 'version'), \
+        sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def build_fingerprint_grid(registry, path, cell_size=100., margin=2000., bounds=None):
+    """Compute the delays of the gateways of a registry and store them in a directory
+
+    Args:
+        registry: the gateway_registry of the static gateways (ids serializable in json)
+        path: the directory of the grid (created if needed)
+        cell_size: side of a cell (meter)
+        margin: distance (meter) covered around the bounding box of the gateways
+        bounds: optional (min x, min y, max x, max y) of the grid in the projection system
+
+    Returns:
+        The fingerprint_grid opened on the directory
+    """
+    if len(registry) == 0:
+        raise ValueError("Empty registry")
+    if cell_size <= 0 or margin < 0:
+        raise ValueError("Incorrect cell_size or margin")
+    lat, lon, x, y = registry.coordinates()
+    if bounds is None:
+        bounds = (x.min() - margin, y.min() - margin, x.max() + margin, y.max() + margin)
+    columns = max(int(np.ceil((bounds[2] - bounds[0]) / cell_size)), 1)
+    rows = max(int(np.ceil((bounds[3] - bounds[1]) / cell_size)), 1)
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    center_x = bounds[0] + (np.arange(columns) + .5) * cell_size
+    center_y = bounds[1] + (np.arange(rows) + .5) * cell_size
+    delays = np.lib.format.open_memmap(os.path.join(path, DELAYS_FILE), mode='w+', dtype=np.float32, \
+        shape=(len(registry), rows, columns))
+    with stage('fingerprint.build'):
+        # one plane at a time, the grid may not fit in memory
+        for i in xrange(len(registry)):
+            delays[i] = np.hypot(center_x[None, :] - x[i], center_y[:, None] - y[i]) / SPEED_OF_LIGHT
+    delays.flush()
+    del delays
+
+    gateways = [[registry.gateway_at(i).gateway_id, float(lat[i]), float(lon[i])] for i in xrange(len(registry))]
+    grid = {
+        'projection_system': registry.projection_system,
+        'origin': [float(bounds[0]), float(bounds[1])],
+        'cell_size': float(cell_size),
+        'shape': [rows, columns],
+        'gateways': gateways,
+    }
+    grid['version'] = _grid_version(path, grid)
+    with open(os.path.join(path, GRID_FILE), 'w') as grid_file:
+        json.dump(grid, grid_file)
+    return fingerprint_grid(path)
+
+
+class fingerprint_fix:
+    """Result of a fingerprint lookup, with the interface of the methods (see solver_result)"""
+
+    def __init__(self, geolocalized_device, residual, cell):
+        """fingerprint_fix constructor
+
+        Args:
+            geolocalized_device: the point of the center of the cell
+            residual: rms tdoa residual (meter) of the cell
+            cell: (row, column) of the cell in the grid
+        """
+        self.geolocalized_device = geolocalized_device
+        self.is_resolved = True
+        self.residual = residual
+        self.cell = cell
+        # no least_squares evaluation (see position_cache.record)
+        self.nfev = 0
+
+
+class fingerprint_grid:
+    """Read only, memory mapped fingerprint grid"""
+
+    def __init__(self, path, stride=None, candidates=4):
+        """fingerprint_grid constructor, opens a grid stored by build_fingerprint_grid
+
+        Args:
+            path: the directory of the grid
+            stride: cells of the fine grid per cell of the coarse grid, about 64 coarse cells per
+                side by default
+            candidates: number of best coarse cells searched at full resolution
+        """
+        if candidates < 1 or (stride is not None and stride < 1):
+            raise ValueError("Incorrect stride or candidates")
+        with open(os.path.join(path, GRID_FILE)) as grid_file:
+            grid = json.load(grid_file)
+
+        # PUBLIC
+        self.path = path
+        self.projection_system = str(grid['projection_system'])
+        self.origin = tuple(grid['origin'])
+        self.cell_size = grid['cell_size']
+        self.shape = tuple(grid['shape'])
+        self.stride = stride or max(max(self.shape) // 64, 1)
+        self.candidates = candidates
+        # content hash of the grid, computed on opening for a grid.json without version
+        self.version = str(grid.get('version') or _grid_version(path, grid))
+
+        # PRIVATE
+        self._gateways = grid['gateways']
+        self._planes = {}
+        for plane, (gateway_id, lat, lon) in enumerate(self._gateways):
+            self._planes[(0, gateway_id)] = plane
+            self._planes[(1, lat, lon)] = plane
+        self._open()
+
+    def _open(self):
+        self._proj = projection(self.projection_system)
+        self._delays = np.load(os.path.join(self.path, DELAYS_FILE), mmap_mode='r')
+
+    def __len__(self):
+        """Number of gateways of the grid"""
+        return len(self._gateways)
+
+    # pickle support (for the worker processes), the files are mapped again
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_proj']
+        del state['_delays']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def _plane(self, a_gateway):
+        """Plane of a gateway, by registry id or coordinates, None if unknown"""
+        gateway_id = getattr(a_gateway, 'gateway_id', None)
+        if gateway_id is not None and (0, gateway_id) in self._planes:
+            return self._planes[(0, gateway_id)]
+        return self._planes.get((1, a_gateway.lat, a_gateway.lon))
+
+    def _costs(self, delays, dt):
+        """rms (nanosecond) of the deviations of Em = delay_m - dt_m, delays of shape (k, ...)"""
+        deviations = delays - dt.reshape((-1,) + (1,) * (delays.ndim - 1))
+        deviations -= deviations.mean(axis=0)
+        return np.sqrt((deviations**2).mean(axis=0))
+
+    def lookup(self, uplink_list):
+        """Find the cell of a message
+
+        Args:
+            uplink_list: the uplinks of the message
+
+        Returns:
+            (row, column) of the best cell and its rms residual (meter), None if less than 3
+            gateways of the message are known by the grid
+        """
+        if not isinstance(uplink_list, list):
+            raise ValueError("Incorrect uplink_list is not a list")
+        planes, timestamps = [], []
+        for uplk in uplink_list:
+            if not isinstance(uplk, uplink):
+                raise ValueError("Invalid item in uplink_list is not a uplink")
+            plane = self._plane(uplk.gateway)
+            if plane is not None and plane not in planes:
+                planes.append(plane)
+                timestamps.append(uplk.timestamp)
+        if len(planes) < 3:
+            count('fingerprint.unknown')
+            return None
+        planes = np.array(planes, dtype=np.intp)
+        # integer difference first: float64 can not hold a nanosecond epoch timestamp
+        dt = np.array([t - min(timestamps) for t in timestamps], dtype=float)
+
+        with stage('fingerprint.coarse'):
+            s = self.stride
+            coarse = self._costs(self._delays[planes, ::s, ::s].astype(float), dt)
+            best = np.argsort(coarse, axis=None)[:self.candidates]
+        with stage('fingerprint.fine'):
+            rows, columns = self.shape
+            found, found_cost = None, np.inf
+            for row, column in zip(*np.unravel_index(best, coarse.shape)):
+                top, left = max(row * s - s + 1, 0), max(column * s - s + 1, 0)
+                bottom, right = min(row * s + s, rows), min(column * s + s, columns)
+                fine = self._costs(self._delays[planes, top:bottom, left:right].astype(float), dt)
+                index = np.unravel_index(np.argmin(fine), fine.shape)
+                if fine[index] < found_cost:
+                    found, found_cost = (top + index[0], left + index[1]), fine[index]
+        return found, float(found_cost * SPEED_OF_LIGHT)
+
+    def cell_center(self, row, column):
+        """Return the x, y of the center of a cell"""
+        return self.origin[0] + (column + .5) * self.cell_size, self.origin[1] + (row + .5) * self.cell_size
+
+    def locate(self, uplink_list):
+        """Locate a message on the center of its cell
+
+        Returns:
+            A fingerprint_fix, None if less than 3 gateways of the message are known by the grid
+        """
+        found = self.lookup(uplink_list)
+        if found is None:
+            return None
+        (row, column), residual = found
+        x, y = self.cell_center(row, column)
+        lon, lat = self._proj.x_y_to_long_lat(x, y)
+        return fingerprint_fix(point._trusted(lat, lon), residual, (row, column))
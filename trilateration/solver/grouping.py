@@ -0,0 +1,192 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import heapq
+import itertools
+from collections import OrderedDict
+
+from ..model.uplink import uplink
+from solver import solver
+
+"""
+Group a stream of gateway receptions into messages:
+    every reception comes with the key of its frame (ex: (device, frame counter)), the receptions of
+    a frame are grouped until the time window of the frame closes or enough gateways are received.
+
+The stream clock is the highest uplink timestamp seen (nanoseconds).
+   .
+  / \
+ / ! \   => A gateway is kept once per frame (its first reception), late receptions of an already
+/_____\     emitted frame are dropped
+
+"""
+
+# number of uplinks (min, max) accepted by the solver methods, None for no maximum
+METHOD_UPLINKS = {
+    'toa': (3, 3),
+    'tdoa': (4, None),
+    'lsm': (3, None),
+    'ransac': (4, None),
+}
+
+
+class uplink_grouper:
+    """Incremental grouping of receptions by frame key with a bounded memory"""
+
+    def __init__(self, window=1000000, min_uplinks=3, max_uplinks=None, max_pending=10000):
+        """uplink_grouper constructor
+
+        Args:
+            window: duration (nanosecond) after the first reception of a frame before it is closed
+            min_uplinks: minimal number of gateways of an emitted frame
+            max_uplinks: number of gateways emitting a frame immediately (None: wait the window)
+            max_pending: maximal number of frames in memory, the oldest one is closed when reached
+        """
+        if window <= 0:
+            raise ValueError("Incorrect window")
+        if min_uplinks < 1 or (max_uplinks is not None and max_uplinks < min_uplinks):
+            raise ValueError("Incorrect number of uplinks")
+        if max_pending < 1:
+            raise ValueError("Incorrect max_pending")
+
+        # PUBLIC
+        self.window = window
+        self.min_uplinks = min_uplinks
+        self.max_uplinks = max_uplinks
+        self.max_pending = max_pending
+        self.dropped = 0
+
+        # PRIVATE
+        self._clock = None
+        # key -> (first timestamp, list of uplinks)
+        self._pending = {}
+        # heap of (first timestamp, sequence, key) of the pending frames, the entries of the frames
+        # already closed are skipped when they reach the top
+        self._deadlines = []
+        self._sequence = itertools.count()
+        # key -> first timestamp of the frames already closed, to drop their late receptions
+        self._closed = OrderedDict()
+
+    def __len__(self):
+        """Number of frames in memory"""
+        return len(self._pending)
+
+    def push(self, key, an_uplink):
+        """Add a reception
+
+        Args:
+            key: the frame key of the reception (hashable)
+            an_uplink: the uplink
+
+        Returns:
+            The list of (key, uplink list) frames completed by this reception
+        """
+        if not isinstance(an_uplink, uplink):
+            raise ValueError("Invalid item is not a uplink")
+        if self._clock is None or an_uplink.timestamp > self._clock:
+            self._clock = an_uplink.timestamp
+
+        completed = self._expire()
+        if key in self._closed:
+            self.dropped += 1
+            return completed
+
+        if key not in self._pending:
+            if len(self._pending) >= self.max_pending:
+                completed.extend(self._close(self._earliest()))
+            self._pending[key] = (an_uplink.timestamp, [])
+            heapq.heappush(self._deadlines, (an_uplink.timestamp, next(self._sequence), key))
+        uplinks = self._pending[key][1]
+
+        for known in uplinks:
+            if known.gateway == an_uplink.gateway:
+                self.dropped += 1
+                return completed
+        uplinks.append(an_uplink)
+
+        if self.max_uplinks is not None and len(uplinks) >= self.max_uplinks:
+            completed.extend(self._close(key))
+        return completed
+
+    def flush(self):
+        """Close all the frames in memory, return the completed ones"""
+        completed = []
+        while self._pending:
+            completed.extend(self._close(self._earliest()))
+        return completed
+
+    def _earliest(self):
+        """Key of the pending frame with the earliest first reception (the first to expire)"""
+        while True:
+            first, _, key = self._deadlines[0]
+            frame = self._pending.get(key)
+            if frame is not None and frame[0] == first:
+                return key
+            heapq.heappop(self._deadlines)
+
+    def _expire(self):
+        """Close the frames whose window is over"""
+        completed = []
+        # by deadline: a frame opened late by an out of order reception may expire first
+        while self._pending:
+            key = self._earliest()
+            if self._clock - self._pending[key][0] <= self.window:
+                break
+            completed.extend(self._close(key))
+        while self._closed:
+            key, first = next(self._closed.iteritems())
+            if self._clock - first <= self.window and len(self._closed) <= self.max_pending:
+                break
+            del self._closed[key]
+        return completed
+
+    def _close(self, key):
+        """Remove a frame from memory, return it in a list if it has enough uplinks"""
+        first, uplinks = self._pending.pop(key)
+        self._closed[key] = first
+        if not self._pending:
+            del self._deadlines[:]
+        if len(uplinks) < self.min_uplinks:
+            self.dropped += len(uplinks)
+            return []
+        return [(key, uplinks)]
+
+
+def group_uplinks(records, window=1000000, min_uplinks=3, max_uplinks=None, max_pending=10000):
+    """Group a stream of receptions into frames, see uplink_grouper
+
+    Args:
+        records: iterable of (key, uplink)
+
+    Returns:
+        A generator of (key, uplink list), emitted as soon as the frames are complete
+    """
+    return _group(records, uplink_grouper(window, min_uplinks, max_uplinks, max_pending))
+
+
+def _group(records, grouper):
+    """Generator of the frames completed by the grouper"""
+    for key, an_uplink in records:
+        for frame in grouper.push(key, an_uplink):
+            yield frame
+    for frame in grouper.flush():
+        yield frame
+
+
+def solve_stream(records, a_solver, window=1000000, max_pending=10000):
+    """Group a stream of receptions and geolocalize every complete frame
+
+    Args:
+        records: iterable of (key, uplink)
+        a_solver: the solver to use, its method gives the number of uplinks of a frame
+        window: duration (nanosecond) of a frame
+        max_pending: maximal number of frames in memory
+
+    Returns:
+        A generator of (key, solver_result)
+    """
+    if not isinstance(a_solver, solver) or a_solver.method not in METHOD_UPLINKS:
+        raise ValueError("Incorrect solver, an uplink method is expected")
+    min_uplinks, max_uplinks = METHOD_UPLINKS[a_solver.method]
+    return ((key, a_solver.solve(uplinks)) for key, uplinks in \
+        group_uplinks(records, window, min_uplinks, max_uplinks, max_pending))
@@ -0,0 +1,151 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from ..model.uplink import uplink
+
+"""
+Memoization of the geolocalizations of identical geometries (replays, duplicates from several
+network servers, retransmissions):
+    a message is keyed on its gateways sorted by identity (registry id or lat, lon) with the
+    arrival time of each one relative to the earliest reception, quantized to quantum_ns.
+   .
+  / \
+ / ! \   => The key does not hold the order of the uplinks: the cached result is the one of the
+/_____\     first solved ordering (the pivot of toa / tdoa may differ)
+
+"""
+
+
+def _gateway_identity(a_gateway):
+    """Registry id of a registered gateway, its coordinates otherwise"""
+    gateway_id = getattr(a_gateway, 'gateway_id', None)
+    if gateway_id is not None:
+        return (0, gateway_id)
+    return (1, a_gateway.lat, a_gateway.lon)
+
+
+def freeze(value):
+    """Hashable equivalent of a configuration value, for the context of the keys
+
+    The lists, tuples and arrays become tuples, the dicts and sets sorted tuples.
+
+    Args:
+        value: the value to freeze
+
+    Returns:
+        A hashable value (ValueError if the value can not be hashed)
+    """
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted((key, freeze(item)) for key, item in value.iteritems())))
+    if isinstance(value, (set, frozenset)):
+        return ('set', tuple(sorted(freeze(item) for item in value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        raise ValueError("Incorrect value, it can not be hashed")
+    return value
+
+
+class result_cache:
+    """Thread safe LRU / TTL cache of the computations of normalized uplink sets"""
+
+    def __init__(self, max_entries=100000, ttl=None, quantum_ns=1, clock=time.time):
+        """result_cache constructor
+
+        Args:
+            max_entries: maximal number of results kept
+            ttl: optional lifetime (second) of a result
+            quantum_ns: quantization (nanosecond) of the relative arrival times
+            clock: function returning the current time (second)
+        """
+        if max_entries < 1:
+            raise ValueError("Incorrect max_entries")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("Incorrect ttl")
+        if quantum_ns < 1:
+            raise ValueError("Incorrect quantum_ns")
+
+        # PUBLIC
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantum_ns = int(quantum_ns)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        # PRIVATE
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (insertion time, computation), least recently used first
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def key(self, uplink_list, context=()):
+        """Normalized key of a message, None if it is not a list of uplinks
+
+        Args:
+            uplink_list: the uplinks of the message
+            context: hashable configuration of the solve (method, projection, options)
+        """
+        if not isinstance(uplink_list, list) or not uplink_list:
+            return None
+        for uplk in uplink_list:
+            if not isinstance(uplk, uplink):
+                return None
+        earliest = min(uplk.timestamp for uplk in uplink_list)
+        half = self.quantum_ns // 2
+        return (context, tuple(sorted((_gateway_identity(uplk.gateway), (uplk.timestamp - earliest + half) // \
+            self.quantum_ns) for uplk in uplink_list)))
+
+    def get(self, key):
+        """Return the cached computation of a key, None if unknown or expired"""
+        with self._lock:
+            entry = self._results.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._results[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, computation):
+        """Store the computation of a key"""
+        with self._lock:
+            self._results.pop(key, None)
+            self._results[key] = (self._clock(), computation)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        """Return the hit / miss statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._results),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'hit_rate': self.hits / float(lookups) if lookups else 0.,
+            }
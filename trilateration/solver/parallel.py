@@ -0,0 +1,180 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from solver import solver, METHODS
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.gateway_registry import gateway_registry
+
+"""
+Spread the geolocalization of many messages over a pool of processes.
+
+Every worker builds its solver (and its gateway registry) once, the messages are sent by chunks
+in a compact form: (registry index, timestamp) for the gateways of the registry, (lat, lon, timestamp)
+for the others.
+   .
+  / \
+ / ! \   => Without initializer support (python < 3.7), the workers are forked at the creation of
+/_____\     the parallel_solver and inherit its configuration
+
+"""
+
+# solver and registry of the worker process
+_WORKER_STATE = {}
+
+
+def _init_worker(method, projection_system, options, registry):
+    """Build the solver of a worker process, once"""
+    _WORKER_STATE['solver'] = solver(method, projection_system, **options)
+    _WORKER_STATE['registry'] = registry
+
+
+def _encode(uplink_list, registry):
+    """Compact picklable form of a message"""
+    encoded = []
+    for uplk in uplink_list:
+        gateway_id = getattr(uplk.gateway, 'gateway_id', None)
+        if registry is not None and gateway_id in registry and registry.get(gateway_id) is uplk.gateway:
+            encoded.append((registry.index(gateway_id), uplk.timestamp))
+        else:
+            encoded.append((uplk.gateway.lat, uplk.gateway.lon, uplk.timestamp))
+    return encoded
+
+
+def _decode(encoded, registry):
+    """Rebuild the uplinks of a message in a worker"""
+    uplinks = []
+    for item in encoded:
+        if len(item) == 2:
+            uplinks.append(uplink._trusted(registry.gateway_at(item[0]), None, item[1]))
+        else:
+            uplinks.append(uplink._trusted(gateway(item[0], item[1]), None, item[2]))
+    return uplinks
+
+
+def _solve_chunk(start, chunk):
+    """Solve a chunk of encoded messages in a worker
+
+    Returns:
+        start, list of (lat, lon, is_resolved, error), lat and lon are None when not resolved, error is
+            the description of the exception raised by the message (None without exception)
+    """
+    a_solver, registry = _WORKER_STATE['solver'], _WORKER_STATE['registry']
+    results = []
+    for encoded in chunk:
+        try:
+            result = a_solver.solve(_decode(encoded, registry))
+            if result.is_resolved:
+                device = result.geolocalized_device
+                results.append((device.lat, device.lon, True, None))
+            else:
+                results.append((None, None, False, None))
+        except Exception as e:
+            # one message must not lose the whole chunk, the error is sent back as text (always picklable)
+            results.append((None, None, False, '%s: %s' % (type(e).__name__, e)))
+    return start, results
+
+
+class parallel_solver:
+    """Geolocalization of message streams on a process pool"""
+
+    def __init__(self, method='lsm', projection_system='epsg:2192', registry=None, workers=None, chunksize=64, \
+        **options):
+        """parallel_solver constructor
+
+        Args:
+            method: 'toa', 'tdoa', 'lsm' or 'ransac'
+            projection_system: The projection system name to use. (string)
+            registry: optional gateway_registry of the gateways of the messages, sent once to every worker
+            workers: number of processes (default: number of cores)
+            chunksize: number of messages sent to a worker at once
+            options: extra parameters of the method
+        """
+        if method not in METHODS or method == 'trilateration':
+            raise ValueError("Incorrect method, an uplink method is expected")
+        if registry is not None and not isinstance(registry, gateway_registry):
+            raise ValueError("Incorrect registry")
+        if chunksize < 1:
+            raise ValueError("Incorrect chunksize")
+        # check the configuration in the parent process
+        solver(method, projection_system, **options)
+
+        # PUBLIC
+        self.method = method
+        self.chunksize = chunksize
+
+        # PRIVATE
+        self._registry = registry
+        initargs = (method, projection_system, options, registry)
+        self._workers = workers or multiprocessing.cpu_count()
+        try:
+            self._executor = ProcessPoolExecutor(self._workers, initializer=_init_worker, initargs=initargs)
+        except TypeError:
+            # no initializer: the workers inherit the state, fork them now
+            _init_worker(*initargs)
+            self._executor = ProcessPoolExecutor(self._workers)
+            self._executor.submit(int).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes"""
+        self._executor.shutdown(wait=True)
+
+    def map(self, messages, ordered=True):
+        """Geolocalize messages
+
+        Args:
+            messages: iterable of uplink lists, consumed by chunks (at most 2 chunks per worker in flight)
+            ordered: yield the results in the order of the messages, or as soon as they are computed
+
+        Returns:
+            A generator of (message position, lat, lon, is_resolved, error), error describes the exception
+                raised by the message (ex: "ValueError: Incorrect uplink_list"), None without exception
+        """
+        chunks = self._chunks(messages)
+        pending = deque()
+        for _ in xrange(2 * self._workers):
+            if not self._submit(chunks, pending):
+                break
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [future for future in pending if future in completed]
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                start, results = future.result()
+                for i, (lat, lon, resolved, error) in enumerate(results):
+                    yield start + i, lat, lon, resolved, error
+                self._submit(chunks, pending)
+
+    def _chunks(self, messages):
+        """Generate the (start, encoded chunk) of the messages"""
+        iterator = iter(messages)
+        start = 0
+        while True:
+            chunk = [_encode(uplink_list, self._registry) for uplink_list in itertools.islice(iterator, self.chunksize)]
+            if not chunk:
+                return
+            yield start, chunk
+            start += len(chunk)
+
+    def _submit(self, chunks, pending):
+        """Send the next chunk to the pool, return False when there is no more chunk"""
+        for start, chunk in chunks:
+            pending.append(self._executor.submit(_solve_chunk, start, chunk))
+            return True
+        return False
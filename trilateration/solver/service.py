@@ -0,0 +1,334 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import json
+import time
+import Queue
+import threading
+import BaseHTTPServer
+import SocketServer
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from solver import solver, METHODS
+from ..compute.tdoa import tdoa_batch
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.gateway_registry import gateway_registry
+
+"""
+Non blocking geolocalization front end:
+    service.geolocate(uplinks) queues the message and returns a concurrent.futures.Future of the
+    geolocalized point (None when not resolved), the solves run on an executor.
+
+From an asyncio event loop (python 3):
+    device = await asyncio.wrap_future(service.geolocate(uplinks, method='tdoa'))
+
+The requests arriving within batch_window are solved together: one vectorized tdoa_batch call for
+the tdoa messages of every number of uplinks, one executor task for the others.
+   .
+  / \
+ / ! \   => The queue is bounded: geolocate blocks (or raises Queue.Full with block=False) when the
+/_____\     executor is saturated, this is the backpressure of the service
+
+"""
+
+
+class geolocation_service:
+    """Queue, micro-batch and solve geolocalization requests on an executor"""
+
+    def __init__(self, method='lsm', projection_system='epsg:2192', max_concurrency=4, max_queue=1000, \
+        batch_window=0.002, max_batch=256, executor=None, method_options=None):
+        """geolocation_service constructor
+
+        Args:
+            method: default method of the requests ('toa', 'tdoa', 'lsm' or 'ransac')
+            projection_system: The projection system name to use. (string)
+            max_concurrency: maximal number of batches solved at the same time
+            max_queue: maximal number of requests waiting for a batch
+            batch_window: time (second) waited for other requests after the first one of a batch
+            max_batch: maximal number of requests in a batch
+            executor: optional concurrent.futures executor (default: a thread pool of max_concurrency)
+            method_options: optional dict of the extra parameters of each method,
+                ex: {'lsm': {'ftol': 1e-6}, 'ransac': {'threshold': 200.}}
+        """
+        if method not in METHODS or method == 'trilateration':
+            raise ValueError("Incorrect method, an uplink method is expected")
+        method_options = {} if method_options is None else method_options
+        if not isinstance(method_options, dict) or \
+            any(name not in METHODS or name == 'trilateration' or not isinstance(options, dict) \
+                for name, options in method_options.iteritems()):
+            raise ValueError("Incorrect method_options, a dict of options per uplink method is expected")
+        if max_concurrency < 1 or max_queue < 1 or max_batch < 1:
+            raise ValueError("Incorrect service bounds")
+        if batch_window < 0:
+            raise ValueError("Incorrect batch_window")
+
+        # PUBLIC
+        self.method = method
+        self.projection_system = projection_system
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+
+        # PRIVATE
+        self._solvers = {}
+        for name in METHODS:
+            if name != 'trilateration':
+                self._solvers[name] = solver(name, projection_system, **method_options.get(name, {}))
+        # tdoa_batch has no options, the tdoa requests with options are solved one by one
+        self._batch_tdoa = not method_options.get('tdoa')
+        self._own_executor = executor is None
+        self._executor = ThreadPoolExecutor(max_concurrency) if executor is None else executor
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._queue = Queue.Queue(max_queue)
+        # close waits for the requests being queued (outside of the lock, the queue may block)
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)
+        self._producers = 0
+        self._running = True
+        self._dispatcher = threading.Thread(target=self._dispatch)
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def geolocate(self, uplink_list, method=None, block=True, timeout=None):
+        """Queue the geolocalization of a message
+
+        Args:
+            uplink_list: the list of uplinks of the message
+            method: the method to use (default: the method of the service)
+            block, timeout: wait for a place in the queue, see Queue.put
+
+        Returns:
+            A Future of the geolocalized point, None if not resolved (ValueError on incorrect input)
+        """
+        method = self.method if method is None else method
+        if method not in self._solvers:
+            raise ValueError("Incorrect method, an uplink method is expected")
+        future = Future()
+        with self._lock:
+            if not self._running:
+                raise ValueError("The service is closed")
+            self._producers += 1
+        try:
+            self._queue.put((method, uplink_list, future), block, timeout)
+        finally:
+            with self._lock:
+                self._producers -= 1
+                if self._producers == 0:
+                    self._queued.notify_all()
+        return future
+
+    def close(self):
+        """Solve the queued requests and stop the service
+
+        The requests which could not be solved fail with a ValueError.
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            # the dispatcher still runs: the blocked requests get a place before the stop marker
+            while self._producers > 0:
+                self._queued.wait()
+        # no request can be queued after the stop marker
+        self._queue.put(None)
+        self._dispatcher.join()
+        while True:
+            try:
+                request = self._queue.get(block=False)
+            except Queue.Empty:
+                break
+            if request is not None:
+                _fail([request], ValueError("The service is closed"))
+        if self._own_executor:
+            self._executor.shutdown(wait=True)
+
+    def _dispatch(self):
+        """Collect the requests into batches and send them to the executor"""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.time(), 0))
+                except Queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+
+            # bounded concurrency: wait for a free slot, the queue fills up meanwhile
+            self._slots.acquire()
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                task = self._executor.submit(self._solve_batch, batch)
+            except RuntimeError:
+                # the executor given to the service is already shut down
+                self.batches -= 1
+                self.requests -= len(batch)
+                self._slots.release()
+                _fail(batch, ValueError("The service is closed"))
+                continue
+            task.add_done_callback(lambda _: self._slots.release())
+
+    def _solve_batch(self, batch):
+        """Solve a batch of requests, vectorizing the tdoa ones"""
+        # tdoa requests by number of uplinks, every size is stacked in its own call
+        tdoa_requests = {}
+        for method, uplink_list, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if method == 'tdoa' and self._batch_tdoa:
+                    _check_tdoa(uplink_list)
+                    tdoa_requests.setdefault(len(uplink_list), []).append((uplink_list, future))
+                    continue
+                result = self._solvers[method].solve(uplink_list)
+                future.set_result(result.geolocalized_device if result.is_resolved else None)
+            except Exception as e:
+                future.set_exception(e)
+        for requests in tdoa_requests.itervalues():
+            self._solve_tdoa(requests)
+
+    def _solve_tdoa(self, requests):
+        """Solve tdoa requests having the same number of uplinks in one vectorized call"""
+        try:
+            lat, lon, resolved = tdoa_batch( \
+                [[uplk.gateway.lat for uplk in uplink_list] for uplink_list, _ in requests], \
+                [[uplk.gateway.lon for uplk in uplink_list] for uplink_list, _ in requests], \
+                [[uplk.timestamp for uplk in uplink_list] for uplink_list, _ in requests], \
+                self.projection_system)
+        except Exception as e:
+            for _, future in requests:
+                future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(requests):
+            future.set_result(point(float(lat[i]), float(lon[i])) if resolved[i] else None)
+
+
+def _fail(requests, error):
+    """Set the error as result of the requests not started yet"""
+    for _, _, future in requests:
+        if future.set_running_or_notify_cancel():
+            future.set_exception(error)
+
+
+def _check_tdoa(uplink_list):
+    """Check a tdoa message before batching it, see tdoa constructor"""
+    if not isinstance(uplink_list, list) or len(uplink_list) < 4:
+        raise ValueError("Incorrect uplink_list is not a list or not enough uplink")
+    for uplk in uplink_list:
+        if not isinstance(uplk, uplink):
+            raise ValueError("Invalid item in uplink_list is not a uplink")
+    for i in xrange(len(uplink_list)):
+        for j in xrange(i+1, len(uplink_list)):
+            if uplink_list[i].gateway == uplink_list[j].gateway:
+                raise ValueError("Gateway is not unique")
+
+
+# =============================================== HTTP/JSON STAND-IN SERVER
+
+def parse_request(document, registry=None):
+    """Build the uplinks of a JSON request
+
+    Args:
+        document: {"method": "lsm", "uplinks": [{"lat": .., "lon": .., "timestamp": ..}, ..]},
+            an uplink may give the "gateway" id of the registry instead of lat and lon
+        registry: optional gateway_registry of the known gateways
+
+    Returns:
+        method (None if not given), list of uplinks
+    """
+    if not isinstance(document, dict) or not isinstance(document.get('uplinks'), list):
+        raise ValueError("Incorrect request, uplinks are expected")
+    uplinks = []
+    for item in document['uplinks']:
+        if not isinstance(item, dict) or 'timestamp' not in item:
+            raise ValueError("Incorrect uplink")
+        if 'gateway' in item:
+            if registry is None:
+                raise ValueError("Unknown gateway")
+            a_gateway = registry.get(item['gateway'])
+        else:
+            a_gateway = gateway(item.get('lat'), item.get('lon'))
+        uplinks.append(uplink(a_gateway, None, int(item['timestamp'])))
+    return document.get('method'), uplinks
+
+
+class _request_handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """POST /geolocate with a JSON request, see parse_request"""
+
+    def do_POST(self):
+        if self.path != '/geolocate':
+            return self._reply(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+            method, uplinks = parse_request(json.loads(self.rfile.read(length)), self.server.registry)
+            future = self.server.service.geolocate(uplinks, method, block=False)
+            device = future.result(self.server.result_timeout)
+        except Queue.Full:
+            return self._reply(503, {"error": "Service overloaded"})
+        except TimeoutError:
+            return self._reply(504, {"error": "Geolocalization timeout"})
+        except (ValueError, TypeError) as e:
+            return self._reply(400, {"error": str(e)})
+        except Exception as e:
+            return self._reply(500, {"error": "%s: %s" % (type(e).__name__, e)})
+        if device is None:
+            return self._reply(200, {"resolved": False})
+        return self._reply(200, {"resolved": True, "lat": device.lat, "lon": device.lon})
+
+    def _reply(self, status, document):
+        body = json.dumps(document)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class geolocation_server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Local HTTP/JSON server in front of a geolocation_service, for load tests"""
+    daemon_threads = True
+
+    def __init__(self, service, host='127.0.0.1', port=8080, registry=None, timeout=10.):
+        """geolocation_server constructor
+
+        Args:
+            service: the geolocation_service
+            host, port: the address to listen (port 0: any free port, see server_address)
+            registry: optional gateway_registry to resolve the gateway ids of the requests
+            timeout: maximal time (second) waited for a result
+        """
+        if not isinstance(service, geolocation_service):
+            raise ValueError("Incorrect service")
+        if registry is not None and not isinstance(registry, gateway_registry):
+            raise ValueError("Incorrect registry")
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), _request_handler)
+        self.service = service
+        self.registry = registry
+        self.result_timeout = timeout
+
+
+if __name__ == '__main__':
+    with geolocation_service() as a_service:
+        server = geolocation_server(a_service)
+        print "listening on http://%s:%d/geolocate" % server.server_address
+        server.serve_forever()
@@ -0,0 +1,201 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+from ..compute.toa import toa
+from ..compute.tdoa import tdoa
+from ..compute.lsm import lsm
+from ..compute.ransac import ransac
+from ..compute.trilateration import trilateration
+from ..model.uplink import uplink
+from ..model.projection import projection
+from ..model.gateway_registry import gateway_registry
+from ..filter.gdop_filter import select_gateways
+from warm_start import position_cache
+from memo import result_cache, freeze
+from fingerprint import fingerprint_grid
+
+"""
+A solver is configured once (method, projection, tolerances) and reused for every message:
+    solver.solve(uplinks) returns a solver_result immediately, the geolocalization is only
+    computed when the result is read.
+
+   .
+  / \
+ / ! \   => The input is checked at the first read of the result, which raises the ValueError
+/_____\
+
+"""
+
+METHODS = {
+    'toa': toa,
+    'tdoa': tdoa,
+    'lsm': lsm,
+    'ransac': ransac,
+    'trilateration': trilateration,
+}
+
+
+class solver:
+    """Long lived geolocalization solver"""
+
+    def __init__(self, method='lsm', projection_system='epsg:2192', max_gateways=None, warm_start=None, cache=None, \
+        fingerprint=None, fingerprint_tolerance=None, registry=None, **options):
+        """solver constructor
+
+        Args:
+            method: 'toa', 'tdoa', 'lsm', 'ransac' (uplinks) or 'trilateration' (circles)
+            projection_system: The projection system name to use. (string)
+                please choose your projection  http://spatialreference.org/ref/epsg/2192/
+            max_gateways: optional maximal number of uplinks of a message, the subset of gateways
+                with the lowest GDOP is kept (see gdop_filter.select_gateways)
+            warm_start: optional position_cache (lsm and ransac), the search of a device starts from
+                its last fix (see solve)
+            cache: optional result_cache (uplink methods), the identical geometries are solved once
+            fingerprint: optional fingerprint_grid (lsm and ransac) of the projection system, the search
+                of a device without warm fix starts from its cell
+            fingerprint_tolerance: optional rms residual (meter) under which the cell of the grid
+                is the answer, without lsm
+            registry: optional gateway_registry of the gateways (with max_gateways), the GDOP selection only
+                searches among the gateways nearest to the device
+            options: extra parameters of the method (ex: ftol, xtol, max_nfev for lsm, threshold for ransac)
+        """
+        if method not in METHODS:
+            raise ValueError("Unknown method")
+        if not isinstance(projection_system, str):
+            raise ValueError("Incorrect projection_system")
+        if max_gateways is not None and (method == 'trilateration' or max_gateways < 3):
+            raise ValueError("Incorrect max_gateways")
+        if warm_start is not None and (method not in ('lsm', 'ransac') or not isinstance(warm_start, position_cache)):
+            raise ValueError("Incorrect warm_start, a position_cache for lsm or ransac is expected")
+        if cache is not None and (method == 'trilateration' or not isinstance(cache, result_cache)):
+            raise ValueError("Incorrect cache, a result_cache for an uplink method is expected")
+        if fingerprint is not None and (method not in ('lsm', 'ransac') or not isinstance(fingerprint, fingerprint_grid) or \
+            fingerprint.projection_system != projection_system):
+            raise ValueError("Incorrect fingerprint, a fingerprint_grid of the projection system for lsm or ransac")
+        if fingerprint_tolerance is not None and (fingerprint is None or fingerprint_tolerance < 0):
+            raise ValueError("Incorrect fingerprint_tolerance")
+        if registry is not None and (max_gateways is None or not isinstance(registry, gateway_registry) or \
+            registry.projection_system != projection_system):
+            raise ValueError("Incorrect registry, a gateway_registry of the projection system for max_gateways")
+
+        # PUBLIC
+        self.method = method
+        self.projection_system = projection_system
+        self.max_gateways = max_gateways
+        self.warm_start = warm_start
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.fingerprint_tolerance = fingerprint_tolerance
+        self.registry = registry
+        self.options = options
+
+        # PRIVATE
+        # build (and share) the projection once
+        self._proj = projection(projection_system)
+        # configuration part of the result_cache keys
+        # (the selection among the nearest gateways only depends on the message, not on the registry,
+        # a rebuilt fingerprint grid changes version)
+        self._context = (method, projection_system, max_gateways, registry is not None, \
+            None if fingerprint is None else fingerprint.version, fingerprint_tolerance, freeze(options))
+
+    def solve(self, items, device=None):
+        """Prepare the geolocalization of one message
+
+        Args:
+            items: the list of uplinks (or circles for trilateration) of the message
+            device: optional identifier of the device, for the warm_start cache
+
+        Returns:
+            A lazy solver_result
+        """
+        return solver_result(self, items, device)
+
+    def _compute(self, items, device=None):
+        """Run the configured method on a message, or reuse the result of the same geometry"""
+        key = None if self.cache is None else self.cache.key(items, self._context)
+        if key is not None:
+            computation = self.cache.get(key)
+            if computation is not None:
+                # the device of a repeated geometry keeps a fresh warm fix
+                if self.warm_start is not None and device is not None and computation.is_resolved:
+                    timestamp = min(uplk.timestamp for uplk in items)
+                    self.warm_start.put(device, timestamp, computation.geolocalized_device)
+                return computation
+        computation = self._solve(items, device)
+        if key is not None:
+            self.cache.put(key, computation)
+        return computation
+
+    def _solve(self, items, device):
+        """Run the configured method on a message"""
+        if self.max_gateways is not None and isinstance(items, list) and len(items) > self.max_gateways:
+            items = select_gateways(items, self.max_gateways, projection_system=self.projection_system, \
+                registry=self.registry)
+        if ((self.warm_start is None or device is None) and self.fingerprint is None) or \
+            not isinstance(items, list) or not items or not all(isinstance(uplk, uplink) for uplk in items):
+            return METHODS[self.method](items, self.projection_system, **self.options)
+
+        timestamp = min(uplk.timestamp for uplk in items)
+        warm = self.warm_start is not None and device is not None
+        fix = self.warm_start.get(device, timestamp) if warm else None
+        hit = fix is not None
+        computation = None
+        if fix is None and self.fingerprint is not None:
+            cell = self.fingerprint.locate(items)
+            if cell is not None and self.fingerprint_tolerance is not None and \
+                cell.residual <= self.fingerprint_tolerance:
+                computation = cell
+            elif cell is not None:
+                fix = cell.geolocalized_device
+        if computation is None:
+            computation = METHODS[self.method](items, self.projection_system, initial_guess=fix, **self.options)
+            if warm:
+                self.warm_start.record(hit, computation.nfev)
+        if warm and computation.is_resolved:
+            self.warm_start.put(device, timestamp, computation.geolocalized_device)
+        return computation
+
+
+class solver_result(object):
+    """Result of a solver, computed at its first read"""
+
+    def __init__(self, a_solver, items, device=None):
+        """solver_result constructor
+
+        Args:
+            a_solver: the solver to use
+            items: the list of uplinks (or circles) of the message
+            device: optional identifier of the device
+        """
+        self.items = items
+        self.device = device
+
+        # PRIVATE
+        self._solver = a_solver
+        self._computation = None
+
+    @property
+    def is_computed(self):
+        """True once the geolocalization has been computed"""
+        return self._computation is not None
+
+    @property
+    def computation(self):
+        """The method object (toa, tdoa, lsm or trilateration) that computed the result"""
+        if self._computation is None:
+            self._computation = self._solver._compute(self.items, self.device)
+        return self._computation
+
+    @property
+    def geolocalized_device(self):
+        """The estimated point of the device"""
+        return self.computation.geolocalized_device
+
+    @property
+    def is_resolved(self):
+        """True if the method found a geolocalization"""
+        computation = self.computation
+        if hasattr(computation, 'is_resolved'):
+            return computation.is_resolved
+        # trilateration always generates a point, approximated or not
+        return computation.geolocalized_device is not None
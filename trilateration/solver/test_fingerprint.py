@@ -0,0 +1,146 @@
+import unittest
+
+import os
+import json
+import pickle
+import shutil
+import datetime
+import tempfile
+import numpy as np
+
+from fingerprint import build_fingerprint_grid, fingerprint_grid, fingerprint_fix
+from solver import solver
+from warm_start import position_cache
+from memo import result_cache
+from ..compute.lsm import lsm
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.projection import projection
+from ..model.gateway_registry import gateway_registry
+from ..utils.utils import SPEED_OF_LIGHT
+# do not forget to use nose2 at root to run test
+
+GATEWAYS = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.80, 2.22), (48.83, 2.20), (48.86, 2.24)]
+T = 1495456868630584064
+
+
+class Test_fingerprint_grid(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.registry = gateway_registry()
+        for i, (lat, lon) in enumerate(GATEWAYS):
+            self.registry.add('gw%d' % i, lat, lon)
+        self.grid = build_fingerprint_grid(self.registry, self.path, cell_size=50.)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _uplinks(self, lat=48.82, lon=2.27):
+        x, y = projection().lat_long_to_x_y(lat, lon)
+        return [uplink(self.registry.get('gw%d' % i), datetime.datetime.now(), \
+            T + int(round(np.hypot(self.registry.get('gw%d' % i).x - x, self.registry.get('gw%d' % i).y - y) \
+            / SPEED_OF_LIGHT))) for i in xrange(len(GATEWAYS))]
+
+    def _error(self, a_point, lat=48.82, lon=2.27):
+        proj = projection()
+        x, y = proj.point_to_x_y(a_point)
+        device_x, device_y = proj.lat_long_to_x_y(lat, lon)
+        return np.hypot(x - device_x, y - device_y)
+
+    # =============================================== OBJECT UNIT TEST
+    def test_build(self):
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'delays.npy')))
+        self.assertEqual(len(self.grid), len(GATEWAYS))
+        self.assertTrue(isinstance(self.grid._delays, np.memmap))
+        self.assertEqual(self.grid._delays.shape, (len(GATEWAYS),) + self.grid.shape)
+        self.assertEqual(self.grid.cell_size, 50.)
+
+    def test_delays(self):
+        row, column = 10, 20
+        x, y = self.grid.cell_center(row, column)
+        a_gateway = self.registry.get('gw3')
+        self.assertAlmostEqual(self.grid._delays[3, row, column], np.hypot(x - a_gateway.x, y - a_gateway.y) \
+            / SPEED_OF_LIGHT, delta=.01)
+
+    def test_reopen(self):
+        grid = fingerprint_grid(self.path, stride=2)
+        self.assertEqual(grid.shape, self.grid.shape)
+        self.assertEqual(grid.stride, 2)
+        self.assertEqual(grid.lookup(self._uplinks())[0], self.grid.lookup(self._uplinks())[0])
+
+    def test_version(self):
+        with open(os.path.join(self.path, 'grid.json')) as grid_file:
+            self.assertEqual(json.load(grid_file)['version'], self.grid.version)
+        self.assertEqual(fingerprint_grid(self.path).version, self.grid.version)
+        # a grid.json without version is hashed on opening
+        with open(os.path.join(self.path, 'grid.json')) as grid_file:
+            grid = json.load(grid_file)
+        del grid['version']
+        with open(os.path.join(self.path, 'grid.json'), 'w') as grid_file:
+            json.dump(grid, grid_file)
+        self.assertEqual(fingerprint_grid(self.path).version, self.grid.version)
+        rebuilt = build_fingerprint_grid(self.registry, self.path, cell_size=60.)
+        self.assertNotEqual(rebuilt.version, self.grid.version)
+
+    def test_pickle(self):
+        grid = pickle.loads(pickle.dumps(self.grid))
+        self.assertTrue(isinstance(grid._delays, np.memmap))
+        self.assertEqual(grid.lookup(self._uplinks())[0], self.grid.lookup(self._uplinks())[0])
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_locate(self):
+        for lat, lon in ((48.82, 2.27), (48.85, 2.21), (48.79, 2.29)):
+            fix = self.grid.locate(self._uplinks(lat, lon))
+            self.assertTrue(isinstance(fix, fingerprint_fix))
+            self.assertLess(self._error(fix.geolocalized_device, lat, lon), 50.)
+            self.assertLess(fix.residual, 50.)
+
+    def test_unregistered_gateways(self):
+        # gateways found by their coordinates, an unknown gateway is ignored
+        uplinks = [uplink(gateway(u.gateway.lat, u.gateway.lon), None, u.timestamp) for u in self._uplinks()]
+        uplinks.append(uplink(gateway(48.9, 2.4), None, T))
+        self.assertLess(self._error(self.grid.locate(uplinks).geolocalized_device), 50.)
+        self.assertIsNone(self.grid.locate(uplinks[:2] + uplinks[-1:]))
+
+    def test_seed_lsm(self):
+        uplinks = self._uplinks()
+        seeded = solver('lsm', fingerprint=self.grid).solve(uplinks).computation
+        self.assertTrue(isinstance(seeded, lsm))
+        self.assertLess(self._error(seeded.geolocalized_device), 1.)
+        self.assertLessEqual(seeded.nfev, lsm(uplinks).nfev)
+
+    def test_direct_answer(self):
+        cache = position_cache()
+        a_solver = solver('lsm', fingerprint=self.grid, fingerprint_tolerance=100., warm_start=cache)
+        result = a_solver.solve(self._uplinks(), device='dev1')
+        self.assertTrue(isinstance(result.computation, fingerprint_fix))
+        self.assertTrue(result.is_resolved)
+        self.assertEqual(len(cache), 1)
+        result = solver('lsm', fingerprint=self.grid, fingerprint_tolerance=.001).solve(self._uplinks())
+        self.assertTrue(isinstance(result.computation, lsm))
+
+    def test_cache_rebuilt_grid(self):
+        # the same directory rebuilt is another cache context
+        cache = result_cache()
+        solver('lsm', fingerprint=self.grid, fingerprint_tolerance=100., cache=cache).solve(self._uplinks()).computation
+        rebuilt = build_fingerprint_grid(self.registry, self.path, cell_size=200.)
+        result = solver('lsm', fingerprint=rebuilt, fingerprint_tolerance=100., cache=cache).solve(self._uplinks())
+        self.assertEqual(result.computation.cell, rebuilt.locate(self._uplinks()).cell)
+        self.assertEqual(len(cache), 2)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_parameters(self):
+        self.assertRaises(ValueError, lambda: build_fingerprint_grid(gateway_registry(), self.path))
+        self.assertRaises(ValueError, lambda: build_fingerprint_grid(self.registry, self.path, cell_size=0))
+        self.assertRaises(ValueError, lambda: fingerprint_grid(self.path, candidates=0))
+        self.assertRaises(ValueError, lambda: solver('tdoa', fingerprint=self.grid))
+        self.assertRaises(ValueError, lambda: solver('lsm', fingerprint_tolerance=10.))
+        self.assertRaises(ValueError, lambda: solver('lsm', projection_system='epsg:3857', fingerprint=self.grid))
+
+    def test_incorrect_uplinks(self):
+        self.assertRaises(ValueError, lambda: self.grid.lookup(self._uplinks()[0]))
+        self.assertRaises(ValueError, lambda: self.grid.lookup([42]))
+
+if __name__ == '__main__':
+    unittest.main()
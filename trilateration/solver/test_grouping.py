@@ -0,0 +1,104 @@
+import unittest
+
+import datetime
+
+from solver import solver
+from grouping import uplink_grouper, group_uplinks, solve_stream
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.projection import projection
+from ..utils.utils import SPEED_OF_LIGHT
+# do not forget to use nose2 at root to run test
+
+T = 1495456868630584064
+GATEWAYS = [gateway(48.84, 2.26), gateway(48.84, 2.30), gateway(48.80, 2.30), gateway(48.90, 2.40)]
+
+
+def delay(gw, device=(48.83, 2.29)):
+    """Propagation delay (nanosecond) from the device to a gateway"""
+    proj = projection()
+    x, y = proj.lat_long_to_x_y(device[0], device[1])
+    gw_x, gw_y = proj.point_to_x_y(GATEWAYS[gw])
+    return int(round(((gw_x - x)**2 + (gw_y - y)**2)**.5 / SPEED_OF_LIGHT))
+
+
+def reception(key, gw, delay):
+    return key, uplink(GATEWAYS[gw], datetime.datetime.now(), T + delay)
+
+
+class Test_grouping(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_grouper_creation(self):
+        grouper = uplink_grouper(2000, 3, 4, 10)
+        self.assertEqual(grouper.window, 2000)
+        self.assertEqual(len(grouper), 0)
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_group_on_window(self):
+        records = [reception('a', 0, 0), reception('b', 0, 10), reception('a', 1, 20), reception('a', 2, 30),
+                   reception('b', 1, 40), reception('c', 0, 5000)]
+        frames = list(group_uplinks(records, window=1000, min_uplinks=2))
+        self.assertEqual([key for key, uplinks in frames], ['a', 'b'])
+        self.assertEqual(len(frames[0][1]), 3)
+
+    def test_group_on_max_uplinks(self):
+        grouper = uplink_grouper(window=1000000, min_uplinks=3, max_uplinks=3)
+        self.assertEqual(grouper.push(*reception('a', 0, 0)), [])
+        self.assertEqual(grouper.push(*reception('a', 1, 1)), [])
+        frames = grouper.push(*reception('a', 2, 2))
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(len(grouper), 0)
+        self.assertEqual(grouper._deadlines, [])
+        # late reception of an emitted frame
+        self.assertEqual(grouper.push(*reception('a', 3, 3)), [])
+        self.assertEqual(grouper.flush(), [])
+        self.assertEqual(grouper.dropped, 1)
+
+    def test_out_of_order_frames(self):
+        # 'b' is opened after 'a' with an earlier first reception: it expires first
+        grouper = uplink_grouper(window=1000, min_uplinks=1)
+        grouper.push(*reception('a', 0, 800))
+        grouper.push(*reception('b', 0, 0))
+        self.assertEqual([key for key, uplinks in grouper.push(*reception('c', 0, 1500))], ['b'])
+        self.assertEqual(len(grouper), 2)
+        self.assertEqual([key for key, uplinks in grouper.push(*reception('c', 1, 1900))], ['a'])
+        self.assertEqual([key for key, uplinks in grouper.flush()], ['c'])
+
+    def test_duplicated_gateway(self):
+        records = [reception('a', 0, 0), reception('a', 0, 10), reception('a', 1, 20)]
+        frames = list(group_uplinks(records, window=1000, min_uplinks=2))
+        self.assertEqual(len(frames[0][1]), 2)
+        self.assertEqual(frames[0][1][0].timestamp, T)
+
+    def test_bounded_memory(self):
+        grouper = uplink_grouper(window=1000000, min_uplinks=1, max_pending=2)
+        grouper.push(*reception('a', 0, 0))
+        grouper.push(*reception('b', 0, 1))
+        frames = grouper.push(*reception('c', 0, 2))
+        self.assertEqual([key for key, uplinks in frames], ['a'])
+        self.assertEqual(len(grouper), 2)
+
+    def test_solve_stream(self):
+        records = [reception('a', gw, delay(gw)) for gw in xrange(4)]
+        results = list(solve_stream(records, solver('tdoa')))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], 'a')
+        self.assertTrue(results[0][1].is_resolved)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_window(self):
+        self.assertRaises(ValueError, lambda: uplink_grouper(window=0))
+
+    def test_incorrect_uplinks(self):
+        self.assertRaises(ValueError, lambda: uplink_grouper(min_uplinks=4, max_uplinks=3))
+
+    def test_incorrect_solver(self):
+        self.assertRaises(ValueError, lambda: solve_stream([], solver('trilateration')))
+
+    def test_incorrect_record(self):
+        grouper = uplink_grouper()
+        self.assertRaises(ValueError, lambda: grouper.push('a', 42))
+
+if __name__ == '__main__':
+    unittest.main()
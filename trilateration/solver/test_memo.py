@@ -0,0 +1,116 @@
+import unittest
+
+import datetime
+import threading
+
+import numpy as np
+
+from memo import result_cache, freeze
+from solver import solver
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.gateway_registry import gateway_registry
+# do not forget to use nose2 at root to run test
+
+COORDINATES = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]
+
+
+def _uplinks(t, order=(0, 1, 2, 3), deltas=(0, 1000, 2000, 3000)):
+    return [uplink(gateway(*COORDINATES[i]), datetime.datetime.now(), t + deltas[i]) for i in order]
+
+
+class Test_result_cache(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_normalized_key(self):
+        cache = result_cache()
+        t = 1495456868630584064
+        self.assertEqual(cache.key(_uplinks(t)), cache.key(_uplinks(t + 12345, order=(2, 0, 3, 1))))
+        self.assertNotEqual(cache.key(_uplinks(t)), cache.key(_uplinks(t, deltas=(0, 1000, 2000, 3001))))
+        self.assertNotEqual(cache.key(_uplinks(t), 'lsm'), cache.key(_uplinks(t), 'tdoa'))
+        self.assertEqual(cache.key([1, 2]), None)
+
+    def test_quantized_key(self):
+        cache = result_cache(quantum_ns=10)
+        t = 1495456868630584064
+        self.assertEqual(cache.key(_uplinks(t)), cache.key(_uplinks(t, deltas=(0, 1001, 1998, 3003))))
+
+    def test_registry_key(self):
+        registry = gateway_registry()
+        a_gateway = registry.add('gw1', 48.84, 2.26)
+        cache = result_cache()
+        key = cache.key([uplink(a_gateway, None, 0)])
+        self.assertEqual(key[1][0][0], (0, 'gw1'))
+
+    def test_lru_ttl(self):
+        now = [0.]
+        cache = result_cache(max_entries=2, ttl=10., clock=lambda: now[0])
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b'), None)
+        now[0] = 11.
+        self.assertEqual(cache.get('a'), None)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expired'], stats['evicted']), (1, 2, 1, 1))
+
+    def test_freeze(self):
+        self.assertEqual(freeze([1, [2, 3]]), (1, (2, 3)))
+        self.assertEqual(freeze(np.array([1., 2.])), (1., 2.))
+        self.assertEqual(freeze({'b': [1], 'a': 2}), freeze({'a': 2, 'b': [1]}))
+        self.assertEqual(hash(freeze({'a': set([1, 2])})), hash(freeze({'a': set([2, 1])})))
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_solver_cache(self):
+        cache = result_cache()
+        a_solver = solver('lsm', cache=cache)
+        t = 1495456868630584064
+        first = a_solver.solve(_uplinks(t)).computation
+        second = a_solver.solve(_uplinks(t + 5000000, order=(3, 2, 1, 0))).computation
+        self.assertTrue(first is second)
+        self.assertEqual(cache.hits, 1)
+        other = solver('lsm', cache=cache, ftol=1e-6).solve(_uplinks(t)).computation
+        self.assertFalse(other is first)
+
+    def test_solver_cache_list_options(self):
+        cache = result_cache()
+        a_solver = solver('tdoa', cache=cache, timestamp_std=[10, 10, 10, 10])
+        t = 1495456868630584064
+        first = a_solver.solve(_uplinks(t)).computation
+        self.assertTrue(a_solver.solve(_uplinks(t)).computation is first)
+        other = solver('tdoa', cache=cache, timestamp_std=np.array([10, 10, 10, 20])).solve(_uplinks(t)).computation
+        self.assertFalse(other is first)
+
+    def test_threads(self):
+        cache = result_cache()
+        a_solver = solver('lsm', cache=cache)
+        t = 1495456868630584064
+        threads = [threading.Thread(target=lambda: a_solver.solve(_uplinks(t)).is_resolved) for _ in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.hits + cache.misses, 8)
+        self.assertEqual(len(cache), 1)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_cache(self):
+        self.assertRaises(ValueError, lambda: result_cache(max_entries=0))
+        self.assertRaises(ValueError, lambda: result_cache(quantum_ns=0))
+        self.assertRaises(ValueError, lambda: solver('trilateration', cache=result_cache()))
+
+    def test_unhashable_option(self):
+        class unhashable(object):
+            __hash__ = None
+        self.assertRaises(ValueError, lambda: freeze(unhashable()))
+        self.assertRaises(ValueError, lambda: solver('lsm', cache=result_cache(), loss=unhashable()))
+
+    def test_errors_not_cached(self):
+        cache = result_cache()
+        result = solver('tdoa', cache=cache).solve(_uplinks(0)[:2])
+        self.assertRaises(ValueError, lambda: result.computation)
+        self.assertEqual(len(cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
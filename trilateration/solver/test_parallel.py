@@ -0,0 +1,77 @@
+import unittest
+
+import pickle
+import datetime
+
+from solver import solver
+from parallel import parallel_solver
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.gateway_registry import gateway_registry
+# do not forget to use nose2 at root to run test
+
+T = 1495456868630584064
+COORDINATES = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]
+
+
+def messages(gateways, count):
+    return [[uplink(g, datetime.datetime.now(), T + (i * j * 7) % 3000) for j, g in enumerate(gateways)]
+            for i in xrange(count)]
+
+
+class Test_parallel_solver(unittest.TestCase):
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_ordered_results(self):
+        uplinks = messages([gateway(lat, lon) for lat, lon in COORDINATES], 20)
+        with parallel_solver('lsm', workers=2, chunksize=3) as a_solver:
+            results = list(a_solver.map(uplinks))
+        self.assertEqual([r[0] for r in results], range(20))
+        for i, lat, lon, resolved, error in results:
+            expected = solver('lsm').solve(uplinks[i])
+            self.assertIsNone(error)
+            self.assertEqual(resolved, expected.is_resolved)
+            self.assertAlmostEqual(lat, expected.geolocalized_device.lat)
+            self.assertAlmostEqual(lon, expected.geolocalized_device.lon)
+
+    def test_unordered_results_with_registry(self):
+        registry = gateway_registry()
+        gateways = [registry.add(i, lat, lon) for i, (lat, lon) in enumerate(COORDINATES)]
+        with parallel_solver('lsm', registry=registry, workers=2, chunksize=4) as a_solver:
+            results = list(a_solver.map(messages(gateways, 10), ordered=False))
+        self.assertEqual(sorted(r[0] for r in results), range(10))
+
+    def test_invalid_message(self):
+        uplinks = messages([gateway(lat, lon) for lat, lon in COORDINATES[:2]], 1)
+        with parallel_solver('lsm', workers=1) as a_solver:
+            results = list(a_solver.map(uplinks))
+        self.assertEqual(results[0][:4], (0, None, None, False))
+        self.assertTrue(results[0][4].startswith('ValueError: '))
+
+    def test_worker_exception(self):
+        gateways = [gateway(lat, lon) for lat, lon in COORDINATES]
+        # a timestamp which is not a number makes the worker raise a TypeError
+        broken = [uplink._trusted(g, None, None) for g in gateways]
+        uplinks = messages(gateways, 2)
+        with parallel_solver('lsm', workers=1) as a_solver:
+            results = list(a_solver.map([uplinks[0], broken, uplinks[1]]))
+        self.assertEqual([r[0] for r in results], [0, 1, 2])
+        self.assertEqual(results[1][:4], (1, None, None, False))
+        self.assertTrue(results[1][4].startswith('TypeError: '))
+        self.assertIsNone(results[2][4])
+
+    def test_pickle_registry(self):
+        registry = gateway_registry()
+        registry.add('gw1', 48.84, 2.26)
+        copy = pickle.loads(pickle.dumps(registry, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(copy.get('gw1').x, registry.get('gw1').x)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_method(self):
+        self.assertRaises(ValueError, lambda: parallel_solver('trilateration'))
+
+    def test_incorrect_chunksize(self):
+        self.assertRaises(ValueError, lambda: parallel_solver('lsm', chunksize=0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import unittest
+
+import json
+import time
+import Queue
+import urllib2
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from service import geolocation_service, geolocation_server, parse_request
+from ..compute.tdoa import tdoa_batch
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+from ..model.projection import projection
+from ..model.gateway_registry import gateway_registry
+from ..utils.utils import SPEED_OF_LIGHT
+# do not forget to use nose2 at root to run test
+
+T = 1495456868630584064
+COORDINATES = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]
+
+
+def _timestamps(offset=0, coordinates=COORDINATES):
+    """Arrival timestamps of a message sent offset meters east of (48.83, 2.29)"""
+    proj = projection()
+    x, y = proj.lat_long_to_x_y(48.83, 2.29)
+    timestamps = []
+    for lat, lon in coordinates:
+        gw_x, gw_y = proj.lat_long_to_x_y(lat, lon)
+        timestamps.append(T + int(round(((gw_x - x - offset)**2 + (gw_y - y)**2)**.5 / SPEED_OF_LIGHT)))
+    return timestamps
+
+
+def _uplinks(offset=0, coordinates=COORDINATES):
+    return [uplink(gateway(lat, lon), datetime.datetime.now(), t) \
+        for (lat, lon), t in zip(coordinates, _timestamps(offset, coordinates))]
+
+
+class Test_geolocation_service(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_service_creation(self):
+        with geolocation_service('tdoa', max_concurrency=2) as service:
+            self.assertEqual(service.method, 'tdoa')
+            self.assertEqual(service.batches, 0)
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_geolocate_lsm(self):
+        with geolocation_service('lsm') as service:
+            device = service.geolocate(_uplinks()).result(10)
+        self.assertTrue(isinstance(device, point))
+
+    def test_micro_batch_tdoa(self):
+        with geolocation_service('lsm', batch_window=0.5, max_batch=3) as service:
+            futures = [service.geolocate(_uplinks(i * 100), method='tdoa') for i in xrange(3)]
+            devices = [future.result(10) for future in futures]
+            self.assertEqual(service.batches, 1)
+        for i, device in enumerate(devices):
+            lat, lon, resolved = tdoa_batch([[c[0] for c in COORDINATES]], [[c[1] for c in COORDINATES]], \
+                [_timestamps(i * 100)])
+            self.assertTrue(resolved[0])
+            self.assertAlmostEqual(device.lat, lat[0])
+            self.assertAlmostEqual(device.lon, lon[0])
+
+    def test_micro_batch_tdoa_sizes(self):
+        five = _uplinks(coordinates=COORDINATES + [(48.83, 2.20)])
+        with geolocation_service('tdoa', batch_window=0.5, max_batch=2) as service:
+            futures = [service.geolocate(_uplinks()), service.geolocate(five)]
+            devices = [future.result(10) for future in futures]
+            self.assertEqual(service.batches, 1)
+        lat, lon, resolved = tdoa_batch([[u.gateway.lat for u in five]], [[u.gateway.lon for u in five]], \
+            [[u.timestamp for u in five]])
+        self.assertTrue(resolved[0])
+        self.assertAlmostEqual(devices[1].lat, lat[0])
+
+    def test_method_options(self):
+        options = {'ransac': {'threshold': 200.}, 'tdoa': {'timestamp_std': [10, 10, 10, 10]}}
+        with geolocation_service('tdoa', method_options=options) as service:
+            self.assertEqual(service._solvers['ransac'].options, {'threshold': 200.})
+            self.assertEqual(service._solvers['lsm'].options, {})
+            device = service.geolocate(_uplinks()).result(10)
+        lat, lon, resolved = tdoa_batch([[c[0] for c in COORDINATES]], [[c[1] for c in COORDINATES]], \
+            [[u.timestamp for u in _uplinks()]])
+        self.assertEqual(device is not None, resolved[0])
+
+    def test_backpressure(self):
+        release = threading.Event()
+        service = geolocation_service('lsm', max_concurrency=1, max_queue=1, batch_window=0, max_batch=1)
+        service._solvers['lsm']._compute = lambda *args: release.wait(10)
+        service.geolocate(_uplinks())
+        service.geolocate(_uplinks())
+        service.geolocate(_uplinks(), block=True, timeout=1)
+        self.assertRaises(Queue.Full, lambda: service.geolocate(_uplinks(), block=False))
+        release.set()
+        service.close()
+
+    def test_http_server(self):
+        registry = gateway_registry()
+        for i, (lat, lon) in enumerate(COORDINATES):
+            registry.add('gw%d' % i, lat, lon)
+        with geolocation_service('lsm') as service:
+            server = geolocation_server(service, port=0, registry=registry)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            url = 'http://%s:%d/geolocate' % server.server_address
+            request = {"uplinks": [{"gateway": 'gw%d' % i, "timestamp": t} for i, t in enumerate(_timestamps())]}
+            response = json.loads(urllib2.urlopen(url, json.dumps(request)).read())
+            self.assertTrue(response["resolved"])
+            try:
+                urllib2.urlopen(url, json.dumps({"uplinks": [{"gateway": 'gw0'}]}))
+                self.fail("HTTP error expected")
+            except urllib2.HTTPError as e:
+                self.assertEqual(e.code, 400)
+            server.shutdown()
+            server.server_close()
+
+    def test_http_errors(self):
+        def solve(*args):
+            if len(args[0]) == 3:
+                raise RuntimeError("solver failure")
+            time.sleep(1)
+        with geolocation_service('lsm') as service:
+            service._solvers['lsm']._compute = solve
+            server = geolocation_server(service, port=0, timeout=.1)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            url = 'http://%s:%d/geolocate' % server.server_address
+            for uplinks, code in ((_uplinks(), 504), (_uplinks()[:3], 500)):
+                request = {"uplinks": [{"lat": u.gateway.lat, "lon": u.gateway.lon, "timestamp": u.timestamp} \
+                    for u in uplinks]}
+                try:
+                    urllib2.urlopen(url, json.dumps(request))
+                    self.fail("HTTP error expected")
+                except urllib2.HTTPError as e:
+                    self.assertEqual(e.code, code)
+            server.shutdown()
+            server.server_close()
+
+    def test_blocked_producer(self):
+        # a producer waiting for a place in the queue does not stall the others, close queues it
+        release = threading.Event()
+        service = geolocation_service('lsm', max_concurrency=1, max_queue=1, batch_window=0, max_batch=1)
+        service._solvers['lsm']._compute = lambda *args: release.wait(10)
+        futures = [service.geolocate(_uplinks()) for _ in xrange(3)]
+        producer = threading.Thread(target=lambda: futures.append(service.geolocate(_uplinks(), timeout=2)))
+        producer.start()
+        time.sleep(.1)
+        start = time.time()
+        self.assertRaises(Queue.Full, lambda: service.geolocate(_uplinks(), block=False))
+        self.assertLess(time.time() - start, .5)
+        closing = threading.Thread(target=service.close)
+        closing.start()
+        release.set()
+        producer.join(10)
+        closing.join(10)
+        self.assertEqual(len(futures), 4)
+        self.assertTrue(all(future.done() for future in futures))
+
+    def test_parse_request(self):
+        method, uplinks = parse_request({"method": "toa", "uplinks": [{"lat": 48.84, "lon": 2.26, "timestamp": T}]})
+        self.assertEqual(method, "toa")
+        self.assertEqual(uplinks[0].gateway, gateway(48.84, 2.26))
+        self.assertEqual(uplinks[0].timestamp, T)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_method(self):
+        self.assertRaises(ValueError, lambda: geolocation_service('trilateration'))
+        with geolocation_service() as service:
+            self.assertRaises(ValueError, lambda: service.geolocate(_uplinks(), method='unknown'))
+
+    def test_incorrect_message(self):
+        with geolocation_service() as service:
+            future = service.geolocate(_uplinks()[:3] + _uplinks()[:1], method='tdoa')
+            self.assertRaises(ValueError, lambda: future.result(10))
+
+    def test_incorrect_method_options(self):
+        self.assertRaises(ValueError, lambda: geolocation_service(method_options={'trilateration': {}}))
+        self.assertRaises(ValueError, lambda: geolocation_service(method_options={'lsm': 1e-6}))
+
+    def test_closed_service(self):
+        service = geolocation_service()
+        service.close()
+        self.assertRaises(ValueError, lambda: service.geolocate(_uplinks()))
+
+    def test_closed_executor(self):
+        executor = ThreadPoolExecutor(1)
+        executor.shutdown()
+        service = geolocation_service(executor=executor)
+        future = service.geolocate(_uplinks())
+        service.close()
+        self.assertRaises(ValueError, lambda: future.result(10))
+
+    def test_incorrect_request(self):
+        self.assertRaises(ValueError, lambda: parse_request({"uplinks": 3}))
+        self.assertRaises(ValueError, lambda: parse_request({"uplinks": [{"gateway": "gw1", "timestamp": T}]}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+
+import datetime
+
+from solver import solver, solver_result
+from ..compute.lsm import lsm
+from ..model.point import point
+from ..model.uplink import uplink
+from ..model.circle import circle
+from ..model.gateway import gateway
+from ..model.gateway_registry import gateway_registry
+from ..model.projection import projection
+from ..utils.utils import SPEED_OF_LIGHT
+# do not forget to use nose2 at root to run test
+
+
+class Test_solver(unittest.TestCase):
+
+    def _uplinks(self):
+        t = 1495456868630584064
+        uplinks = []
+        for i, (lat, lon) in enumerate([(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]):
+            uplinks.append(uplink(gateway(lat, lon), datetime.datetime.now(), t + i * 1000))
+        return uplinks
+
+    # =============================================== OBJECT UNIT TEST
+    def test_solver_creation(self):
+        a_solver = solver('tdoa', 'epsg:2192')
+        self.assertEqual(a_solver.method, 'tdoa')
+        self.assertEqual(a_solver.projection_system, 'epsg:2192')
+
+    def test_lazy_result(self):
+        a_solver = solver('lsm')
+        result = a_solver.solve(self._uplinks())
+        self.assertTrue(isinstance(result, solver_result))
+        self.assertFalse(result.is_computed)
+        self.assertTrue(isinstance(result.geolocalized_device, point))
+        self.assertTrue(result.is_computed)
+        self.assertTrue(isinstance(result.computation, lsm))
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_reuse_solver(self):
+        a_solver = solver('lsm', ftol=1e-6)
+        first = a_solver.solve(self._uplinks())
+        second = a_solver.solve(self._uplinks()[1:])
+        self.assertTrue(first.is_resolved)
+        self.assertTrue(second.is_resolved)
+        self.assertEqual(first.computation._ftol, 1e-6)
+
+    def test_same_as_method(self):
+        uplinks = self._uplinks()
+        result = solver('lsm').solve(uplinks)
+        self.assertEqual(result.geolocalized_device.lat, lsm(uplinks).geolocalized_device.lat)
+
+    def test_trilateration(self):
+        c1 = circle(point(48.84, 2.26), 3000)
+        c2 = circle(point(48.84, 2.30), 5000)
+        c3 = circle(point(48.80, 2.30), 3500)
+        result = solver('trilateration').solve([c1, c2, c3])
+        self.assertTrue(result.is_resolved)
+        self.assertAlmostEqual(result.geolocalized_device.lat, 48.82313276075889)
+
+    def test_max_gateways(self):
+        uplinks = self._uplinks() + [uplink(gateway(48.85, 2.33), datetime.datetime.now(), 1495456868630588064)]
+        result = solver('tdoa', max_gateways=4).solve(uplinks)
+        self.assertEqual(len(result.items), 5)
+        self.assertEqual(len(result.computation._uplinks), 4)
+
+    def test_max_gateways_registry(self):
+        registry = gateway_registry()
+        uplinks = [uplink(registry.add(i, u.gateway.lat, u.gateway.lon), None, u.timestamp) \
+            for i, u in enumerate(self._uplinks())]
+        result = solver('lsm', max_gateways=3, registry=registry).solve(uplinks)
+        self.assertEqual(len(result.computation._uplinks), 3)
+
+    def test_ransac(self):
+        # 4 gateways agree on a device at (48.83, 2.29), the last one receives 10 us late
+        proj = projection()
+        x, y = proj.lat_long_to_x_y(48.83, 2.29)
+        uplinks = []
+        for i, (lat, lon) in enumerate([(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40), (48.85, 2.33)]):
+            gw_x, gw_y = proj.lat_long_to_x_y(lat, lon)
+            delay = int(round(((gw_x - x)**2 + (gw_y - y)**2)**.5 / SPEED_OF_LIGHT)) + (10000 if i == 4 else 0)
+            uplinks.append(uplink(gateway(lat, lon), datetime.datetime.now(), 1495456868630584064 + delay))
+        result = solver('ransac', threshold=500.).solve(uplinks)
+        self.assertTrue(result.is_resolved)
+        self.assertEqual(result.computation.inliers, [0, 1, 2, 3])
+        self.assertEqual(result.computation._threshold, 500.)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_max_gateways(self):
+        self.assertRaises(ValueError, lambda: solver('lsm', max_gateways=2))
+        self.assertRaises(ValueError, lambda: solver('trilateration', max_gateways=3))
+        self.assertRaises(ValueError, lambda: solver('lsm', registry=gateway_registry()))
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, lambda: solver('gps'))
+
+    def test_incorrect_projection(self):
+        self.assertRaises(ValueError, lambda: solver('lsm', 42))
+
+    def test_incorrect_uplinks_on_read(self):
+        result = solver('tdoa').solve(self._uplinks()[:2])
+        self.assertRaises(ValueError, lambda: result.geolocalized_device)
+
+if __name__ == '__main__':
+    unittest.main()
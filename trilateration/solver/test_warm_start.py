@@ -0,0 +1,89 @@
+import unittest
+
+from warm_start import position_cache
+from solver import solver
+from memo import result_cache
+from ..model.point import point
+from ..model.uplink import uplink
+from ..benchmark.workload import city_workload
+# do not forget to use nose2 at root to run test
+
+S = 1000000000
+
+
+class Test_position_cache(unittest.TestCase):
+
+    # =============================================== OBJECT UNIT TEST
+    def test_get_put(self):
+        cache = position_cache()
+        fix = point(48.84, 2.26)
+        self.assertEqual(cache.get('dev1', 0), None)
+        cache.put('dev1', 0, fix)
+        self.assertTrue(cache.get('dev1', 10 * S) is fix)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.stats()['hit_rate'], .5)
+
+    def test_ttl(self):
+        cache = position_cache(ttl=60.)
+        cache.put('dev1', 0, point(48.84, 2.26))
+        self.assertEqual(cache.get('dev1', 61 * S), None)
+        self.assertEqual(cache.expired, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_lru(self):
+        cache = position_cache(max_devices=2)
+        fix = point(48.84, 2.26)
+        cache.put('dev1', 0, fix)
+        cache.put('dev2', 0, point(48.84, 2.30))
+        cache.get('dev1', 0)
+        cache.put('dev3', 0, point(48.80, 2.30))
+        self.assertEqual(cache.get('dev2', 0), None)
+        self.assertTrue(cache.get('dev1', 0) is fix)
+        self.assertEqual(cache.evicted, 1)
+
+    def test_out_of_order_fix(self):
+        cache = position_cache()
+        fix = point(48.84, 2.26)
+        cache.put('dev1', 10 * S, fix)
+        cache.put('dev1', 5 * S, point(48.80, 2.30))
+        self.assertTrue(cache.get('dev1', 10 * S) is fix)
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_warm_solver(self):
+        cache = position_cache()
+        a_solver = solver('lsm', warm_start=cache)
+        workload = city_workload(gateways=200, devices=5, size=10000., reception_range=8000., seed=1)
+        cold = solver('lsm')
+        for message_id, device, truth, uplinks in workload.uplinks(30):
+            warm_result = a_solver.solve(uplinks, device)
+            cold_result = cold.solve(uplinks)
+            self.assertTrue(warm_result.is_resolved)
+            self.assertAlmostEqual(warm_result.geolocalized_device.lat, cold_result.geolocalized_device.lat, places=4)
+            self.assertAlmostEqual(warm_result.geolocalized_device.lon, cold_result.geolocalized_device.lon, places=4)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 25)
+        self.assertEqual(stats['devices'], 5)
+        self.assertTrue(stats['warm_mean_nfev'] is not None and stats['cold_mean_nfev'] is not None)
+
+    def test_result_cache_hit(self):
+        # a message solved from the result_cache refreshes the fix of its device
+        cache = position_cache(ttl=60.)
+        a_solver = solver('lsm', warm_start=cache, cache=result_cache())
+        workload = city_workload(gateways=200, devices=1, size=10000., reception_range=8000., seed=1)
+        uplinks = list(workload.uplinks(1))[0][3]
+        fix = a_solver.solve(uplinks, 'dev1').geolocalized_device
+        self.assertTrue(a_solver.solve(uplinks, 'dev2').geolocalized_device is fix)
+        self.assertTrue(cache.get('dev2', uplinks[0].timestamp) is fix)
+        later = [uplink(uplk.gateway, None, uplk.timestamp + 50 * S) for uplk in uplinks]
+        a_solver.solve(later, 'dev1').computation
+        self.assertTrue(cache.get('dev1', uplinks[0].timestamp + 100 * S) is not None)
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_cache(self):
+        self.assertRaises(ValueError, lambda: position_cache(max_devices=0))
+        self.assertRaises(ValueError, lambda: position_cache(ttl=0))
+        self.assertRaises(ValueError, lambda: solver('tdoa', warm_start=position_cache()))
+        self.assertRaises(ValueError, lambda: solver('lsm', warm_start={}))
+
+if __name__ == '__main__':
+    unittest.main()
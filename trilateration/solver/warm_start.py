@@ -0,0 +1,103 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import threading
+from collections import OrderedDict
+
+"""
+Last known fix of every device, to start the lsm search near the device:
+    the fixes expire ttl seconds after the message that produced them (message time, so a replay
+    behaves like the live stream) and the least recently used devices are evicted beyond
+    max_devices.
+
+The cache also reports its hit rate and the mean number of least_squares evaluations of the warm
+(started from a fix) and cold solves.
+"""
+
+
+class position_cache:
+    """Thread safe LRU / TTL cache of the last fix of the devices"""
+
+    def __init__(self, max_devices=10000, ttl=3600.):
+        """position_cache constructor
+
+        Args:
+            max_devices: maximal number of devices kept
+            ttl: lifetime (second) of a fix, in message time
+        """
+        if max_devices < 1:
+            raise ValueError("Incorrect max_devices")
+        if ttl <= 0:
+            raise ValueError("Incorrect ttl")
+
+        # PUBLIC
+        self.max_devices = max_devices
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+        # PRIVATE
+        self._lock = threading.Lock()
+        # device -> (timestamp, point), least recently used first
+        self._fixes = OrderedDict()
+        # warm / cold: [number of solves, total evaluations]
+        self._evaluations = {True: [0, 0], False: [0, 0]}
+
+    def __len__(self):
+        return len(self._fixes)
+
+    def get(self, device, timestamp):
+        """Return the last fix of a device, None if unknown or expired
+
+        Args:
+            device: the device identifier (hashable)
+            timestamp: nanosecond timestamp of the message to solve
+        """
+        with self._lock:
+            entry = self._fixes.pop(device, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            if timestamp - entry[0] > self.ttl * 1e9:
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._fixes[device] = entry
+            self.hits += 1
+            return entry[1]
+
+    def put(self, device, timestamp, a_point):
+        """Store the fix of a device computed from a message of a timestamp (nanosecond)"""
+        with self._lock:
+            entry = self._fixes.pop(device, None)
+            if entry is not None and entry[0] > timestamp:
+                # keep the most recent fix of out of order messages
+                a_point, timestamp = entry[1], entry[0]
+            self._fixes[device] = (timestamp, a_point)
+            while len(self._fixes) > self.max_devices:
+                self._fixes.popitem(last=False)
+                self.evicted += 1
+
+    def record(self, warm, nfev):
+        """Record the number of least_squares evaluations of a warm or cold solve"""
+        with self._lock:
+            self._evaluations[bool(warm)][0] += 1
+            self._evaluations[bool(warm)][1] += nfev
+
+    def stats(self):
+        """Return the hit rate and the mean evaluations of the warm and cold solves"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            (warm, warm_nfev), (cold, cold_nfev) = self._evaluations[True], self._evaluations[False]
+            return {
+                'devices': len(self._fixes),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'hit_rate': self.hits / float(lookups) if lookups else 0.,
+                'warm_mean_nfev': warm_nfev / float(warm) if warm else None,
+                'cold_mean_nfev': cold_nfev / float(cold) if cold else None,
+            }
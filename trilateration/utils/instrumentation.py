@@ -0,0 +1,181 @@
+#!/usr/bin/env
+# -*- coding:utf-8 -*-
+
+import threading
+import timeit
+
+"""
+Opt-in instrumentation of the hot paths:
+    the computations time their stages (projection, equations, solve, back projection) and count
+    their events (optimizer evaluations, intersections tried) for the registered collectors.
+
+    collector = stage_collector()
+    with collecting(collector):
+        lsm(uplinks)
+    print collector.report()
+
+A collector is any object with the methods on_stage(name, seconds) and on_count(name, value).
+   .
+  / \
+ / ! \   => Without collector, stage() returns a shared no-op context and count() returns at once:
+/_____\     the cost is a function call per stage
+
+"""
+
+_COLLECTORS = []
+_COLLECTORS_LOCK = threading.Lock()
+
+
+def add_collector(collector):
+    """Register a collector for all the computations"""
+    if not hasattr(collector, 'on_stage') or not hasattr(collector, 'on_count'):
+        raise ValueError("Incorrect collector, on_stage and on_count are expected")
+    with _COLLECTORS_LOCK:
+        _COLLECTORS.append(collector)
+
+
+def remove_collector(collector):
+    """Unregister a collector"""
+    with _COLLECTORS_LOCK:
+        if collector in _COLLECTORS:
+            _COLLECTORS.remove(collector)
+
+
+def is_enabled():
+    """True if at least one collector is registered"""
+    return bool(_COLLECTORS)
+
+
+class collecting:
+    """Context registering a collector for the computations done inside it"""
+
+    def __init__(self, collector):
+        self.collector = collector
+
+    def __enter__(self):
+        add_collector(self.collector)
+        return self.collector
+
+    def __exit__(self, *args):
+        remove_collector(self.collector)
+
+
+class _noop_stage(object):
+    """Stage context used when no collector is registered"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_NOOP_STAGE = _noop_stage()
+
+
+class _timed_stage(object):
+    """Stage context sending its duration to the collectors"""
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, *args):
+        duration = timeit.default_timer() - self.start
+        for collector in list(_COLLECTORS):
+            collector.on_stage(self.name, duration)
+        return False
+
+
+def stage(name):
+    """Context timing a stage of a computation
+
+    Args:
+        name: name of the stage, prefixed by the computation (ex: 'lsm.least_squares')
+    """
+    if not _COLLECTORS:
+        return _NOOP_STAGE
+    return _timed_stage(name)
+
+
+def count(name, value=1):
+    """Count an event of a computation
+
+    Args:
+        name: name of the counter, prefixed by the computation (ex: 'lsm.nfev')
+        value: the increment
+    """
+    if not _COLLECTORS:
+        return
+    for collector in list(_COLLECTORS):
+        collector.on_count(name, value)
+
+
+class stage_collector(object):
+    """Thread safe collector aggregating the stages timings and the counters"""
+
+    def __init__(self):
+        # PRIVATE
+        self._lock = threading.Lock()
+        # name -> [count, total, min, max]
+        self._stages = {}
+        self._counters = {}
+
+    def on_stage(self, name, seconds):
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                self._stages[name] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = min(stats[2], seconds)
+                stats[3] = max(stats[3], seconds)
+
+    def on_count(self, name, value):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def stages(self):
+        """Return name -> {'count', 'total', 'mean', 'min', 'max'} (second) of the stages"""
+        with self._lock:
+            return dict((name, {'count': n, 'total': total, 'mean': total / n, 'min': low, 'max': high}) \
+                for name, (n, total, low, high) in self._stages.iteritems())
+
+    def counters(self):
+        """Return name -> value of the counters"""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def report(self):
+        """Human readable summary, the slowest stages first"""
+        stages = self.stages()
+        lines = ["%-32s %8d calls %12.3f ms total %10.3f ms mean" % (name, s['count'], 1000. * s['total'], \
+            1000. * s['mean']) for name, s in sorted(stages.iteritems(), key=lambda item: -item[1]['total'])]
+        lines.extend("%-32s %8d" % (name, value) for name, value in sorted(self.counters().iteritems()))
+        return "\n".join(lines)
+
+
+class callback_collector(object):
+    """Collector forwarding every measure to a function(kind, name, value), kind is 'stage' or 'count'"""
+
+    def __init__(self, callback):
+        if not callable(callback):
+            raise ValueError("Incorrect callback")
+        self.callback = callback
+
+    def on_stage(self, name, seconds):
+        self.callback('stage', name, seconds)
+
+    def on_count(self, name, value):
+        self.callback('count', name, value)
@@ -0,0 +1,87 @@
+import unittest
+
+import datetime
+from instrumentation import stage, count, collecting, add_collector, remove_collector, is_enabled, \
+    stage_collector, callback_collector, _NOOP_STAGE
+from ..compute.lsm import lsm
+from ..compute.toa import toa
+from ..compute.trilateration import trilateration
+from ..model.point import point
+from ..model.circle import circle
+from ..model.uplink import uplink
+from ..model.gateway import gateway
+# do not forget to use nose2 at root to run test
+
+
+class Test_instrumentation(unittest.TestCase):
+
+    def _uplinks(self, n):
+        t = 1495456868630584064
+        coordinates = [(48.84, 2.26), (48.84, 2.30), (48.80, 2.30), (48.90, 2.40)]
+        return [uplink(gateway(lat, lon), datetime.datetime.now(), t + i * 1000) \
+            for i, (lat, lon) in enumerate(coordinates[:n])]
+
+    # =============================================== OBJECT UNIT TEST
+    def test_disabled(self):
+        self.assertFalse(is_enabled())
+        self.assertTrue(stage('lsm.projection') is _NOOP_STAGE)
+
+    def test_collector(self):
+        collector = stage_collector()
+        with collecting(collector):
+            self.assertTrue(is_enabled())
+            with stage('a'):
+                pass
+            with stage('a'):
+                pass
+            count('b', 3)
+            count('b')
+        self.assertFalse(is_enabled())
+        self.assertEqual(collector.stages()['a']['count'], 2)
+        self.assertEqual(collector.counters(), {'b': 4})
+        self.assertTrue('a' in collector.report())
+        collector.reset()
+        self.assertEqual(collector.stages(), {})
+
+    def test_callback(self):
+        events = []
+        collector = callback_collector(lambda kind, name, value: events.append((kind, name)))
+        add_collector(collector)
+        count('c')
+        with stage('d'):
+            pass
+        remove_collector(collector)
+        count('c')
+        self.assertEqual(events, [('count', 'c'), ('stage', 'd')])
+
+    # =============================================== FUNCTIONNAL TEST
+    def test_lsm_stages(self):
+        with collecting(stage_collector()) as collector:
+            solver = lsm(self._uplinks(4))
+        stages = collector.stages()
+        for name in ('lsm.projection', 'lsm.least_squares', 'lsm.back_projection'):
+            self.assertEqual(stages[name]['count'], 1)
+        self.assertEqual(collector.counters()['lsm.nfev'], solver.nfev)
+
+    def test_toa_counters(self):
+        with collecting(stage_collector()) as collector:
+            toa(self._uplinks(3))
+        counters = collector.counters()
+        self.assertEqual(counters['toa.intersections_tried'], 3)
+        self.assertTrue(counters['toa.intersections_found'] <= 3)
+
+    def test_trilateration_stages(self):
+        circles = [circle(point(48.84, 2.26), 3000), circle(point(48.84, 2.30), 5000), circle(point(48.80, 2.30), 3500)]
+        with collecting(stage_collector()) as collector:
+            trilateration(circles)
+        self.assertEqual(collector.counters()['circle.pairs'], 3)
+        self.assertTrue('trilateration.intersections' in collector.stages())
+        self.assertTrue('circle.intersections' in collector.stages())
+
+    # =============================================== ERROR CHECKING
+    def test_incorrect_collector(self):
+        self.assertRaises(ValueError, lambda: add_collector(object()))
+        self.assertRaises(ValueError, lambda: callback_collector(3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 
 import time
 import datetime
-from utils import is_number
+from utils import is_number, combinations, combinations_count
 # do not forget to use nose2 at root to run test
 
  
@@ -19,5 +19,13 @@ class Test_utils(unittest.TestCase):
     def test_is_not_number2(self):
         self.assertFalse(is_number(2j))
 
+    def test_combinations(self):
+        subsets = combinations(5, 3)
+        self.assertEqual(subsets.shape, (10, 3))
+        self.assertEqual(list(subsets[0]), [0, 1, 2])
+        self.assertTrue(combinations(5, 3) is subsets)
+        self.assertEqual(combinations_count(5, 3), 10)
+        self.assertEqual(combinations_count(40, 4), 91390)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,3 +1,6 @@
+import itertools
+import numpy as np
+
 EARTH_RADIUS = 6378100.0
 SPEED_OF_LIGHT = .2997924580 # meter/ns.second
 
@@ -14,3 +17,33 @@ def is_number(to_test):
     return isinstance(to_test, float) \
         or isinstance(to_test, int) \
         or isinstance(to_test, long)
+
+
+# (n, k) -> index array of all the subsets of k items among n, shape (C(n, k), k)
+_COMBINATIONS = {}
+
+
+def combinations(n, k):
+    """Shared index array of the subsets of k items among n
+
+    Args:
+        n: number of items
+        k: size of the subsets
+
+    Returns:
+        A read only integer array of shape (C(n, k), k)
+    """
+    subsets = _COMBINATIONS.get((n, k))
+    if subsets is None:
+        subsets = np.array(list(itertools.combinations(xrange(n), k)), dtype=np.intp)
+        subsets.setflags(write=False)
+        _COMBINATIONS[(n, k)] = subsets
+    return subsets
+
+
+def combinations_count(n, k):
+    """Number of subsets of k items among n"""
+    count = 1
+    for i in xrange(min(k, n - k)):
+        count = count * (n - i) // (i + 1)
+    return count